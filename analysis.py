@@ -0,0 +1,443 @@
+# analysis.py
+"""
+Núcleos numéricos (NumPy) del análisis cuasi-estático y el análisis completo de
+un trío ALLKE/ALLIE/ALLWK (analyze_series), sin dependencias de Flask: lo usan
+la aplicación web y el procesado por lotes (batch.py).
+"""
+import collections
+import contextlib
+
+import numpy as np
+
+from criteria import DEFAULT_CRITERIA, criteria_signals, evaluate_criteria, failed_criteria_text, format_criterion_result
+
+# Operadores admitidos y su equivalente al cambiar el signo de los valores
+_NEGATED_OPS = {'<': '>', '<=': '>=', '>': '<', '>=': '<='}
+# Filas por bloque al recorrer series en disco (ver condition_times_blockwise)
+SCAN_BLOCK_ROWS = 1 << 20
+# Tolerancia por defecto para considerar iguales dos tiempos, relativa a la duración
+DEFAULT_RELATIVE_TIME_TOLERANCE = 1e-9
+# Categorías de la decisión final, de mejor a peor (prefijos del texto de quasistatic_decision)
+DECISION_CATEGORIES = ('PERFECTO', 'MUY BUENO', 'BUENO', 'ACEPTABLE', 'NO ACEPTABLE')
+# Categoría de los cálculos que no entran (o no el tiempo suficiente) en régimen cuasi-estático
+NOT_QUASISTATIC_CATEGORY = 'NO CUASI-ESTÁTICO'
+# Categorías de decision_sweep (índice = código de la matriz)
+SWEEP_CATEGORIES = DECISION_CATEGORIES + (NOT_QUASISTATIC_CATEGORY,)
+
+# Límites de la decisión: RI amplio/estricto, RET estricto/amplio (%) y % mínimo del
+# tiempo total con RI estable por debajo del límite amplio
+DecisionThresholds = collections.namedtuple(
+    'DecisionThresholds', ['ri_loose', 'ri_strict', 'ret_strict', 'ret_loose', 'min_stable_pct'])
+DEFAULT_DECISION_THRESHOLDS = DecisionThresholds(5.0, 1.0, 1.0, 5.0, 60.0)
+
+AnalysisResult = collections.namedtuple('AnalysisResult', [
+    'energy_time', 'allke', 'allie', 'ri', 'allwk_time', 'allwk', 'ret',
+    'time_RI_estable_menor_5pct', 'time_RI_estable_menor_1pct',
+    'time_RET_mayor_igual_1pct', 'time_RET_mayor_igual_5pct',
+    'total_time', 'porcentaje_tiempo_estable_RI_5pct', 'final_decision_text', 'criteria_results',
+])
+
+
+class AnalysisInputError(ValueError):
+    """Los datos no permiten hacer el análisis (series vacías o sin tramo común)."""
+
+
+def _condition_indices(values, thresholds, op, look_from_end):
+    """Índices (n = nunca) de stable_condition_times para `values` y `thresholds` (arrays float64)."""
+    n = values.size
+    if look_from_end:
+        # Se reduce a 'x < t' / 'x <= t': la condición se cumple desde i hasta el final
+        # si y sólo si max(x[i:]) cumple. El máximo acumulado desde el final es
+        # monótono, así que cada umbral se resuelve con una búsqueda binaria.
+        if op in ('>', '>='):
+            values, thresholds, op = -values, -thresholds, _NEGATED_OPS[op]
+        filled = np.where(np.isnan(values), np.inf, values)
+        suffix_max_reversed = np.maximum.accumulate(filled[::-1])
+        stable_count = np.searchsorted(suffix_max_reversed, thresholds, side='left' if op == '<' else 'right')
+        return n - stable_count
+    # Se reduce a 'x >= t' / 'x > t': el primer cruce es el primer índice en el que
+    # el máximo acumulado cumple la condición.
+    if op in ('<', '<='):
+        values, thresholds, op = -values, -thresholds, _NEGATED_OPS[op]
+    filled = np.where(np.isnan(values), -np.inf, values)
+    prefix_max = np.maximum.accumulate(filled)
+    return np.searchsorted(prefix_max, thresholds, side='left' if op == '>=' else 'right')
+
+
+def stable_condition_times(time, values, thresholds, op='<', look_from_end=True):
+    """
+    Evalúa la condición `valor <op> umbral` para varios umbrales en una sola pasada.
+
+    look_from_end=True: primer tiempo desde el cual la condición se cumple
+    ESTABLEMENTE hasta el final (None si la última muestra no la cumple).
+    look_from_end=False: primer tiempo en que la condición se cumple.
+
+    Los NaN nunca cumplen la condición. Devuelve una lista (float o None) con un
+    tiempo por umbral, en el mismo orden que `thresholds`.
+    """
+    time = np.asarray(time, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    if op not in _NEGATED_OPS:
+        raise ValueError(f"Operador no soportado: {op}")
+    n = values.size
+    if n == 0:
+        return [None] * thresholds.size
+    first_idx = _condition_indices(values, thresholds, op, look_from_end)
+    return [float(time[i]) if i < n else None for i in first_idx]
+
+
+def condition_times_blockwise(time, values, thresholds, op='<', look_from_end=True, block_rows=SCAN_BLOCK_ROWS):
+    """
+    Como stable_condition_times, pero leyendo `values` por bloques de `block_rows`
+    filas: sirve para las series en disco (np.memmap) del modo por bloques sin
+    cargarlas enteras en memoria.
+    """
+    n = len(values)
+    if n <= block_rows:
+        return stable_condition_times(time, values, thresholds, op, look_from_end)
+    if op not in _NEGATED_OPS:
+        raise ValueError(f"Operador no soportado: {op}")
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    first_idx = np.full(thresholds.size, n, dtype=np.int64)
+    # Umbrales aún sin resolver: hacia atrás, los que se cumplen en todo lo ya leído;
+    # hacia delante, los que aún no se han cumplido nunca
+    pending = np.ones(thresholds.size, dtype=bool)
+    starts = range(0, n, block_rows)
+    for start in (reversed(starts) if look_from_end else starts):
+        pending_idx = np.flatnonzero(pending)
+        if pending_idx.size == 0:
+            break
+        block = np.asarray(values[start:start + block_rows], dtype=np.float64)
+        first = _condition_indices(block, thresholds[pending_idx], op, look_from_end)
+        found = first < block.size
+        first_idx[pending_idx[found]] = start + first[found]
+        if look_from_end:
+            pending[pending_idx] = first == 0  # El bloque entero cumple: puede empezar antes
+        else:
+            pending[pending_idx[found]] = False
+    return [float(time[i]) if i < n else None for i in first_idx]
+
+
+def _time_tolerance(relative_tolerance, *times):
+    span = max(t[-1] for t in times) - min(t[0] for t in times)
+    return relative_tolerance * span
+
+
+def dedupe_times(time, values, tol=0.0):
+    """
+    Colapsa muestras con tiempos repetidos o separados como mucho `tol`, conservando
+    la última (tras un reinicio el valor válido es el que se escribe después).
+    `time` debe estar ordenado.
+    """
+    if time.size < 2:
+        return time, values
+    keep = np.empty(time.size, dtype=bool)
+    keep[-1] = True
+    np.greater(time[1:] - time[:-1], tol, out=keep[:-1])
+    if keep.all():
+        return time, values
+    return time[keep], values[keep]
+
+
+def merge_sorted_times(time_a, time_b, tol=0.0):
+    """Unión ordenada de dos ejes de tiempo ya ordenados, sin duplicados (a `tol`)."""
+    positions_b = np.searchsorted(time_a, time_b, side='right') + np.arange(time_b.size)
+    merged = np.empty(time_a.size + time_b.size, dtype=np.float64)
+    from_b = np.zeros(merged.size, dtype=bool)
+    from_b[positions_b] = True
+    merged[from_b] = time_b
+    merged[~from_b] = time_a
+    return dedupe_times(merged, merged, tol)[0]
+
+
+def align_series(time_a, values_a, time_b, values_b, relative_tolerance=DEFAULT_RELATIVE_TIME_TOLERANCE,
+                 n_points=None):
+    """
+    Alinea dos series ordenadas por tiempo sobre un eje común en O(n).
+
+    Por defecto el eje común es la unión de ambos ejes (tiempos a menos de
+    relative_tolerance * duración se consideran el mismo); con `n_points` se
+    remuestrea a una malla uniforme de n_points puntos. Cada serie se interpola
+    linealmente en el tiempo. Como en el merge + interpolate original, no hay
+    valores antes del inicio de la serie que empieza más tarde (esos tiempos se
+    descartan) y al final se mantiene el último valor de la serie más corta.
+
+    Si ambas series comparten el mismo array de tiempo (informe con varias señales)
+    no hay nada que interpolar: sólo se colapsan los tiempos repetidos.
+
+    Devuelve (tiempo, valores_a, valores_b).
+    """
+    shared_time = time_a is time_b
+    time_a = np.asarray(time_a, dtype=np.float64)
+    time_b = np.asarray(time_b, dtype=np.float64)
+    values_a = np.asarray(values_a, dtype=np.float64)
+    values_b = np.asarray(values_b, dtype=np.float64)
+    if time_a.size == 0 or time_b.size == 0:
+        empty = np.empty(0, dtype=np.float64)
+        return empty, empty.copy(), empty.copy()
+
+    tol = _time_tolerance(relative_tolerance, time_a, time_b)
+    if shared_time and not n_points:
+        common_time, values = dedupe_times(time_a, np.column_stack((values_a, values_b)), tol)
+        return common_time, values[:, 0].copy(), values[:, 1].copy()
+    time_a, values_a = dedupe_times(time_a, values_a, tol)
+    time_b, values_b = dedupe_times(time_b, values_b, tol)
+
+    start = max(time_a[0], time_b[0])
+    if n_points:
+        end = max(time_a[-1], time_b[-1])
+        common_time = np.linspace(start, end, int(n_points))
+    else:
+        common_time = merge_sorted_times(time_a, time_b, tol)
+        common_time = common_time[np.searchsorted(common_time, start - tol, side='right'):]
+
+    aligned_a = np.interp(common_time, time_a, values_a)
+    aligned_b = np.interp(common_time, time_b, values_b)
+    return common_time, aligned_a, aligned_b
+
+
+def quasistatic_decision(time_RI_estable_menor_5pct, time_RI_estable_menor_1pct,
+                         time_RET_mayor_igual_1pct, time_RET_mayor_igual_5pct, total_time_simulacion_energia,
+                         thresholds=DEFAULT_DECISION_THRESHOLDS):
+    """
+    Decisión final a partir de los tiempos críticos de RI y RET.
+    Los tiempos corresponden a los límites de `thresholds` (por defecto RI 5%/1%,
+    RET 1%/5% y 60% del tiempo estable; los nombres de los argumentos son los de
+    esos límites por defecto).
+    Devuelve (texto de la decisión, % del tiempo total con RI < límite amplio estable).
+    """
+    ri_loose = f"{thresholds.ri_loose:g}%"
+    ri_strict = f"{thresholds.ri_strict:g}%"
+    ret_strict = f"{thresholds.ret_strict:g}%"
+    ret_loose = f"{thresholds.ret_loose:g}%"
+    min_stable = f"{thresholds.min_stable_pct:g}%"
+    final_decision_text = "NO ACEPTABLE (Condición inicial no cumplida). REESCALAR TIEMPO Y MASA."
+    porcentaje_tiempo_estable_RI_5pct_val = 0.0
+
+    if time_RI_estable_menor_5pct is not None and total_time_simulacion_energia > 0:
+        tiempo_restante_RI_estable_5pct = total_time_simulacion_energia - time_RI_estable_menor_5pct
+        porcentaje_tiempo_estable_RI_5pct_val = (tiempo_restante_RI_estable_5pct / total_time_simulacion_energia) * 100
+
+        if porcentaje_tiempo_estable_RI_5pct_val >= thresholds.min_stable_pct:
+            comp_time_RI_1pct = time_RI_estable_menor_1pct if time_RI_estable_menor_1pct is not None else np.inf
+            comp_time_RET_1pct = time_RET_mayor_igual_1pct if time_RET_mayor_igual_1pct is not None else np.inf
+            comp_time_RET_5pct = time_RET_mayor_igual_5pct if time_RET_mayor_igual_5pct is not None else np.inf
+            comp_time_RI_5pct = time_RI_estable_menor_5pct 
+
+            if comp_time_RI_1pct < comp_time_RET_1pct:
+                final_decision_text = f"PERFECTO. El cálculo está completamente en régimen cuasi-estático (RI < {ri_strict} estable antes de que el trabajo alcance el {ret_strict})."
+            elif comp_time_RI_1pct < comp_time_RET_5pct:
+                final_decision_text = f"MUY BUENO. El cálculo está lo suficiente en régimen cuasi-estático (RI < {ri_strict} estable antes de que el trabajo alcance el {ret_loose})."
+            elif comp_time_RI_5pct < comp_time_RET_1pct:
+                final_decision_text = (f"BUENO. El cálculo está en régimen cuasi-estático (RI < {ri_loose} estable antes de que el trabajo alcance el {ret_strict}). "
+                                       f"REVISAR: Verificar que las variables de interés (tensión, deformación, contactos) no son relevantes antes del tiempo: {comp_time_RI_5pct:.3f} s.")
+            elif comp_time_RI_5pct < comp_time_RET_5pct:
+                final_decision_text = (f"ACEPTABLE. El cálculo está ajustado en régimen cuasi-estático (RI < {ri_loose} estable antes de que el trabajo alcance el {ret_loose}). "
+                                       f"REVISAR: Verificar que las variables de interés (tensión, deformación, contactos) no son relevantes antes del tiempo: {comp_time_RI_5pct:.3f} s.")
+            else:
+                final_decision_text = f"NO ACEPTABLE. Aunque el RI < {ri_loose} se mantiene más del {min_stable} del tiempo, la relación con el inicio del trabajo no es adecuada. REESCALAR TIEMPO Y MASA."
+        else: 
+            final_decision_text = f"CÁLCULO NO ENTRA EN RÉGIMEN CUASI-ESTÁTICO EL TIEMPO SUFICIENTE (RI < {ri_loose} establemente por menos del {min_stable} del tiempo total). REESCALAR TIEMPO Y MASA."
+    else: 
+        final_decision_text = f"CÁLCULO NO ENTRA EN RÉGIMEN CUASI-ESTÁTICO NUNCA (RI siempre >= {ri_loose} o no se pudo determinar). REESCALAR TIEMPO Y MASA."
+
+    return final_decision_text, porcentaje_tiempo_estable_RI_5pct_val
+
+
+def decision_sweep(energy_time, ri, allwk_time, ret, ri_loose, ri_strict, ret_strict, ret_loose, min_stable_pct):
+    """
+    Categoría de la decisión para cada combinación de límites (ver quasistatic_decision).
+
+    Cada límite es una lista de valores; los tiempos críticos se calculan una vez por
+    valor distinto (condition_times_blockwise) y la decisión de todas las
+    combinaciones se resuelve con operaciones vectorizadas sobre esos tiempos.
+    Devuelve (matriz de índices en SWEEP_CATEGORIES con forma
+    (len(ri_loose), len(ri_strict), len(ret_strict), len(ret_loose), len(min_stable_pct)),
+    {límite de RI: tiempo}, {límite de RET: tiempo}).
+    """
+    axes = [np.asarray(axis, dtype=np.float64) for axis in (ri_loose, ri_strict, ret_strict, ret_loose, min_stable_pct)]
+    ri_thresholds = np.unique(np.concatenate(axes[:2]))
+    ret_thresholds = np.unique(np.concatenate(axes[2:4]))
+    ri_times = condition_times_blockwise(energy_time, ri, ri_thresholds, op='<')
+    ret_times = condition_times_blockwise(allwk_time, ret, ret_thresholds, op='>=', look_from_end=False)
+    ri_array = np.array([np.inf if t is None else t for t in ri_times])
+    ret_array = np.array([np.inf if t is None else t for t in ret_times])
+
+    def along(axis_index, values, times, thresholds):
+        shape = [1] * len(axes)
+        shape[axis_index] = values.size
+        return times[np.searchsorted(thresholds, values)].reshape(shape)
+
+    t_ri_loose = along(0, axes[0], ri_array, ri_thresholds)
+    t_ri_strict = along(1, axes[1], ri_array, ri_thresholds)
+    t_ret_strict = along(2, axes[2], ret_array, ret_thresholds)
+    t_ret_loose = along(3, axes[3], ret_array, ret_thresholds)
+    min_stable = axes[4].reshape([1] * 4 + [-1])
+
+    total_time = float(energy_time[-1]) if len(energy_time) else 0.0
+    with np.errstate(invalid='ignore'):
+        stable_pct = (total_time - t_ri_loose) / total_time * 100 if total_time > 0 else np.zeros_like(t_ri_loose)
+        # Como en quasistatic_decision, sin duración positiva nunca es cuasi-estático
+        quasistatic = np.isfinite(t_ri_loose) & (total_time > 0) & (stable_pct >= min_stable)
+    shape = [axis.size for axis in axes]
+    codes = np.select(
+        [~quasistatic, t_ri_strict < t_ret_strict, t_ri_strict < t_ret_loose,
+         t_ri_loose < t_ret_strict, t_ri_loose < t_ret_loose],
+        [SWEEP_CATEGORIES.index(category) for category in
+         (NOT_QUASISTATIC_CATEGORY, 'PERFECTO', 'MUY BUENO', 'BUENO', 'ACEPTABLE')],
+        default=SWEEP_CATEGORIES.index('NO ACEPTABLE'))
+    codes = np.broadcast_to(codes, shape).astype(np.int8)
+    return (codes, dict(zip(ri_thresholds.tolist(), ri_times)), dict(zip(ret_thresholds.tolist(), ret_times)))
+
+
+def format_time_value(time_val):
+    # Manejar None, np.inf y np.nan explícitamente
+    if time_val is None or time_val == np.inf or (isinstance(time_val, float) and np.isnan(time_val)):
+        return "N/A"
+    return f"{time_val:.3f} s"
+
+
+def format_percentage_value(perc_val):
+    # Manejar None y np.nan explícitamente
+    if perc_val is None or (isinstance(perc_val, float) and np.isnan(perc_val)):
+        return "N/A"
+    return f"{perc_val:.2f}%"
+
+
+def build_summary_table(time_RI_estable_menor_5pct, time_RI_estable_menor_1pct,
+                        time_RET_mayor_igual_1pct, time_RET_mayor_igual_5pct, porcentaje_tiempo_estable_RI_5pct_val):
+    """Tabla resumen (valores ya formateados) tal como la muestra la página."""
+    return {
+        "time_RI_estable_menor_5pct": format_time_value(time_RI_estable_menor_5pct),
+        "time_RI_estable_menor_1pct": format_time_value(time_RI_estable_menor_1pct),
+        "time_RET_mayor_igual_1pct": format_time_value(time_RET_mayor_igual_1pct),
+        "time_RET_mayor_igual_5pct": format_time_value(time_RET_mayor_igual_5pct),
+        "porcentaje_tiempo_estable_RI_5pct": format_percentage_value(porcentaje_tiempo_estable_RI_5pct_val if time_RI_estable_menor_5pct is not None else None),
+    }
+
+
+def decision_category(final_decision_text):
+    """Categoría corta de la decisión (p. ej. 'MUY BUENO') para tablas y agregados."""
+    for category in DECISION_CATEGORIES:
+        if final_decision_text.startswith(category + '.') or final_decision_text.startswith(category + ' ('):
+            return category
+    return NOT_QUASISTATIC_CATEGORY
+
+
+def compute_ri(allke, allie):
+    """RI = ALLKE / ALLIE en %, NaN donde ALLIE es prácticamente cero."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(allie > 1e-9, (allke / allie) * 100, np.nan)
+
+
+def compute_ret(allwk):
+    """RET = ALLWK normalizado por su valor final, en %."""
+    allwk_final_value = allwk[-1] if allwk.size else 0
+    if abs(allwk_final_value) < 1e-9:
+        return np.zeros_like(allwk)
+    return (allwk / allwk_final_value) * 100
+
+
+def apply_criteria_decision(final_decision_text, criteria_results):
+    """
+    Incorpora a la decisión los criterios adicionales (ver criteria.py): si alguno
+    evaluado no se cumple, un cálculo aceptable por RI/RET pasa a NO ACEPTABLE.
+    """
+    failed = failed_criteria_text(criteria_results)
+    if not failed:
+        return final_decision_text
+    if decision_category(final_decision_text) in DECISION_CATEGORIES[:-1]:
+        return f"NO ACEPTABLE (criterios adicionales no cumplidos: {failed}). Por RI/RET: {final_decision_text}"
+    return f"{final_decision_text} Además, no se cumplen los criterios adicionales: {failed}."
+
+
+def _align_to(common_time, time, values, tol):
+    """Valores de una serie en `common_time` (sin copiar si ya comparten el eje)."""
+    if time is common_time:
+        return values
+    time, values = dedupe_times(np.asarray(time, dtype=np.float64), np.asarray(values, dtype=np.float64), tol)
+    return np.interp(common_time, time, values)
+
+
+def _no_timer(stage):
+    return contextlib.nullcontext()
+
+
+def analyze_series(allke, allie, allwk, relative_tolerance=DEFAULT_RELATIVE_TIME_TOLERANCE, n_points=None,
+                   timer=None, extra_signals=None, criteria=DEFAULT_CRITERIA, thresholds=DEFAULT_DECISION_THRESHOLDS):
+    """
+    Análisis completo de un trío de historiales. Cada argumento es un par
+    (tiempo, valores) ordenado por tiempo (p. ej. el de ingest.ParsedSeries).
+
+    `extra_signals` ({nombre: (tiempo, valores)}, p. ej. ALLAE o ETOTAL de un informe)
+    se alinean al eje de ALLKE/ALLIE para evaluar `criteria` (ver criteria.py), cuyo
+    resultado se suma a la decisión. `thresholds` son los límites de RI/RET de la decisión.
+
+    `timer(etapa)` es opcional y debe devolver un context manager: permite medir las
+    etapas 'align', 'ri_ret' y 'criteria' (ver metrics.stage_timer).
+
+    Devuelve un AnalysisResult; lanza AnalysisInputError si no hay datos que analizar.
+    """
+    timer = timer or _no_timer
+    (allke_time, allke_values), (allie_time, allie_values), (allwk_time, allwk_values) = allke, allie, allwk
+    if len(allke_time) == 0 or len(allie_time) == 0 or len(allwk_time) == 0:
+        raise AnalysisInputError("Uno o más archivos CSV están vacíos o no se pudieron procesar.")
+
+    with timer('align'):
+        energy_time, allke_aligned, allie_aligned = align_series(
+            allke_time, allke_values, allie_time, allie_values,
+            relative_tolerance=relative_tolerance, n_points=n_points)
+    if energy_time.size == 0:
+        raise AnalysisInputError("No se pudieron alinear los datos de energía o resultaron vacíos.")
+
+    with timer('ri_ret'):
+        ri = compute_ri(allke_aligned, allie_aligned)
+        allwk_time = np.asarray(allwk_time, dtype=np.float64)
+        allwk_values = np.asarray(allwk_values, dtype=np.float64)
+        ret = compute_ret(allwk_values)
+        # Un único recorrido por serie evalúa todos sus umbrales
+        time_RI_5, time_RI_1 = stable_condition_times(
+            energy_time, ri, [thresholds.ri_loose, thresholds.ri_strict], op='<')
+        time_RET_1, time_RET_5 = stable_condition_times(
+            allwk_time, ret, [thresholds.ret_strict, thresholds.ret_loose], op='>=', look_from_end=False)
+
+    with timer('criteria'):
+        total_time = float(energy_time[-1])
+        decision, stable_pct = quasistatic_decision(time_RI_5, time_RI_1, time_RET_1, time_RET_5, total_time,
+                                                    thresholds)
+
+        # Sólo se alinean las señales que usa algún criterio
+        needed = criteria_signals(criteria)
+        signals = {'ALLKE': allke_aligned, 'ALLIE': allie_aligned}
+        series = dict(extra_signals or {}, ALLWK=(allwk_time, allwk_values))
+        tol = _time_tolerance(relative_tolerance, energy_time)
+        for name, (time, values) in series.items():
+            if name in needed and name not in signals:
+                signals[name] = _align_to(energy_time, time, values, tol)
+        criteria_results = evaluate_criteria(energy_time, signals, criteria)
+        decision = apply_criteria_decision(decision, criteria_results)
+
+    return AnalysisResult(energy_time, allke_aligned, allie_aligned, ri, allwk_time, allwk_values, ret,
+                          time_RI_5, time_RI_1, time_RET_1, time_RET_5, total_time, stable_pct, decision,
+                          criteria_results)
+
+
+def result_summary_table(result):
+    """Tabla resumen formateada de un AnalysisResult, con una fila por criterio adicional evaluado."""
+    table = build_summary_table(result.time_RI_estable_menor_5pct, result.time_RI_estable_menor_1pct,
+                                result.time_RET_mayor_igual_1pct, result.time_RET_mayor_igual_5pct,
+                                result.porcentaje_tiempo_estable_RI_5pct)
+    for criterion_result in getattr(result, 'criteria_results', ()):
+        if criterion_result.evaluated:
+            table[criterion_result.criterion.key] = format_criterion_result(criterion_result)
+    return table
+
+
+def criteria_report(result):
+    """Criterios adicionales de un AnalysisResult en forma serializable (para la página)."""
+    return [{
+        'key': r.criterion.key, 'label': r.criterion.label, 'kind': r.criterion.kind,
+        'op': r.criterion.op, 'threshold': r.criterion.threshold,
+        'value': r.value, 'passed': r.passed, 'evaluated': r.evaluated,
+    } for r in getattr(result, 'criteria_results', ())]
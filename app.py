@@ -1,314 +1,418 @@
-from flask import Flask, render_template, request, jsonify
-import pandas as pd
-import io # Para leer los archivos CSV en memoria
+import concurrent.futures
+import contextlib
+import json
+import os
+import posixpath
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from flask import Flask, Response, g, render_template, request, jsonify
 import numpy as np # Lo usaremos para 'inf' y algunas operaciones de array
 
+from analysis import (DEFAULT_DECISION_THRESHOLDS, DEFAULT_RELATIVE_TIME_TOLERANCE, SWEEP_CATEGORIES,
+                      AnalysisInputError, DecisionThresholds, analyze_series, criteria_report, decision_category,
+                      decision_sweep, result_summary_table)
+from archive import ArchiveFormatError, iter_archive_members
+from batch import ENERGY_NAMES, energy_file_job, missing_energies
+from cache import LRUCache, combined_key, content_hash
+from chunked import ChunkedModeUnsupported, analyze_chunked
+from compression import CompressionError, compress_response
+from decimation import OVERVIEW_WIDTH, build_pyramid, decimate_window
+from ingest import (MAX_DECOMPRESSED_BYTES, SPOOL_BLOCK_BYTES, ReportColumnsError, ingest_report, parse_energy_buffer,
+                    parse_report_buffer, report_energy_series, report_extra_signals, upload_buffer)
+from jobs import JobFailed, JobQueue, QueueFullError
+from metrics import (BYTES_IN, BYTES_OUT, REGISTRY, REQUEST_SECONDS, ROWS_PROCESSED, server_timing_header,
+                     stage_timer)
+from monitor import LiveAnalysis
+from transport import BINARY_MIMETYPE, encode_binary_payload, requested_dtype, wants_binary
+
 app = Flask(__name__)
+# Nivel de log configurable (DEBUG muestra la tabla resumen y los tiempos de cada petición)
+app.logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
 
 app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
 app.config['TEMPLATES_AUTO_RELOAD'] = True
-
-# Nombres esperados para las columnas de tiempo y valor
-COL_TIME = 'Time' # O el nombre que uses, ej: 'Step Time', 'X-Time'
-COL_VALUE = 'Value' # O el nombre que uses, ej: 'ALLKE', 'ALLIE', 'ALLWK'
+# Límites de memoria de la caché de series parseadas y de la de análisis completos
+app.config['PARSE_CACHE_MAX_BYTES'] = int(os.environ.get('PARSE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+app.config['RESULT_CACHE_MAX_BYTES'] = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+# Límite de disco de los archivos temporales (series del modo por bloques) que
+# mantienen vivos los análisis de la caché de resultados
+app.config['RESULT_CACHE_MAX_DISK_BYTES'] = int(os.environ.get('RESULT_CACHE_MAX_DISK_BYTES', 4 * 1024 * 1024 * 1024))
+# Directorio bajo el que el modo monitor puede leer historiales (vacío = desactivado)
+app.config['MONITOR_ROOT'] = os.environ.get('MONITOR_ROOT', '')
+# Monitores abiertos a la vez (cada uno ocupa un hilo del worker; el resto recibe 503)
+# y segundos sin datos nuevos tras los que se cierra un monitor
+app.config['MONITOR_MAX_STREAMS'] = int(os.environ.get('MONITOR_MAX_STREAMS', 4))
+app.config['MONITOR_IDLE_TIMEOUT_SECONDS'] = float(os.environ.get('MONITOR_IDLE_TIMEOUT_SECONDS', 900))
+# Tiempos separados menos de esta fracción de la duración se consideran el mismo al alinear
+app.config['ALIGN_RELATIVE_TIME_TOLERANCE'] = DEFAULT_RELATIVE_TIME_TOLERANCE
+# Análisis en segundo plano (/analyze?async=1): hilos, trabajos pendientes como máximo
+# (el resto recibe 503) y segundos que se conserva el resultado de un trabajo terminado
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+app.config['JOB_QUEUE_MAX'] = int(os.environ.get('JOB_QUEUE_MAX', 8))
+app.config['JOB_TTL_SECONDS'] = int(os.environ.get('JOB_TTL_SECONDS', 600))
+# Límites de memoria y de disco de los resultados completos que conservan los trabajos
+# terminados hasta caducar (para servirlos aunque la caché de resultados los desaloje)
+app.config['JOB_PAYLOAD_MAX_BYTES'] = int(os.environ.get('JOB_PAYLOAD_MAX_BYTES', 256 * 1024 * 1024))
+app.config['JOB_PAYLOAD_MAX_DISK_BYTES'] = int(os.environ.get('JOB_PAYLOAD_MAX_DISK_BYTES', 2 * 1024 * 1024 * 1024))
+# Subidas (suma de los tres archivos) a partir de las que se analiza por bloques sin
+# cargar las series en memoria, y tipo con el que se guardan en disco sus valores
+app.config['CHUNKED_THRESHOLD_BYTES'] = int(os.environ.get('CHUNKED_THRESHOLD_BYTES', 512 * 1024 * 1024))
+app.config['CHUNKED_STORAGE_DTYPE'] = os.environ.get('CHUNKED_STORAGE_DTYPE', 'float64')
+# Hilos con los que /analyze_batch parsea y analiza los cálculos de un lote
+app.config['BATCH_WORKERS'] = int(os.environ.get('BATCH_WORKERS', min(4, os.cpu_count() or 1)))
+# Máximo de historiales (archivos ALLKE/ALLIE/ALLWK) por lote
+app.config['BATCH_MAX_FILES'] = int(os.environ.get('BATCH_MAX_FILES', 3000))
+# Tamaño máximo de un historial comprimido una vez descomprimido (protege el disco)
+app.config['MAX_DECOMPRESSED_BYTES'] = int(os.environ.get('MAX_DECOMPRESSED_BYTES', MAX_DECOMPRESSED_BYTES))
+# Nivel de gzip de las respuestas (1 = más rápido, 9 = más pequeño)
+app.config['RESPONSE_COMPRESS_LEVEL'] = int(os.environ.get('RESPONSE_COMPRESS_LEVEL', 6))
+# Máximo de combinaciones de límites que evalúa /sweep en una petición
+app.config['SWEEP_MAX_CELLS'] = int(os.environ.get('SWEEP_MAX_CELLS', 200_000))
+
+# Ancho máximo (píxeles) que se acepta en /series
+MAX_SERIES_WIDTH = 10000
+# Valores como máximo en cada eje de /sweep
+MAX_SWEEP_AXIS_VALUES = 1000
+# Segundos sin datos nuevos tras los que el monitor envía un comentario SSE
+MONITOR_HEARTBEAT_SECONDS = 15.0
+# Retry-After (segundos) cuando la cola de análisis está llena
+JOB_RETRY_AFTER_SECONDS = 5
+# Retry-After (segundos) cuando ya hay MONITOR_MAX_STREAMS monitores abiertos
+MONITOR_RETRY_AFTER_SECONDS = 30
+# Progreso de un trabajo en segundo plano al empezar cada etapa
+JOB_STAGE_PROGRESS = {'parse': 0.05, 'align': 0.6, 'ri_ret': 0.7, 'criteria': 0.8, 'serialise': 0.85}
+
+# Series parseadas (por hash del archivo) y análisis completos (por hash del trío).
+# Los análisis guardados también sirven el zoom de /series.
+parse_cache = LRUCache(app.config['PARSE_CACHE_MAX_BYTES'], name='parse')
+result_cache = LRUCache(app.config['RESULT_CACHE_MAX_BYTES'], name='result',
+                        max_disk_bytes=app.config['RESULT_CACHE_MAX_DISK_BYTES'])
+job_queue = JobQueue(app.config['JOB_WORKERS'], app.config['JOB_QUEUE_MAX'], app.config['JOB_TTL_SECONDS'],
+                     app.config['JOB_PAYLOAD_MAX_BYTES'], app.config['JOB_PAYLOAD_MAX_DISK_BYTES'])
+monitor_slots = threading.BoundedSemaphore(app.config['MONITOR_MAX_STREAMS'])
 
 
 # --- Funciones Auxiliares ---
 
-# En app.py, reemplazar la función read_csv_with_optional_header con esta:
+def parse_energy_cached(buf, value_col_name, content_key=None):
+    """ParsedSeries de un buffer, reutilizando la caché de series si se da `content_key`."""
+    parsed = parse_cache.get(content_key) if content_key else None
+    if parsed is None:
+        parsed = parse_energy_buffer(buf)
+        if content_key:
+            parse_cache.put(content_key, parsed, parsed.time.nbytes + parsed.values.nbytes)
+        if parsed.skipped_rows:
+            app.logger.info(f"{value_col_name}: {parsed.skipped_rows} filas descartadas durante la ingesta.")
+    return parsed
 
-# En app.py, dentro de la función read_csv_with_optional_header
 
-# En app.py, reemplazar la función read_csv_with_optional_header con esta:
+def parse_report_cached(buf, content_key=None):
+    """
+    ParsedReport de un informe con varias señales (ver ingest.parse_report_buffer).
+    Con `content_key` (hash del contenido) usa la caché de series.
+    """
+    report = parse_cache.get(f'report:{content_key}') if content_key else None
+    if report is None:
+        report = parse_report_buffer(buf)
+        if content_key:
+            nbytes = report.time.nbytes + sum(values.nbytes for values in report.signals.values())
+            parse_cache.put(f'report:{content_key}', report, nbytes)
+        if report.skipped_rows:
+            app.logger.info(f"Informe: {report.skipped_rows} filas descartadas durante la ingesta.")
+    return report
+
+
+def format_series_for_json(x, y, total_points=None):
+    """Convierte una serie a listas para JSON (NaN -> None, que Plotly dibuja como hueco)."""
+    y_values = np.asarray(y, dtype=np.float64)
+    y_list = y_values.tolist()
+    for i in np.flatnonzero(np.isnan(y_values)):
+        y_list[i] = None
+    series = {'x': np.asarray(x, dtype=np.float64).tolist(), 'y': y_list}
+    if total_points is not None:
+        series['total_points'] = int(total_points)
+    return series
+
+
+def binary_response(header, series):
+    """Respuesta en el formato binario de transport.py (float64 o float32 según ?precision=)."""
+    payload = encode_binary_payload(header, series, dtype=requested_dtype(request))
+    response = Response(payload, mimetype=BINARY_MIMETYPE)
+    response.vary.add('Accept')
+    return response
+
+
+def pyramids_nbytes(pyramids):
+    """
+    (memoria, disco) aproximados de las pirámides de un análisis, para la caché de
+    resultados. Las series del modo por bloques (np.memmap) están en archivos temporales.
+    """
+    memory, disk = {}, {}
+    for pyramid in pyramids.values():
+        arrays = [pyramid.time, pyramid.values]
+        for level in pyramid.levels:
+            arrays.extend([level.imin, level.imax])
+        for array in arrays:
+            seen = disk if isinstance(array, np.memmap) else memory
+            seen[id(array)] = array.nbytes  # Los ejes de tiempo se comparten entre series
+    return sum(memory.values()), sum(disk.values())
+
+
+def result_nbytes(series, overviews=None):
+    """(memoria, disco) de un análisis guardado: sus pirámides y, en el modo por bloques, sus vistas generales."""
+    nbytes, disk_bytes = pyramids_nbytes(series)
+    if overviews is not None:
+        nbytes += sum(x.nbytes + y.nbytes for x, y, _ in overviews.values())
+    return nbytes, disk_bytes
+
+
+def analysis_response(response_header, pyramids, overviews=None):
+    """
+    Respuesta de /analyze (JSON o binaria) con la vista general de cada serie.
+    El modo por bloques trae sus vistas generales ya calculadas (`overviews`).
+    """
+    if overviews is None:
+        overviews = {name: decimate_window(pyramid) for name, pyramid in pyramids.items()}
+    else:
+        overviews = {name: (x, y) for name, (x, y, _) in overviews.items()}
+    if wants_binary(request):
+        series = {name: (x, y, {'total_points': int(pyramids[name].time.size)})
+                  for name, (x, y) in overviews.items()}
+        return binary_response(response_header, series)
 
-def read_csv_with_optional_header(file_stream, value_col_name):
-    print(f"\n--- Procesando archivo para: {value_col_name} ---")
-    file_content_bytes = file_stream.read()
-    try:
-        file_content = file_content_bytes.decode('utf-8-sig')
-    except UnicodeDecodeError:
-        file_content = file_content_bytes.decode('utf-8', errors='replace')
-
-    s_io_for_peek = io.StringIO(file_content)
-    first_line_peek = s_io_for_peek.readline().strip()
-    print(f"Primera línea detectada para heurística: '{first_line_peek}'")
-
-    df = pd.DataFrame() # Inicializar df vacío
-    
-    # Intentar con separador ';' primero
-    possible_separators = [';', ',']
-    
-    for sep_char in possible_separators:
-        print(f"Intentando con separador: '{sep_char}'")
-        s_io_for_pandas = io.StringIO(file_content) # Necesitamos un nuevo stream para cada intento de read_csv
-        
-        is_likely_text_header = False
-        if first_line_peek:
-            try:
-                fields = first_line_peek.split(sep_char)
-                if len(fields) >= 2:
-                    float(fields[0]) 
-                    # Para el segundo campo, tomar solo la parte antes de un posible ';' o ',' si es cabecera con descripción
-                    # Esto es complicado porque el separador de descripción podría ser el mismo que el de datos
-                    # Por simplicidad, si la conversión a float falla, es cabecera.
-                    second_field_value_part = fields[1].split(';')[0].split(',')[0] # Tomar la parte numérica antes de cualquier descripción
-                    float(second_field_value_part)
-                else:
-                    print(f"Heurística (sep='{sep_char}'): No hay suf. campos, asumiendo cabecera.")
-                    is_likely_text_header = True
-            except (ValueError, IndexError):
-                print(f"Heurística (sep='{sep_char}'): Error convirtiendo primera línea, asumiendo cabecera.")
-                is_likely_text_header = True
-        
-        print(f"Resultado heurística (sep='{sep_char}'): is_likely_text_header = {is_likely_text_header}")
-
-        current_df = pd.DataFrame()
-        try:
-            if is_likely_text_header:
-                print(f"Leyendo CSV con header=0, sep='{sep_char}'")
-                current_df = pd.read_csv(s_io_for_pandas, sep=sep_char, header=0, usecols=[0, 1], 
-                                         names=[COL_TIME, value_col_name], on_bad_lines='skip', engine='python')
-            else:
-                print(f"Leyendo CSV con header=None, sep='{sep_char}'")
-                current_df = pd.read_csv(s_io_for_pandas, sep=sep_char, header=None, 
-                                         names=[COL_TIME, value_col_name], on_bad_lines='skip', engine='python')
-            
-            # Verificar si el DataFrame tiene las columnas esperadas y no está completamente vacío
-            if not current_df.empty and COL_TIME in current_df.columns and value_col_name in current_df.columns:
-                # Intentar conversión a numérico
-                temp_time_col = pd.to_numeric(current_df[COL_TIME], errors='coerce')
-                temp_value_col = pd.to_numeric(current_df[value_col_name], errors='coerce')
-                
-                # Si la mayoría de los valores se pudieron convertir, este es probablemente el separador correcto
-                if temp_time_col.notna().sum() > (len(current_df) / 2) and \
-                   temp_value_col.notna().sum() > (len(current_df) / 2) and \
-                   temp_time_col.notna().sum() > 0 : # Asegurarse que al menos una fila es válida
-                    print(f"Separador '{sep_char}' parece correcto.")
-                    df = current_df.copy() # Usar este df
-                    # Aplicar las conversiones finales
-                    df[COL_TIME] = temp_time_col
-                    df[value_col_name] = temp_value_col
-                    break # Salir del bucle de separadores
-            print(f"DataFrame DESPUÉS de pd.read_csv (sep='{sep_char}'):\n{current_df.head()}")
+    graph_data = {name: format_series_for_json(x, y, total_points=pyramids[name].time.size)
+                  for name, (x, y) in overviews.items()}
+    return jsonify(dict(response_header, graph_data=graph_data))
 
-        except Exception as e:
-            print(f"Error en pd.read_csv (sep='{sep_char}'): {e}")
-            continue # Probar con el siguiente separador
-
-    if df.empty:
-        print("No se pudo parsear el CSV con los separadores probados o resultó vacío.")
-        return pd.DataFrame(columns=[COL_TIME, value_col_name]) # Devolver DF vacío estructurado
-
-    print(f"DataFrame ANTES de dropna (primeras 5 filas):\n{df.head()}")
-    print(f"Tipos de datos ANTES de dropna:\n{df.dtypes}")
-    print(f"Número de NaNs en COL_TIME: {df[COL_TIME].isna().sum()}")
-    print(f"Número de NaNs en {value_col_name}: {df[value_col_name].isna().sum()}")
-
-    df.dropna(subset=[COL_TIME, value_col_name], inplace=True)
-    print(f"DataFrame DESPUÉS de dropna (primeras 5 filas):\n{df.head()}")
-    print(f"Tamaño del DataFrame final: {df.shape}")
-    
-    if df.empty: # Comprobación adicional por si dropna lo vació todo
-        print("DataFrame vacío después de dropna.")
-        return pd.DataFrame(columns=[COL_TIME, value_col_name])
-
-    return df.sort_values(by=COL_TIME).reset_index(drop=True)
-    print(f"\n--- Procesando archivo para: {value_col_name} ---") # NUEVO PRINT
-    file_content_bytes = file_stream.read()
-    try:
-        file_content = file_content_bytes.decode('utf-8-sig')
-    except UnicodeDecodeError:
-        file_content = file_content_bytes.decode('utf-8', errors='replace')
-
-    s_io = io.StringIO(file_content)
-    
-    # NUEVO: Imprimir las primeras líneas del contenido del archivo tal como lo ve Python
-    print("Primeras ~500 caracteres del archivo:")
-    s_io.seek(0) # Asegurarse de estar al inicio para leer
-    print(s_io.read(500))
-    s_io.seek(0) # Resetear para la lógica de detección de cabecera
-
-    first_line_peek = s_io.readline().strip()
-    s_io.seek(0) 
-    print(f"Primera línea detectada para heurística: '{first_line_peek}'") # NUEVO PRINT
-
-    is_likely_text_header = False
-    if first_line_peek:
-        try:
-            fields = first_line_peek.split(';')
-            if len(fields) >= 2:
-                float(fields[0]) 
-                second_field_data_part = fields[1] 
-                float(second_field_data_part) 
-            else:
-                print("Heurística: No hay suficientes campos en la primera línea, asumiendo cabecera.") # NUEVO PRINT
-                is_likely_text_header = True
-        except ValueError:
-            print("Heurística: ValueError al convertir primera línea a float, asumiendo cabecera.") # NUEVO PRINT
-            is_likely_text_header = True
-        except IndexError:
-            print("Heurística: IndexError en primera línea, asumiendo cabecera.") # NUEVO PRINT
-            is_likely_text_header = True 
-    
-    print(f"Resultado de heurística de cabecera: is_likely_text_header = {is_likely_text_header}") # NUEVO PRINT
-
-    df = pd.DataFrame() # Inicializar df vacío
-    if is_likely_text_header:
-        print("Intentando leer CSV con header=0, sep=';'") # NUEVO PRINT
-        try:
-            df = pd.read_csv(s_io, sep=';', header=0, usecols=[0, 1], names=[COL_TIME, value_col_name],
-                             on_bad_lines='skip')
-        except Exception as e:
-            print(f"Error en pd.read_csv (con header): {e}") # NUEVO PRINT
-    else:
-        print("Intentando leer CSV con header=None, sep=';'") # NUEVO PRINT
-        try:
-            df = pd.read_csv(s_io, sep=';', header=None, names=[COL_TIME, value_col_name],
-                             on_bad_lines='skip')
-        except Exception as e:
-            print(f"Error en pd.read_csv (sin header): {e}") # NUEVO PRINT
-
-    print(f"DataFrame DESPUÉS de pd.read_csv (primeras 5 filas):\n{df.head()}") # NUEVO PRINT
-    print(f"Tipos de datos DESPUÉS de pd.read_csv:\n{df.dtypes}") # NUEVO PRINT
-
-    df[COL_TIME] = pd.to_numeric(df[COL_TIME], errors='coerce')
-    df[value_col_name] = pd.to_numeric(df[value_col_name], errors='coerce')
-    
-    print(f"DataFrame DESPUÉS de to_numeric (primeras 5 filas):\n{df.head()}") # NUEVO PRINT
-    print(f"Tipos de datos DESPUÉS de to_numeric:\n{df.dtypes}") # NUEVO PRINT
-    print(f"Número de NaNs en COL_TIME: {df[COL_TIME].isna().sum()}") # NUEVO PRINT
-    print(f"Número de NaNs en {value_col_name}: {df[value_col_name].isna().sum()}") # NUEVO PRINT
-
-    df.dropna(subset=[COL_TIME, value_col_name], inplace=True)
-    print(f"DataFrame DESPUÉS de dropna (primeras 5 filas):\n{df.head()}") # NUEVO PRINT
-    print(f"Tamaño del DataFrame final: {df.shape}") # NUEVO PRINT
-    
-    return df.sort_values(by=COL_TIME).reset_index(drop=True)
-    # Leer todo el contenido del stream como bytes
-    file_content_bytes = file_stream.read()
-    try:
-        # Intentar decodificar como utf-8-sig (maneja BOM si está) o utf-8
-        file_content = file_content_bytes.decode('utf-8-sig')
-    except UnicodeDecodeError:
-        file_content = file_content_bytes.decode('utf-8', errors='replace')
-
-    s_io = io.StringIO(file_content)
-    
-    first_line_peek = s_io.readline().strip()
-    s_io.seek(0) 
-
-    is_likely_text_header = False
-    if first_line_peek:
-        try:
-            # Intentar convertir los dos primeros campos (separados por punto y coma) a float.
-            fields = first_line_peek.split(';') # <--- CAMBIO AQUÍ: separador ;
-            if len(fields) >= 2:
-                float(fields[0]) 
-                # Para el segundo campo, tomar solo la parte antes de un posible ';' adicional (si lo hubiera en la cabecera)
-                # Aunque en este formato parece que el segundo campo de la cabecera es solo "Energy(J)"
-                second_field_data_part = fields[1] # Asumimos que el segundo campo es directo
-                float(second_field_data_part) 
-            else:
-                is_likely_text_header = True
-        except ValueError:
-            is_likely_text_header = True
-        except IndexError:
-            is_likely_text_header = True 
-
-    if is_likely_text_header:
-        # El separador es ';'
-        df = pd.read_csv(s_io, sep=';', header=0, usecols=[0, 1], names=[COL_TIME, value_col_name],
-                         on_bad_lines='skip') # <--- CAMBIO AQUÍ: sep=';'
-    else:
-        # El separador es ';'
-        df = pd.read_csv(s_io, sep=';', header=None, names=[COL_TIME, value_col_name],
-                         on_bad_lines='skip') # <--- CAMBIO AQUÍ: sep=';'
-
-    df[COL_TIME] = pd.to_numeric(df[COL_TIME], errors='coerce')
-    df[value_col_name] = pd.to_numeric(df[value_col_name], errors='coerce')
-    
-    df.dropna(subset=[COL_TIME, value_col_name], inplace=True)
-    
-    return df.sort_values(by=COL_TIME).reset_index(drop=True)
-    # Leer todo el contenido del stream como bytes
-    file_content_bytes = file_stream.read()
-    try:
-        # Intentar decodificar como utf-8-sig para manejar BOM automáticamente
-        file_content = file_content_bytes.decode('utf-8-sig')
-    except UnicodeDecodeError:
-        # Fallback a utf-8 si utf-8-sig falla (ej. si no hay BOM o es otra codificación compatible con utf-8)
-        file_content = file_content_bytes.decode('utf-8', errors='replace')
-
-    s_io = io.StringIO(file_content)
-    
-    # Leer la primera línea para inspección, luego resetear el stream para Pandas
-    first_line_peek = s_io.readline().strip()
-    s_io.seek(0) # Resetear para que Pandas pueda leer desde el inicio
-
-    is_likely_text_header = False
-    if first_line_peek:
-        try:
-            # Intentar convertir los dos primeros campos (separados por coma) a float.
-            # Si esto falla, es probable que sea una cabecera de texto.
-            fields = first_line_peek.split(',')
-            if len(fields) >= 2:
-                float(fields[0]) # Intenta convertir el primer campo (tiempo)
-                # Para el segundo campo, tomar solo la parte antes de un posible ';'
-                second_field_data_part = fields[1].split(';')[0]
-                float(second_field_data_part) # Intenta convertir el segundo campo (valor)
-            else:
-                # No hay suficientes campos para ser datos típicos, asumir cabecera
-                is_likely_text_header = True
-        except ValueError:
-            # La conversión a float falló, es una cabecera de texto
-            is_likely_text_header = True
-        except IndexError:
-            # No hay suficientes campos (ej. línea vacía o solo un campo)
-            is_likely_text_header = True # O podría ser un error de formato, pero tratémoslo como posible cabecera
-
-    if is_likely_text_header:
-        # La primera línea es una cabecera de texto.
-        df = pd.read_csv(s_io, sep=',', header=0, usecols=[0, 1], names=[COL_TIME, value_col_name],
-                         on_bad_lines='skip')
-    else:
-        # La primera línea son datos (o el archivo está vacío/formato inesperado).
-        df = pd.read_csv(s_io, sep=',', header=None, names=[COL_TIME, value_col_name],
-                         on_bad_lines='skip')
 
-    # Asegurarse de que las columnas de tiempo y valor sean numéricas
-    df[COL_TIME] = pd.to_numeric(df[COL_TIME], errors='coerce')
-    df[value_col_name] = pd.to_numeric(df[value_col_name], errors='coerce')
-    
-    df.dropna(subset=[COL_TIME, value_col_name], inplace=True)
-    
-    return df.sort_values(by=COL_TIME).reset_index(drop=True)
+def run_analysis(analysis_id, parsed_allke, parsed_allie, parsed_allwk, grid_points=None, timer=stage_timer,
+                 extra_signals=None):
+    """
+    Analiza un trío ya parseado y guarda en la caché de resultados la cabecera de la
+    respuesta y las pirámides de cada serie. Devuelve (cabecera, pirámides).
+    `extra_signals` (p. ej. ALLAE, ALLVD, ETOTAL de un informe) alimentan los criterios adicionales.
+    """
+    result = analyze_series(
+        (parsed_allke.time, parsed_allke.values), (parsed_allie.time, parsed_allie.values),
+        (parsed_allwk.time, parsed_allwk.values),
+        relative_tolerance=app.config['ALIGN_RELATIVE_TIME_TOLERANCE'], n_points=grid_points,
+        timer=timer, extra_signals=extra_signals)
+
+    with timer('serialise'):
+        # Se guarda la pirámide de cada serie para servir el zoom desde /series;
+        # la respuesta sólo lleva la vista general a resolución de pantalla.
+        pyramids = {
+            'ALLKE': build_pyramid(result.energy_time, result.allke),
+            'ALLIE': build_pyramid(result.energy_time, result.allie),
+            'RI': build_pyramid(result.energy_time, result.ri),
+            'ALLWK': build_pyramid(result.allwk_time, result.allwk),
+            'RET': build_pyramid(result.allwk_time, result.ret),
+        }
+
+        summary_table_data = result_summary_table(result)
+        app.logger.debug("Tabla resumen: %s", summary_table_data)
+
+        response_header = {
+            "message": "Análisis completado.",
+            "analysis_id": analysis_id,
+            "summary_table": summary_table_data,
+            "final_decision_text": result.final_decision_text,
+            "criteria": criteria_report(result),
+            "ingest_report": {
+                'ALLKE': ingest_report(parsed_allke),
+                'ALLIE': ingest_report(parsed_allie),
+                'ALLWK': ingest_report(parsed_allwk),
+            },
+        }
+        store_result(analysis_id, (response_header, pyramids), *result_nbytes(pyramids))
+    return response_header, pyramids
+
+
+def store_result(analysis_id, payload, nbytes, disk_bytes=0):
+    """
+    Guarda un análisis en la caché de resultados; si no cabe, lo deja registrado en el log.
+    `disk_bytes` son los archivos temporales que la entrada mantiene vivos (modo por bloques).
+    """
+    if not result_cache.put(analysis_id, payload, nbytes, disk_bytes):
+        app.logger.warning(f"Análisis {analysis_id} ({nbytes // (1024 * 1024)} MB en memoria, "
+                           f"{disk_bytes // (1024 * 1024)} MB en disco) mayor que RESULT_CACHE_MAX_BYTES o "
+                           "RESULT_CACHE_MAX_DISK_BYTES: no se guarda en la caché de resultados.")
 
 
-def find_first_time_stable_condition(df, time_col, value_col, condition_func, look_from_end=True):
+def stored_analysis(analysis_id):
     """
-    Encuentra el primer tiempo desde el cual una condición se cumple ESTABLEMENTE hasta el final (o inicio).
+    (cabecera, series[, vistas generales]) de un análisis guardado: de la caché de
+    resultados o, si no cupo o ya se desalojó, del trabajo en segundo plano que lo hizo.
     """
-    if df.empty:
-        return None
+    cached = result_cache.peek(analysis_id)
+    if cached is None:
+        cached = job_queue.payload(analysis_id)
+    return cached
 
-    if look_from_end:
-        last_unstable_idx = -1
-        for i in range(len(df) - 1, -1, -1):
-            if not condition_func(df[value_col].iloc[i]):
-                last_unstable_idx = i
-                break
-        
-        if last_unstable_idx == -1:
-            return df[time_col].iloc[0]
-        elif last_unstable_idx == len(df) - 1:
-            return None 
-        else:
-            return df[time_col].iloc[last_unstable_idx + 1]
-    else: 
-        for i in range(len(df)):
-            if condition_func(df[value_col].iloc[i]):
-                return df[time_col].iloc[i]
-        return None
+
+def use_chunked_mode(buffers, grid_points):
+    """Modo por bloques si se pide (chunked=1) o si la subida supera CHUNKED_THRESHOLD_BYTES."""
+    if grid_points is not None:
+        return False  # El remuestreo a una malla necesita las series completas
+    requested = request.args.get('chunked') or request.form.get('chunked')
+    if requested is not None:
+        return requested == '1'
+    return sum(len(buf) for buf in buffers) >= app.config['CHUNKED_THRESHOLD_BYTES']
+
+
+def run_chunked_analysis(analysis_id, buf_allke, buf_allie, buf_allwk, progress=None):
+    """
+    Como run_analysis pero leyendo los archivos por bloques (chunked.py). Lanza
+    ChunkedModeUnsupported si hay que recurrir al análisis en memoria.
+    """
+    with stage_timer('chunked'):
+        result = analyze_chunked(buf_allke, buf_allie, buf_allwk,
+                                 relative_tolerance=app.config['ALIGN_RELATIVE_TIME_TOLERANCE'],
+                                 storage_dtype=app.config['CHUNKED_STORAGE_DTYPE'], progress=progress)
+    ROWS_PROCESSED.observe(sum(reader.rows for reader in result.readers.values()), endpoint='analyze_data')
+
+    response_header = {
+        "message": "Análisis completado (modo por bloques).",
+        "analysis_id": analysis_id,
+        "summary_table": result_summary_table(result),
+        "final_decision_text": result.final_decision_text,
+        "ingest_report": {name: ingest_report(reader) for name, reader in result.readers.items()},
+        "processing_mode": "chunked",
+    }
+    store_result(analysis_id, (response_header, result.series, result.overviews),
+                 *result_nbytes(result.series, result.overviews))
+    return response_header, result.series, result.overviews
+
+
+def analysis_error(e):
+    """(mensaje, código HTTP) de un error durante el análisis."""
+    if isinstance(e, (AnalysisInputError, CompressionError, ReportColumnsError)):
+        return str(e), 400
+    pd = sys.modules.get('pandas')  # Si pandas no se ha cargado, no puede haber lanzado nada
+    if pd is not None and isinstance(e, pd.errors.EmptyDataError):
+        return "Uno de los archivos CSV está vacío o tiene un formato incorrecto.", 400
+    if pd is not None and isinstance(e, pd.errors.ParserError):
+        return "Error al parsear uno de los archivos CSV. Verifica el formato.", 400
+    if isinstance(e, KeyError):
+        return f"Error: Falta una columna esperada en un CSV o nombre incorrecto: {e}", 400
+    app.logger.error(f"Error inesperado durante el análisis: {e}", exc_info=e)
+    return f"Error inesperado durante el análisis: {str(e)}", 500
+
+
+def keep_job_payload(job, analysis_id, payload):
+    """
+    Conserva el análisis con el trabajo hasta que caduque: /analysis/<analysis_id> lo
+    sirve desde ahí si ya no está en la caché de resultados (ver stored_analysis).
+    """
+    if not job_queue.keep_payload(job, analysis_id, payload, *result_nbytes(*payload[1:])):
+        app.logger.info(f"Análisis {analysis_id} mayor que JOB_PAYLOAD_MAX_BYTES o JOB_PAYLOAD_MAX_DISK_BYTES: "
+                        "el trabajo no lo conserva.")
+
+
+def _analysis_job(job, buffers, energy_buffers, content_keys, analysis_id, grid_points, use_chunked=False):
+    """
+    Análisis en segundo plano de /analyze?async=1. Cierra los buffers al terminar.
+    Con un único buffer, es un informe con todas las señales (ver parse_report_cached).
+    """
+    def timer(stage):
+        job.set_progress(stage, JOB_STAGE_PROGRESS[stage])
+        return stage_timer(stage)
+
+    with buffers:
+        try:
+            if use_chunked:
+                def progress(fraction):
+                    job.set_progress('chunked', JOB_STAGE_PROGRESS['parse'] + 0.8 * fraction)
+                try:
+                    payload = run_chunked_analysis(analysis_id, *energy_buffers, progress=progress)
+                    keep_job_payload(job, analysis_id, payload)
+                    return payload[0]
+                except ChunkedModeUnsupported as e:
+                    app.logger.warning(f"Modo por bloques no disponible ({e}); se analiza en memoria.")
+            extra_signals = None
+            if len(energy_buffers) == 1:
+                job.set_progress('parse', JOB_STAGE_PROGRESS['parse'])
+                with stage_timer('parse'):
+                    report = parse_report_cached(energy_buffers[0], content_keys[0])
+                parsed, extra_signals = report_energy_series(report), report_extra_signals(report)
+                rows = report.rows
+            else:
+                parsed = []
+                for i, (energy, buf, key) in enumerate(zip(ENERGY_NAMES, energy_buffers, content_keys)):
+                    job.set_progress(f'parse {energy}', JOB_STAGE_PROGRESS['parse'] + 0.18 * i)
+                    with stage_timer('parse'):
+                        parsed.append(parse_energy_cached(buf, energy, key))
+                rows = sum(series.rows for series in parsed)
+            ROWS_PROCESSED.observe(rows, endpoint='analyze_data')
+            response_header, pyramids = run_analysis(analysis_id, *parsed, grid_points=grid_points, timer=timer,
+                                                     extra_signals=extra_signals)
+            keep_job_payload(job, analysis_id, (response_header, pyramids))
+        except Exception as e:
+            message, status = analysis_error(e)
+            raise JobFailed(message, status) from e
+    return response_header
+
+
+def _job_metrics():
+    stats = job_queue.stats()
+    lines = ['# HELP qsc_jobs Trabajos en segundo plano por estado.', '# TYPE qsc_jobs gauge']
+    lines.extend(f'qsc_jobs{{status="{status}"}} {count}' for status, count in stats.items())
+    return lines
+
+
+def _cache_metrics():
+    lines = []
+    for metric, help_text, kind in (('hits', 'Aciertos de la caché.', 'counter'),
+                                    ('misses', 'Fallos de la caché.', 'counter'),
+                                    ('evictions', 'Entradas expulsadas de la caché.', 'counter'),
+                                    ('bytes', 'Bytes ocupados por la caché.', 'gauge'),
+                                    ('entries', 'Entradas en la caché.', 'gauge')):
+        name = f'qsc_cache_{metric}' + ('_total' if kind == 'counter' else '')
+        lines.extend([f'# HELP {name} {help_text}', f'# TYPE {name} {kind}'])
+        for cache in (parse_cache, result_cache):
+            lines.append(f'{name}{{cache="{cache.name}"}} {cache.stats()[metric]}')
+    return lines
+
+
+REGISTRY.add_collector(_cache_metrics)
+REGISTRY.add_collector(_job_metrics)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or 'unknown'
+    if endpoint in ('static', 'metrics'):
+        return response
+    timings = g.get('stage_timings')
+    if timings:
+        response.headers['Server-Timing'] = server_timing_header(timings)
+    elapsed = time.perf_counter() - g.get('request_start', time.perf_counter())
+    REQUEST_SECONDS.observe(elapsed, endpoint=endpoint)
+    if request.content_length:
+        BYTES_IN.observe(request.content_length, endpoint=endpoint)
+    if not response.is_streamed:
+        BYTES_OUT.observe(response.calculate_content_length() or 0, endpoint=endpoint)
+    app.logger.debug("%s %s %.1f ms (%s)", request.method, request.path, elapsed * 1000,
+                     response.headers.get('Server-Timing', '-'))
+    return response
+
+
+@app.after_request
+def compress_large_response(response):
+    # Se registra después de record_request_metrics, así que Flask lo ejecuta antes:
+    # las métricas de bytes enviados ya ven el tamaño comprimido
+    if request.endpoint == 'static':
+        return response
+    return compress_response(response, request, app.config['RESPONSE_COMPRESS_LEVEL'])
 
 
 # --- Rutas de Flask ---
@@ -319,161 +423,438 @@ def index():
 
 @app.route('/analyze', methods=['POST'])
 def analyze_data():
-    if 'allke_csv' not in request.files or \
-       'allie_csv' not in request.files or \
-       'allwk_csv' not in request.files:
-        return jsonify({"message": "Faltan uno o más archivos CSV."}), 400
+    # Un informe con todas las señales (campo 'report') o los tres historiales por separado
+    report_file = request.files.get('report')
+    if report_file is not None and report_file.filename != '':
+        uploads = [report_file]
+    else:
+        if 'allke_csv' not in request.files or \
+           'allie_csv' not in request.files or \
+           'allwk_csv' not in request.files:
+            return jsonify({"message": "Faltan uno o más archivos CSV."}), 400
+
+        uploads = [request.files['allke_csv'], request.files['allie_csv'], request.files['allwk_csv']]
+        if any(upload.filename == '' for upload in uploads):
+            return jsonify({"message": "Nombres de archivo vacíos."}), 400
+    is_report = len(uploads) == 1
 
-    file_allke = request.files['allke_csv']
-    file_allie = request.files['allie_csv']
-    file_allwk = request.files['allwk_csv']
+    # Opcional: remuestrear ALLKE/ALLIE a una malla común de N puntos
+    grid_points = request.form.get('grid_points', type=int) or None
+    if grid_points is not None and grid_points < 2:
+        return jsonify({"message": "grid_points debe ser al menos 2."}), 400
 
-    if file_allke.filename == '' or file_allie.filename == '' or file_allwk.filename == '':
-        return jsonify({"message": "Nombres de archivo vacíos."}), 400
+    # Con async=1 se responde 202 con el identificador del trabajo y se analiza en segundo plano
+    run_async = (request.args.get('async') or request.form.get('async')) == '1'
 
     try:
-        df_allke = read_csv_with_optional_header(file_allke.stream, 'ALLKE')
-        df_allie = read_csv_with_optional_header(file_allie.stream, 'ALLIE')
-        df_allwk = read_csv_with_optional_header(file_allwk.stream, 'ALLWK')
-        
-        if df_allke.empty or df_allie.empty or df_allwk.empty:
-             return jsonify({"message": "Uno o más archivos CSV están vacíos o no se pudieron procesar."}), 400
-
-        # --- 1. Alinear datos de ALLKE y ALLIE por tiempo y calcular RI ---
-        df_energy = pd.merge(df_allke, df_allie, on=COL_TIME, how='outer').sort_values(by=COL_TIME)
-        df_energy['ALLKE'] = df_energy['ALLKE'].interpolate(method='linear')
-        df_energy['ALLIE'] = df_energy['ALLIE'].interpolate(method='linear')
-        df_energy.dropna(subset=['ALLKE', 'ALLIE'], inplace=True)
-
-        if df_energy.empty:
-            return jsonify({"message": "No se pudieron alinear los datos de energía o resultaron vacíos."}), 400
-        
-        df_energy['RI'] = np.where(df_energy['ALLIE'] > 1e-9, (df_energy['ALLKE'] / df_energy['ALLIE']) * 100, np.nan)
-
-        # --- 2. Calcular RET ---
-        if df_allwk.empty or df_allwk[COL_TIME].nunique() == 0:
-            allwk_final_value = 0
-        else:
-            allwk_final_value = df_allwk.iloc[-1]['ALLWK']
-        
-        if abs(allwk_final_value) < 1e-9:
-            df_allwk['RET'] = 0.0
-        else:
-            df_allwk['RET'] = (df_allwk['ALLWK'] / allwk_final_value) * 100
-        
-        # --- 3. Determinar Tiempos Críticos ---
-        time_RI_estable_menor_5pct = find_first_time_stable_condition(df_energy, COL_TIME, 'RI', lambda x: x < 5.0 if pd.notna(x) else False)
-        time_RI_estable_menor_1pct = find_first_time_stable_condition(df_energy, COL_TIME, 'RI', lambda x: x < 1.0 if pd.notna(x) else False)
-
-        time_RET_mayor_igual_1pct = find_first_time_stable_condition(df_allwk, COL_TIME, 'RET', lambda x: x >= 1.0 if pd.notna(x) else False, look_from_end=False)
-        time_RET_mayor_igual_5pct = find_first_time_stable_condition(df_allwk, COL_TIME, 'RET', lambda x: x >= 5.0 if pd.notna(x) else False, look_from_end=False)
-
-        # --- 4. Lógica de Decisión ---
-        final_decision_text = "NO ACEPTABLE (Condición inicial no cumplida). REESCALAR TIEMPO Y MASA."
-        porcentaje_tiempo_estable_RI_5pct_val = 0.0
-        total_time_simulacion_energia = df_energy[COL_TIME].iloc[-1] if not df_energy.empty else 0
-
-        if time_RI_estable_menor_5pct is not None and total_time_simulacion_energia > 0:
-            tiempo_restante_RI_estable_5pct = total_time_simulacion_energia - time_RI_estable_menor_5pct
-            porcentaje_tiempo_estable_RI_5pct_val = (tiempo_restante_RI_estable_5pct / total_time_simulacion_energia) * 100
-            
-            if porcentaje_tiempo_estable_RI_5pct_val >= 60:
-                comp_time_RI_1pct = time_RI_estable_menor_1pct if time_RI_estable_menor_1pct is not None else np.inf
-                comp_time_RET_1pct = time_RET_mayor_igual_1pct if time_RET_mayor_igual_1pct is not None else np.inf
-                comp_time_RET_5pct = time_RET_mayor_igual_5pct if time_RET_mayor_igual_5pct is not None else np.inf
-                comp_time_RI_5pct = time_RI_estable_menor_5pct 
-
-                if comp_time_RI_1pct < comp_time_RET_1pct:
-                    final_decision_text = "PERFECTO. El cálculo está completamente en régimen cuasi-estático (RI < 1% estable antes de que el trabajo alcance el 1%)."
-                elif comp_time_RI_1pct < comp_time_RET_5pct:
-                    final_decision_text = "MUY BUENO. El cálculo está lo suficiente en régimen cuasi-estático (RI < 1% estable antes de que el trabajo alcance el 5%)."
-                elif comp_time_RI_5pct < comp_time_RET_1pct:
-                    final_decision_text = (f"BUENO. El cálculo está en régimen cuasi-estático (RI < 5% estable antes de que el trabajo alcance el 1%). "
-                                           f"REVISAR: Verificar que las variables de interés (tensión, deformación, contactos) no son relevantes antes del tiempo: {comp_time_RI_5pct:.3f} s.")
-                elif comp_time_RI_5pct < comp_time_RET_5pct:
-                    final_decision_text = (f"ACEPTABLE. El cálculo está ajustado en régimen cuasi-estático (RI < 5% estable antes de que el trabajo alcance el 5%). "
-                                           f"REVISAR: Verificar que las variables de interés (tensión, deformación, contactos) no son relevantes antes del tiempo: {comp_time_RI_5pct:.3f} s.")
+        with contextlib.ExitStack() as stack:
+            with stage_timer('decode'):
+                energy_buffers = tuple(stack.enter_context(upload_buffer(upload.stream, app.config['MAX_DECOMPRESSED_BYTES']))
+                                       for upload in uploads)
+
+                # Caché direccionada por contenido: el mismo trío devuelve el análisis guardado
+                # y un archivo ya visto no se vuelve a parsear
+                content_keys = tuple(content_hash(buf) for buf in energy_buffers)
+                analysis_id = combined_key(*content_keys, f'grid={grid_points}')
+                cached = result_cache.get(analysis_id) or job_queue.payload(analysis_id)
+            if cached is not None:
+                with stage_timer('serialise'):
+                    return analysis_response(*cached)
+
+            # El modo por bloques lee tres historiales de dos columnas
+            use_chunked = not is_report and use_chunked_mode(energy_buffers, grid_points)
+
+            if run_async:
+                # El trabajo se queda con los buffers mapeados (siguen válidos cuando
+                # Werkzeug cierra los archivos de la petición) y los cierra al terminar
+                buffers = stack.pop_all()
+                try:
+                    job = job_queue.submit(_analysis_job, buffers, energy_buffers, content_keys, analysis_id,
+                                           grid_points, use_chunked)
+                except QueueFullError:
+                    buffers.close()
+                    response = jsonify({"message": "Hay demasiados análisis en cola. Inténtalo de nuevo en unos segundos."})
+                    response.status_code = 503
+                    response.headers['Retry-After'] = str(JOB_RETRY_AFTER_SECONDS)
+                    return response
+                response = jsonify(dict(job.to_dict(), status_url=f'/jobs/{job.job_id}'))
+                response.status_code = 202
+                response.headers['Location'] = f'/jobs/{job.job_id}'
+                return response
+
+            if use_chunked:
+                try:
+                    response = run_chunked_analysis(analysis_id, *energy_buffers)
+                except ChunkedModeUnsupported as e:
+                    app.logger.warning(f"Modo por bloques no disponible ({e}); se analiza en memoria.")
                 else:
-                    final_decision_text = "NO ACEPTABLE. Aunque el RI < 5% se mantiene más del 60% del tiempo, la relación con el inicio del trabajo no es adecuada. REESCALAR TIEMPO Y MASA."
-            else: 
-                final_decision_text = "CÁLCULO NO ENTRA EN RÉGIMEN CUASI-ESTÁTICO EL TIEMPO SUFICIENTE (RI < 5% establemente por menos del 60% del tiempo total). REESCALAR TIEMPO Y MASA."
-        else: 
-            final_decision_text = "CÁLCULO NO ENTRA EN RÉGIMEN CUASI-ESTÁTICO NUNCA (RI siempre >= 5% o no se pudo determinar). REESCALAR TIEMPO Y MASA."
-
-        # --- 5. Preparar Datos para la Respuesta JSON ---
-        # En app.py, dentro de la función analyze_data, reemplaza format_series_for_json
-
-        def format_series_for_json(df, time_col, value_col):
-            if df.empty or value_col not in df.columns:
-                return {'x': [], 'y': []}
-            
-            x_values = df[time_col].tolist() # La columna de tiempo no debería tener NaN después del dropna inicial
-            
-            y_values_processed = []
-            for item in df[value_col].tolist(): # Convertir la serie a una lista de Python
-                # Comprobar explícitamente si el item es un NaN flotante
-                if isinstance(item, float) and np.isnan(item):
-                    y_values_processed.append(None) # Convertir NaN a None de Python
+                    with stage_timer('serialise'):
+                        return analysis_response(*response)
+
+            extra_signals = None
+            with stage_timer('parse'):
+                if is_report:
+                    report = parse_report_cached(energy_buffers[0], content_keys[0])
+                    parsed_allke, parsed_allie, parsed_allwk = report_energy_series(report)
+                    extra_signals = report_extra_signals(report)
+                    rows = report.rows
                 else:
-                    y_values_processed.append(item)
-            
-            return {
-                'x': x_values,
-                'y': y_values_processed
-            }
-
-        graph_data = {
-            'ALLKE': format_series_for_json(df_energy, COL_TIME, 'ALLKE'),
-            'ALLIE': format_series_for_json(df_energy, COL_TIME, 'ALLIE'),
-            'RI': format_series_for_json(df_energy, COL_TIME, 'RI'),
-            'ALLWK': format_series_for_json(df_allwk, COL_TIME, 'ALLWK'),
-            'RET': format_series_for_json(df_allwk, COL_TIME, 'RET'),
-        }
+                    parsed_allke, parsed_allie, parsed_allwk = (
+                        parse_energy_cached(buf, energy, key)
+                        for buf, energy, key in zip(energy_buffers, ENERGY_NAMES, content_keys))
+                    rows = parsed_allke.rows + parsed_allie.rows + parsed_allwk.rows
+            ROWS_PROCESSED.observe(rows, endpoint='analyze_data')
+
+        # Alinear ALLKE/ALLIE, calcular RI y RET, tiempos críticos, decisión y pirámides
+        response_header, pyramids = run_analysis(analysis_id, parsed_allke, parsed_allie, parsed_allwk, grid_points,
+                                                 extra_signals=extra_signals)
+        with stage_timer('serialise'):
+            return analysis_response(response_header, pyramids)
 
-        # Dentro de la función analyze_data, modifica estas dos funciones:
-
-        def format_time_value(time_val):
-            # Manejar None, np.inf y np.nan explícitamente
-            if time_val is None or time_val == np.inf or (isinstance(time_val, float) and np.isnan(time_val)):
-                return "N/A"
-            return f"{time_val:.3f} s"
-
-        def format_percentage_value(perc_val):
-            # Manejar None y np.nan explícitamente
-            if perc_val is None or (isinstance(perc_val, float) and np.isnan(perc_val)):
-                return "N/A"
-            return f"{perc_val:.2f}%"
-
-        summary_table_data = {
-            "time_RI_estable_menor_5pct": format_time_value(time_RI_estable_menor_5pct),
-            "time_RI_estable_menor_1pct": format_time_value(time_RI_estable_menor_1pct),
-            "time_RET_mayor_igual_1pct": format_time_value(time_RET_mayor_igual_1pct),
-            "time_RET_mayor_igual_5pct": format_time_value(time_RET_mayor_igual_5pct),
-            "porcentaje_tiempo_estable_RI_5pct": format_percentage_value(porcentaje_tiempo_estable_RI_5pct_val if time_RI_estable_menor_5pct is not None else None),
-        }
+    except Exception as e:
+        message, status = analysis_error(e)
+        return jsonify({"message": message}), status
 
-        print("--- summary_table_data ANTES de jsonify ---")
-        print(summary_table_data)
-        print("--- graph_data (solo claves y tipos de 'y' para brevedad) ---")
-        for key, series_data in graph_data.items():
-            print(f"{key}: y type is {type(series_data['y'][0]) if series_data['y'] else 'empty'}")
 
-        return jsonify({
-            "message": "Análisis completado.",
-            "graph_data": graph_data,
-            "summary_table": summary_table_data,
-            "final_decision_text": final_decision_text
-        })
-
-    except pd.errors.EmptyDataError:
-        return jsonify({"message": "Uno de los archivos CSV está vacío o tiene un formato incorrecto."}), 400
-    except pd.errors.ParserError:
-        return jsonify({"message": "Error al parsear uno de los archivos CSV. Verifica el formato."}), 400
-    except KeyError as e:
-        return jsonify({"message": f"Error: Falta una columna esperada en un CSV o nombre incorrecto: {e}"}), 400
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Estado, etapa y progreso de un análisis en segundo plano; al terminar, su resultado."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"message": "Trabajo no encontrado (o su resultado ya ha caducado)."}), 404
+    data = job.to_dict()
+    if job.status == 'queued':
+        data['queue_position'] = job_queue.queue_position(job)
+    return jsonify(data)
+
+
+def _spool_member(stream):
+    """Copia un miembro del lote a un archivo temporal (se borra al cerrarlo)."""
+    spool = tempfile.TemporaryFile()
+    try:
+        shutil.copyfileobj(stream, spool, SPOOL_BLOCK_BYTES)
+    except BaseException:
+        spool.close()
+        raise
+    return spool
+
+
+def _parse_spooled_member(spool, energy):
+    with spool, upload_buffer(spool, app.config['MAX_DECOMPRESSED_BYTES']) as buf:
+        key = content_hash(buf)
+        return key, parse_energy_cached(buf, energy, key)
+
+
+def _analyze_batch_job(job, members, grid_points):
+    """
+    Fila de la tabla de /analyze_batch para un trío ({energía: (ruta, futuro del parseo)}).
+    Los errores quedan en la fila.
+    """
+    row = {'job': job, 'files': {energy: path for energy, (path, _) in members.items()}}
+    try:
+        parsed = {energy: members[energy][1].result() for energy in ENERGY_NAMES}
+        analysis_id = combined_key(*(parsed[energy][0] for energy in ENERGY_NAMES), f'grid={grid_points}')
+        cached = result_cache.get(analysis_id)
+        if cached is not None:
+            response_header = cached[0]
+        else:
+            response_header, _ = run_analysis(analysis_id, *(parsed[energy][1] for energy in ENERGY_NAMES),
+                                              grid_points=grid_points)
+    except (AnalysisInputError, ValueError) as e:
+        row.update(status='error', error=str(e))
+        return row
     except Exception as e:
-        app.logger.error(f"Error inesperado durante el análisis: {e}", exc_info=True)
-        return jsonify({"message": f"Error inesperado durante el análisis: {str(e)}"}), 500
+        app.logger.error(f"Error inesperado en el cálculo {job} del lote: {e}", exc_info=True)
+        row.update(status='error', error=f"Error inesperado durante el análisis: {e}")
+        return row
+
+    row.update(
+        status='ok',
+        analysis_id=analysis_id,
+        category=decision_category(response_header['final_decision_text']),
+        summary_table=response_header['summary_table'],
+        final_decision_text=response_header['final_decision_text'],
+        rows=sum(parsed[energy][1].rows for energy in ENERGY_NAMES),
+    )
+    return row
+
+
+@app.route('/analyze_batch', methods=['POST'])
+def analyze_batch():
+    """
+    Analiza muchos cálculos en una sola petición: un zip/tar en el campo 'archive'
+    y/o varios historiales en el campo 'files'. Los tríos se forman como en batch.py
+    (mismo directorio, nombres que sólo se diferencian en ALLKE/ALLIE/ALLWK).
+
+    Los miembros se leen de uno en uno y se parsean en paralelo mientras se sigue
+    leyendo el archivo; cada trío se analiza en cuanto están sus tres historiales, así
+    que sus series no esperan a que termine el lote. Devuelve la tabla resumen de cada
+    cálculo; la respuesta completa (con gráficas) de cada uno está en
+    /analysis/<analysis_id> mientras siga en la caché de resultados.
+    """
+    archive = request.files.get('archive')
+    uploads = [f for f in request.files.getlist('files') if f.filename]
+    if (archive is None or archive.filename == '') and not uploads:
+        return jsonify({"message": "Sube un archivo zip/tar en 'archive' o los historiales en 'files'."}), 400
+
+    grid_points = request.form.get('grid_points', type=int) or None
+    if grid_points is not None and grid_points < 2:
+        return jsonify({"message": "grid_points debe ser al menos 2."}), 400
+
+    def members():
+        for upload in uploads:
+            yield upload.filename, upload.stream
+        if archive is not None and archive.filename:
+            yield from iter_archive_members(archive.stream)
+
+    workers = max(app.config['BATCH_WORKERS'], 1)
+    default_name = os.path.splitext(archive.filename)[0] if archive is not None and archive.filename else 'lote'
+    seen_paths = set()
+    pending = {}  # Cálculo -> {energía: (ruta, futuro del parseo)} hasta tener el trío
+    analyzed = set()
+    job_futures = []
+    ignored_members = []
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            in_flight = set()
+            with stage_timer('decode'):
+                for path, stream in members():
+                    path = posixpath.normpath(path.replace('\\', '/'))
+                    grouped = energy_file_job(path, default_name)
+                    if grouped is None or path in seen_paths or grouped[0] in analyzed:
+                        ignored_members.append(path)
+                        continue
+                    if len(seen_paths) >= app.config['BATCH_MAX_FILES']:
+                        return jsonify({"message": f"El lote supera el máximo de "
+                                                   f"{app.config['BATCH_MAX_FILES']} historiales."}), 400
+                    seen_paths.add(path)
+                    # Pocas tareas a la vez (archivos temporales y series parseadas): se
+                    # espera si los parseos o los análisis van por detrás de la lectura
+                    if len(in_flight) >= 2 * workers:
+                        _, in_flight = concurrent.futures.wait(
+                            in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                    job, energy = grouped
+                    future = pool.submit(_parse_spooled_member, _spool_member(stream), energy)
+                    in_flight.add(future)
+                    pending.setdefault(job, {})[energy] = (path, future)
+                    if len(pending[job]) == len(ENERGY_NAMES):
+                        # Los parseos del trío ya están en la cola (FIFO) antes que su análisis,
+                        # así que el análisis nunca bloquea un hilo que necesite un parseo pendiente.
+                        # Al terminar se sueltan sus series (salvo las que guarde la caché de series).
+                        analyzed.add(job)
+                        analysis = pool.submit(_analyze_batch_job, job, pending.pop(job), grid_points)
+                        in_flight.add(analysis)
+                        job_futures.append(analysis)
+            jobs = sorted((future.result() for future in job_futures), key=lambda row: row['job'])
+    except ArchiveFormatError as e:
+        return jsonify({"message": str(e)}), 400
+
+    for row in jobs:
+        if row['status'] == 'ok':
+            row['analysis_stored'] = result_cache.peek(row['analysis_id']) is not None
+    ROWS_PROCESSED.observe(sum(job.get('rows', 0) for job in jobs), endpoint='analyze_batch')
+    return jsonify({
+        "message": f"Lote analizado: {sum(job['status'] == 'ok' for job in jobs)} de {len(jobs)} cálculos correctos.",
+        "jobs": jobs,
+        "incomplete_jobs": [{'job': job, 'missing': missing_energies(files)} for job, files in sorted(pending.items())],
+        "ignored_members": ignored_members,
+        "stored_analyses_note": "Las respuestas completas (/analysis/<analysis_id>) se guardan en la caché de "
+                                "resultados y pueden desalojarse: analysis_stored indica si cada una seguía "
+                                "guardada al responder.",
+    })
+
+
+@app.route('/analysis/<analysis_id>')
+def analysis_result(analysis_id):
+    """Respuesta completa (tabla, decisión y vista general de las gráficas) de un análisis guardado."""
+    cached = stored_analysis(analysis_id)
+    if cached is None:
+        return jsonify({"message": "Análisis no encontrado. Vuelve a ejecutar el análisis."}), 404
+    return analysis_response(*cached)
+
+
+@app.route('/series/<analysis_id>/<series_name>')
+def series_window(analysis_id, series_name):
+    """Ventana diezmada de una serie para el rango visible (t0, t1) y el ancho en píxeles."""
+    cached = stored_analysis(analysis_id)
+    if cached is None:
+        return jsonify({"message": "Análisis no encontrado. Vuelve a ejecutar el análisis."}), 404
+    pyramids = cached[1]
+    if series_name not in pyramids:
+        return jsonify({"message": f"Serie desconocida: {series_name}"}), 404
+
+    t0 = request.args.get('t0', type=float)
+    t1 = request.args.get('t1', type=float)
+    width = request.args.get('width', default=OVERVIEW_WIDTH, type=int)
+    width = min(max(width, 1), MAX_SERIES_WIDTH)
+    x, y = decimate_window(pyramids[series_name], t0, t1, width)
+    if wants_binary(request):
+        return binary_response({}, {series_name: (x, y)})
+    return jsonify(format_series_for_json(x, y))
+
+
+def parse_threshold_axis(value):
+    """
+    Valores de un eje de /sweep: lista de números (JSON) o texto con números separados
+    por comas, donde cada elemento puede ser un rango 'inicio:fin:paso' (fin incluido).
+    """
+    if isinstance(value, (int, float)):
+        return [float(value)]
+    if isinstance(value, list):
+        return [float(item) for item in value]
+    values = []
+    for item in str(value).split(','):
+        if ':' in item:
+            start, stop, step = (float(part) for part in item.split(':'))
+            if step <= 0:
+                raise ValueError(f"El paso del rango debe ser positivo: {item}")
+            count = int(np.floor((stop - start) / step + 1e-9)) + 1
+            if count > MAX_SWEEP_AXIS_VALUES:
+                raise ValueError(f"Demasiados valores en el rango {item}.")
+            values.extend(np.round(start + step * np.arange(max(count, 0)), 12).tolist())
+        elif item.strip():
+            values.append(float(item))
+    return values
+
+
+@app.route('/sweep/<analysis_id>', methods=['GET', 'POST'])
+def sweep_thresholds(analysis_id):
+    """
+    Matriz de decisiones para una malla de límites de RI/RET sobre un análisis guardado,
+    sin volver a subir ni parsear los historiales. Los límites (ri_loose, ri_strict,
+    ret_strict, ret_loose, min_stable_pct) llegan como parámetros o en un JSON; los que
+    faltan toman su valor por defecto.
+    """
+    cached = stored_analysis(analysis_id)
+    if cached is None:
+        return jsonify({"message": "Análisis no encontrado. Vuelve a ejecutar el análisis."}), 404
+    header, series = cached[0], cached[1]
+
+    params = request.get_json(silent=True) or request.values
+    axes = {}
+    try:
+        for name, default in DEFAULT_DECISION_THRESHOLDS._asdict().items():
+            values = parse_threshold_axis(params[name]) if name in params else [default]
+            if not values or len(values) > MAX_SWEEP_AXIS_VALUES:
+                raise ValueError(f"{name} debe tener entre 1 y {MAX_SWEEP_AXIS_VALUES} valores.")
+            if not all(np.isfinite(values)) or min(values) < 0:
+                raise ValueError(f"{name} sólo admite valores no negativos.")
+            axes[name] = values
+    except (TypeError, ValueError) as e:
+        return jsonify({"message": f"Límites no válidos: {e}"}), 400
+    cells = int(np.prod([len(values) for values in axes.values()]))
+    if cells > app.config['SWEEP_MAX_CELLS']:
+        return jsonify({"message": f"Demasiadas combinaciones ({cells}); el máximo es "
+                                   f"{app.config['SWEEP_MAX_CELLS']}."}), 400
+
+    with stage_timer('criteria'):
+        codes, ri_times, ret_times = decision_sweep(series['RI'].time, series['RI'].values,
+                                                    series['RET'].time, series['RET'].values, *axes.values())
+        # Los criterios adicionales no dependen de estos límites: si alguno falla, lo que
+        # sería aceptable por RI/RET es NO ACEPTABLE, igual que en la decisión del análisis
+        failed_criteria = [c['key'] for c in header.get('criteria', []) if c['evaluated'] and not c['passed']]
+        if failed_criteria:
+            codes = np.maximum(codes, np.int8(SWEEP_CATEGORIES.index('NO ACEPTABLE')))
+        counts = np.bincount(codes.ravel(), minlength=len(SWEEP_CATEGORIES))
+
+    return jsonify({
+        "analysis_id": analysis_id,
+        "axes": axes,
+        "axis_order": list(DecisionThresholds._fields),
+        "categories": list(SWEEP_CATEGORIES),
+        "decisions": codes.tolist(),
+        "counts": dict(zip(SWEEP_CATEGORIES, counts.tolist())),
+        "ri_times": {f"{threshold:g}": time for threshold, time in ri_times.items()},
+        "ret_times": {f"{threshold:g}": time for threshold, time in ret_times.items()},
+        "failed_criteria": failed_criteria,
+    })
+
+
+def resolve_monitor_path(relative_path):
+    """Ruta absoluta dentro de MONITOR_ROOT, o None si sale de ella."""
+    root = os.path.realpath(app.config['MONITOR_ROOT'])
+    path = os.path.realpath(os.path.join(root, relative_path))
+    if os.path.commonpath([root, path]) != root:
+        return None
+    return path
+
+
+def sse_event(payload, event=None):
+    prefix = f"event: {event}\n" if event else ''
+    return f"{prefix}data: {json.dumps(payload, allow_nan=False)}\n\n"
+
+
+@app.route('/monitor/stream')
+def monitor_stream():
+    """
+    Server-Sent Events con el análisis provisional de un cálculo en marcha.
+    Parámetros: allke, allie, allwk (o combined) con rutas relativas a MONITOR_ROOT,
+    e interval (segundos entre sondeos).
+    Como mucho hay MONITOR_MAX_STREAMS abiertos (503 por encima), y cada uno termina con
+    un evento 'end' tras MONITOR_IDLE_TIMEOUT_SECONDS sin datos nuevos.
+    """
+    if not app.config['MONITOR_ROOT']:
+        return jsonify({"message": "El modo monitor está desactivado (configura MONITOR_ROOT)."}), 403
+
+    paths = {}
+    for key in ('allke', 'allie', 'allwk', 'combined'):
+        value = request.args.get(key, '').strip()
+        if value:
+            paths[key] = resolve_monitor_path(value)
+            if paths[key] is None:
+                return jsonify({"message": f"Ruta no permitida: {value}"}), 400
+    if 'combined' not in paths and not all(key in paths for key in ('allke', 'allie', 'allwk')):
+        return jsonify({"message": "Indica los tres historiales (allke, allie, allwk) o un archivo combinado."}), 400
+
+    interval = min(max(request.args.get('interval', default=2.0, type=float), 0.5), 60.0)
+    idle_timeout = app.config['MONITOR_IDLE_TIMEOUT_SECONDS']
+    live = LiveAnalysis(**paths, relative_tolerance=app.config['ALIGN_RELATIVE_TIME_TOLERANCE'])
+
+    if not monitor_slots.acquire(blocking=False):
+        response = jsonify({"message": "Hay demasiados monitores abiertos. Cierra alguno o inténtalo más tarde."})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(MONITOR_RETRY_AFTER_SECONDS)
+        return response
+
+    def events():
+        yield sse_event({'message': 'Monitor iniciado. Esperando datos...'}, event='status')
+        idle = 0.0
+        quiet = 0.0
+        while True:
+            if live.poll():
+                snapshot = live.snapshot()
+                snapshot['graph_data'] = {name: format_series_for_json(x, y)
+                                          for name, (x, y) in snapshot.pop('graph').items()}
+                yield sse_event(snapshot)
+                idle = quiet = 0.0
+            elif quiet >= idle_timeout:
+                # 'end' (y no un simple cierre) para que EventSource no vuelva a conectarse
+                yield sse_event({'message': f"Sin datos nuevos en {idle_timeout:g} s: monitor detenido."}, event='end')
+                return
+            elif idle >= MONITOR_HEARTBEAT_SECONDS:
+                yield ': ping\n\n'  # Mantiene viva la conexión a través de proxies
+                idle = 0.0
+            if not live.backlog:
+                time.sleep(interval)
+                idle += interval
+                quiet += interval
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    response = Response(events(), mimetype='text/event-stream', headers=headers)
+    # El hueco se libera al cerrar la respuesta: fin del stream o cliente desconectado
+    response.call_on_close(monitor_slots.release)
+    return response
+
+
+@app.route('/metrics')
+def metrics():
+    """Histogramas por etapa, tamaños y cachés en formato de texto de Prometheus."""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify({'parse': parse_cache.stats(), 'result': result_cache.stats()})
 
 
 if __name__ == '__main__':
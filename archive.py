@@ -0,0 +1,40 @@
+# archive.py
+"""
+Lectura de los miembros de un archivo zip o tar (también .tar.gz, .tar.bz2, .tar.xz)
+subido a /analyze_batch, de uno en uno y sin extraerlo a disco.
+
+El tar se lee en modo flujo ('r|*'), así que los miembros sólo pueden consumirse en
+orden: cada stream es válido hasta pedir el siguiente miembro.
+"""
+import tarfile
+import zipfile
+
+
+class ArchiveFormatError(ValueError):
+    """El archivo subido no es un zip ni un tar legible."""
+
+
+def iter_archive_members(file_stream):
+    """Genera (ruta del miembro, stream binario) para cada archivo regular del zip o tar."""
+    if zipfile.is_zipfile(file_stream):
+        file_stream.seek(0)
+        with zipfile.ZipFile(file_stream) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                with archive.open(info) as member:
+                    yield info.filename, member
+        return
+
+    file_stream.seek(0)
+    try:
+        archive = tarfile.open(fileobj=file_stream, mode='r|*')
+    except tarfile.TarError as e:
+        raise ArchiveFormatError("El archivo no es un zip ni un tar válido.") from e
+    with archive:
+        try:
+            for member in archive:
+                if member.isfile():
+                    yield member.name, archive.extractfile(member)
+        except tarfile.TarError as e:
+            raise ArchiveFormatError(f"Archivo tar dañado: {e}") from e
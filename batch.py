@@ -0,0 +1,212 @@
+# batch.py
+"""
+Análisis por lotes desde la línea de comandos: busca tríos ALLKE/ALLIE/ALLWK bajo
+un directorio, los analiza en paralelo con un pool de procesos y escribe una fila
+por cálculo (CSV o JSONL) en cuanto termina cada uno.
+
+Un trío son tres archivos del mismo directorio cuyos nombres sólo se diferencian
+en ALLKE/ALLIE/ALLWK (p. ej. run1_ALLKE.csv, run1_ALLIE.csv, run1_ALLWK.csv).
+El fallo de un cálculo se registra en su fila y no detiene los demás.
+
+Uso:
+    python batch.py DIRECTORIO [-o resultados.csv|resultados.jsonl] [-j PROCESOS] [--grid-points N]
+"""
+import argparse
+import collections
+import concurrent.futures
+import csv
+import json
+import os
+import re
+import sys
+import time
+
+from analysis import DEFAULT_RELATIVE_TIME_TOLERANCE, analyze_series, decision_category
+from compression import strip_compressed_extension
+from ingest import parse_energy_file
+
+ENERGY_NAMES = ('ALLKE', 'ALLIE', 'ALLWK')
+HISTORY_EXTENSIONS = ('.csv', '.txt', '.dat')
+_ENERGY_NAME_PATTERN = re.compile('|'.join(ENERGY_NAMES), re.IGNORECASE)
+
+EnergyJob = collections.namedtuple('EnergyJob', ['job', 'allke', 'allie', 'allwk'])
+
+RESULT_FIELDS = [
+    'job', 'status', 'category',
+    'time_RI_estable_menor_5pct', 'time_RI_estable_menor_1pct',
+    'time_RET_mayor_igual_1pct', 'time_RET_mayor_igual_5pct',
+    'porcentaje_tiempo_estable_RI_5pct', 'total_time',
+    'rows_allke', 'rows_allie', 'rows_allwk', 'skipped_rows',
+    'seconds', 'final_decision_text', 'error',
+]
+
+
+def energy_file_role(filename):
+    """
+    Para un nombre de historial devuelve (patrón del trío, 'ALLKE'|'ALLIE'|'ALLWK'),
+    donde el patrón es el nombre con la energía sustituida por '*'; None si no lo es.
+    Se aceptan también historiales comprimidos (run1_ALLKE.csv.gz).
+    """
+    if filename.startswith('.') or not strip_compressed_extension(filename).lower().endswith(HISTORY_EXTENSIONS):
+        return None  # Los ocultos (p. ej. '._run_ALLKE.csv' de macOS) no son historiales
+    matches = list(_ENERGY_NAME_PATTERN.finditer(filename))
+    if len(matches) != 1:
+        return None
+    match = matches[0]
+    return filename[:match.start()] + '*' + filename[match.end():], match.group(0).upper()
+
+
+def energy_file_job(path, default_name='job'):
+    """
+    (cálculo, energía) de una ruta relativa (separada por '/' o por os.sep): el cálculo
+    es el directorio y el nombre sin la energía. None si no es un historial.
+    """
+    directory, _, filename = path.replace(os.sep, '/').rpartition('/')
+    role = energy_file_role(filename)
+    if role is None:
+        return None
+    stem, energy = role
+    name = os.path.splitext(strip_compressed_extension(stem))[0].replace('*', '').strip('_-. ')
+    return '/'.join(part for part in (directory, name) if part) or default_name, energy
+
+
+def group_energy_files(paths, default_name='job'):
+    """
+    Agrupa rutas relativas (separadas por '/' o por os.sep) en tríos por directorio y
+    patrón de nombre. Devuelve ({cálculo: {energía: ruta}}, {cálculo: [energías que faltan]}),
+    ambos ordenados por nombre del cálculo.
+    """
+    groups = collections.defaultdict(dict)
+    for path in paths:
+        grouped = energy_file_job(path, default_name)
+        if grouped is not None:
+            job, energy = grouped
+            groups[job][energy] = path
+
+    complete, incomplete = {}, {}
+    for job, files in sorted(groups.items()):
+        if len(files) == len(ENERGY_NAMES):
+            complete[job] = files
+        else:
+            incomplete[job] = missing_energies(files)
+    return complete, incomplete
+
+
+def missing_energies(files):
+    """Energías que le faltan a un trío incompleto ({energía: ...})."""
+    return [energy for energy in ENERGY_NAMES if energy not in files]
+
+
+def discover_jobs(root):
+    """Tríos completos bajo `root`, ordenados por nombre. Los tríos incompletos se ignoran."""
+    paths = []
+    for directory, dirnames, filenames in os.walk(root):
+        relative_dir = os.path.relpath(directory, root)
+        for filename in filenames:
+            paths.append(filename if relative_dir == '.' else os.path.join(relative_dir, filename))
+    complete, _ = group_energy_files(paths, default_name=os.path.basename(os.path.abspath(root)))
+    return [EnergyJob(job, *(os.path.join(root, files[energy]) for energy in ENERGY_NAMES))
+            for job, files in complete.items()]
+
+
+def analyze_job(job, n_points=None, relative_tolerance=DEFAULT_RELATIVE_TIME_TOLERANCE):
+    """Analiza un trío y devuelve su fila de resultados. Nunca lanza excepciones."""
+    start = time.perf_counter()
+    row = dict.fromkeys(RESULT_FIELDS, None)
+    row['job'] = job.job
+    try:
+        parsed = [parse_energy_file(path) for path in (job.allke, job.allie, job.allwk)]
+        result = analyze_series(*((series.time, series.values) for series in parsed),
+                                relative_tolerance=relative_tolerance, n_points=n_points)
+    except (OSError, ValueError) as e:  # Incluye AnalysisInputError y los errores de formato
+        row.update(status='error', error=str(e))
+    except Exception as e:  # Un archivo corrupto no debe detener el lote
+        row.update(status='error', error=f'{type(e).__name__}: {e}')
+    else:
+        pct = result.porcentaje_tiempo_estable_RI_5pct if result.time_RI_estable_menor_5pct is not None else None
+        row.update(
+            status='ok',
+            category=decision_category(result.final_decision_text),
+            time_RI_estable_menor_5pct=result.time_RI_estable_menor_5pct,
+            time_RI_estable_menor_1pct=result.time_RI_estable_menor_1pct,
+            time_RET_mayor_igual_1pct=result.time_RET_mayor_igual_1pct,
+            time_RET_mayor_igual_5pct=result.time_RET_mayor_igual_5pct,
+            porcentaje_tiempo_estable_RI_5pct=float(pct) if pct is not None else None,
+            total_time=result.total_time,
+            rows_allke=parsed[0].rows, rows_allie=parsed[1].rows, rows_allwk=parsed[2].rows,
+            skipped_rows=sum(series.skipped_rows for series in parsed),
+            final_decision_text=result.final_decision_text,
+        )
+    row['seconds'] = round(time.perf_counter() - start, 4)
+    return row
+
+
+class ResultWriter:
+    """Escribe filas de resultados en CSV o JSONL, vaciando el buffer tras cada una."""
+
+    def __init__(self, stream, output_format):
+        self.stream = stream
+        self.output_format = output_format
+        if output_format == 'csv':
+            self._csv = csv.DictWriter(stream, fieldnames=RESULT_FIELDS)
+            self._csv.writeheader()
+
+    def write(self, row):
+        if self.output_format == 'csv':
+            self._csv.writerow({key: '' if value is None else value for key, value in row.items()})
+        else:
+            self.stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+        self.stream.flush()
+
+
+def run_batch(jobs, writer, workers=None, n_points=None, log=sys.stderr):
+    """Analiza `jobs` en un pool de procesos. Devuelve el número de cálculos fallidos."""
+    failures = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(analyze_job, job, n_points): job for job in jobs}
+        for done, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+            job = futures[future]
+            try:
+                row = future.result()
+            except Exception as e:  # El proceso del cálculo murió (p. ej. sin memoria)
+                row = dict.fromkeys(RESULT_FIELDS, None)
+                row.update(job=job.job, status='error', error=f'{type(e).__name__}: {e}')
+            failures += row['status'] != 'ok'
+            writer.write(row)
+            print(f"[{done}/{len(jobs)}] {row['job']}: {row['category'] or row['error']}", file=log)
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('root', help='directorio con los historiales (se recorre recursivamente)')
+    parser.add_argument('-o', '--output', default='-', help='archivo de resultados (por defecto, salida estándar)')
+    parser.add_argument('-f', '--format', choices=('csv', 'jsonl'),
+                        help='formato de salida (por defecto, según la extensión; csv en la salida estándar)')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help='procesos en paralelo')
+    parser.add_argument('--grid-points', type=int, help='remuestrear ALLKE/ALLIE a una malla de N puntos')
+    args = parser.parse_args(argv)
+
+    if args.grid_points is not None and args.grid_points < 2:
+        parser.error('--grid-points debe ser al menos 2')
+    output_format = args.format or ('jsonl' if args.output.endswith(('.jsonl', '.json')) else 'csv')
+
+    jobs = discover_jobs(args.root)
+    if not jobs:
+        print(f'No se encontraron tríos ALLKE/ALLIE/ALLWK en {args.root}', file=sys.stderr)
+        return 1
+    print(f'{len(jobs)} cálculos, {args.workers} procesos', file=sys.stderr)
+
+    start = time.perf_counter()
+    if args.output == '-':
+        failures = run_batch(jobs, ResultWriter(sys.stdout, output_format), args.workers, args.grid_points)
+    else:
+        with open(args.output, 'w', newline='', encoding='utf-8') as f:
+            failures = run_batch(jobs, ResultWriter(f, output_format), args.workers, args.grid_points)
+    print(f'{len(jobs) - failures} correctos, {failures} con error, {time.perf_counter() - start:.1f} s',
+          file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
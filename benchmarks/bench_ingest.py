@@ -0,0 +1,66 @@
+# benchmarks/bench_ingest.py
+"""
+Compara el motor de ingesta (ingest.parse_energy_buffer) con la implementación
+original de read_csv_with_optional_header.
+
+Uso:
+    python benchmarks/bench_ingest.py [filas ...]
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest import parse_energy_buffer  # noqa: E402
+from legacy import read_csv_with_optional_header as legacy_read_csv  # noqa: E402
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def make_csv(rows, separator=';', header=True):
+    time_values = np.linspace(0.0, 1.0, rows)
+    energy = np.cumsum(np.abs(np.sin(time_values * 40.0))) * 1e-3
+    body = '\n'.join(f'{t:.6e}{separator}{e:.6e}' for t, e in zip(time_values, energy))
+    prefix = f'X{separator}ALLKE\n' if header else ''
+    return (prefix + body + '\n').encode('utf-8')
+
+
+def best_of(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(sizes):
+    print(f"{'filas':>10} {'legacy (s)':>12} {'motor (s)':>12} {'speedup':>9}")
+    for rows in sizes:
+        data = make_csv(rows)
+
+        def run_legacy():
+            with contextlib.redirect_stdout(io.StringIO()):
+                legacy_read_csv(io.BytesIO(data), 'ALLKE')
+
+        def run_engine():
+            parse_energy_buffer(data)
+
+        legacy_df = None
+        with contextlib.redirect_stdout(io.StringIO()):
+            legacy_df = legacy_read_csv(io.BytesIO(data), 'ALLKE')
+        parsed = parse_energy_buffer(data)
+        assert np.array_equal(legacy_df['ALLKE'].to_numpy(), parsed.values)
+
+        t_legacy = best_of(run_legacy)
+        t_engine = best_of(run_engine)
+        print(f'{rows:>10} {t_legacy:>12.4f} {t_engine:>12.4f} {t_legacy / t_engine:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
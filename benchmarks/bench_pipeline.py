@@ -0,0 +1,173 @@
+# benchmarks/bench_pipeline.py
+"""
+Mide cada etapa del análisis por separado y la petición completa a /analyze
+(cliente de pruebas de Flask) sobre historiales sintéticos (synthetic.py) de
+varios tamaños. Los resultados se guardan en JSON en benchmarks/results/ para
+comparar entre commits.
+
+Uso:
+    python benchmarks/bench_pipeline.py [filas ...] [--large] [--repeat N] [--output archivo.json]
+    python benchmarks/bench_pipeline.py --compare antes.json despues.json
+"""
+import argparse
+import datetime
+import importlib.metadata
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import app as app_module  # noqa: E402
+from analysis import align_series, compute_ret, stable_condition_times  # noqa: E402
+from ingest import parse_energy_buffer  # noqa: E402
+from synthetic import energy_csv_files  # noqa: E402
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+# Con --large se miden también (varios GB de memoria y minutos por etapa)
+LARGE_SIZES = [10_000_000]
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+STAGES = ('read_csv', 'align', 'stable_condition', 'format_json', 'request')
+
+
+def best_of(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_size(rows, repeat):
+    files = energy_csv_files(rows)
+    flask_app = app_module.app
+
+    parsed = {name: parse_energy_buffer(data) for name, data in files.items()}
+    energy_time, allke, allie = align_series(parsed['ALLKE'].time, parsed['ALLKE'].values,
+                                             parsed['ALLIE'].time, parsed['ALLIE'].values)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ri = np.where(allie > 1e-9, (allke / allie) * 100, np.nan)
+    ret = compute_ret(parsed['ALLWK'].values)
+
+    def run_read_csv():
+        # La etapa conserva su nombre para poder comparar con resultados anteriores
+        for data in files.values():
+            parse_energy_buffer(data)
+
+    def run_align():
+        align_series(parsed['ALLKE'].time, parsed['ALLKE'].values, parsed['ALLIE'].time, parsed['ALLIE'].values)
+
+    def run_stable_condition():
+        stable_condition_times(energy_time, ri, [5.0, 1.0], op='<')
+        stable_condition_times(parsed['ALLWK'].time, ret, [1.0, 5.0], op='>=', look_from_end=False)
+
+    def run_format_json():
+        app_module.format_series_for_json(energy_time, ri)
+
+    client = flask_app.test_client()
+
+    def run_request():
+        # Sin caché: cada repetición mide el análisis completo
+        app_module.parse_cache.clear()
+        app_module.result_cache.clear()
+        response = client.post('/analyze', data={
+            'allke_csv': (io.BytesIO(files['ALLKE']), 'allke.csv'),
+            'allie_csv': (io.BytesIO(files['ALLIE']), 'allie.csv'),
+            'allwk_csv': (io.BytesIO(files['ALLWK']), 'allwk.csv'),
+        })
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+    timings = {
+        'read_csv': best_of(run_read_csv, repeat),
+        'align': best_of(run_align, repeat),
+        'stable_condition': best_of(run_stable_condition, repeat),
+        'format_json': best_of(run_format_json, repeat),
+        'request': best_of(run_request, repeat),
+    }
+    return {
+        'rows': rows,
+        'file_rows': {name: int(series.rows) for name, series in parsed.items()},
+        'input_bytes': sum(len(data) for data in files.values()),
+        'seconds': timings,
+    }
+
+
+def run(sizes, repeat, output):
+    app_module.app.logger.setLevel('WARNING')
+    results = {
+        'revision': git_revision(),
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': importlib.metadata.version('pandas'),  # Sin importarlo: ver ingest.py
+        'machine': platform.machine(),
+        'repeat': repeat,
+        'sizes': [],
+    }
+    print(f"{'filas':>10} " + ' '.join(f'{stage:>17}' for stage in STAGES))
+    for rows in sizes:
+        entry = bench_size(rows, repeat if rows < 1_000_000 else 1)
+        results['sizes'].append(entry)
+        print(f'{rows:>10} ' + ' '.join(f"{entry['seconds'][stage]:>17.4f}" for stage in STAGES))
+
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{results['revision'] or 'local'}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f'Resultados guardados en {output}')
+
+
+def compare(before_path, after_path):
+    """Imprime la relación después/antes de cada etapa para los tamaños comunes."""
+    with open(before_path, encoding='utf-8') as f:
+        before = {entry['rows']: entry['seconds'] for entry in json.load(f)['sizes']}
+    with open(after_path, encoding='utf-8') as f:
+        after = {entry['rows']: entry['seconds'] for entry in json.load(f)['sizes']}
+    print(f"{'filas':>10} " + ' '.join(f'{stage:>17}' for stage in STAGES))
+    for rows in sorted(set(before) & set(after)):
+        ratios = []
+        for stage in STAGES:
+            if stage in before[rows] and stage in after[rows] and before[rows][stage] > 0:
+                ratios.append(f'{after[rows][stage] / before[rows][stage]:>16.2f}x')
+            else:
+                ratios.append(f"{'-':>17}")
+        print(f'{rows:>10} ' + ' '.join(ratios))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('sizes', nargs='*', type=int, help='filas de ALLKE (por defecto 1e3 a 1e6)')
+    parser.add_argument('--large', action='store_true', help='mide también 1e7 filas')
+    parser.add_argument('--repeat', type=int, default=3, help='repeticiones por etapa (se toma la mejor)')
+    parser.add_argument('--output', help='archivo JSON de resultados (por defecto en benchmarks/results/)')
+    parser.add_argument('--compare', nargs=2, metavar=('ANTES', 'DESPUES'), help='compara dos archivos de resultados')
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+    else:
+        sizes = args.sizes or DEFAULT_SIZES
+        if args.large:
+            sizes = sizes + [rows for rows in LARGE_SIZES if rows not in sizes]
+        run(sizes, args.repeat, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+# benchmarks/bench_startup.py
+"""
+Mide el arranque y la memoria de la aplicación actual frente al app.py original
+(el primer commit del repositorio, extraído con git archive a un directorio temporal):
+
+  - import: tiempo de `import app`, RSS del proceso después del import y después de
+    un primer /analyze pequeño (cliente de pruebas de Flask), y si pandas llegó a
+    cargarse (mediana de --repeat procesos nuevos);
+  - gunicorn: tiempo desde que se lanza hasta la primera respuesta de `/` y memoria
+    (RSS y PSS de /proc/<pid>/smaps_rollup) del maestro y de los workers, en reposo y
+    después de unos /analyze pequeños. Se compara el arranque del Procfile original,
+    el de la aplicación actual sin precarga y el de gunicorn.conf.py (con precarga).
+
+El PSS reparte las páginas compartidas entre los procesos que las usan: es la
+medida que refleja lo que ahorra cargar la aplicación en el maestro antes del fork.
+Sólo funciona en Linux (/proc).
+
+Uso:
+    python benchmarks/bench_startup.py [--workers N] [--repeat N] [--rows N] [--output archivo.json]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from synthetic import energy_csv_files  # noqa: E402
+
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+READY_TIMEOUT_SECONDS = 60
+SETTLE_TIMEOUT_SECONDS = 30
+
+# Se ejecuta en un proceso nuevo dentro del árbol medido; escribe el resultado en
+# argv[1] porque el app.py original imprime en stdout durante el análisis
+IMPORT_PROBE = r'''
+import json, sys, time
+start = time.perf_counter()
+import app
+import_seconds = time.perf_counter() - start
+
+def rss_kb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+
+result = {'import_seconds': import_seconds, 'rss_import_kb': rss_kb(),
+          'pandas_after_import': 'pandas' in sys.modules}
+paths = json.loads(sys.argv[2])
+client = app.app.test_client()
+start = time.perf_counter()
+with open(paths['ALLKE'], 'rb') as allke, open(paths['ALLIE'], 'rb') as allie, open(paths['ALLWK'], 'rb') as allwk:
+    response = client.post('/analyze', data={'allke_csv': (allke, 'allke.csv'), 'allie_csv': (allie, 'allie.csv'),
+                                             'allwk_csv': (allwk, 'allwk.csv')})
+result.update(first_request_seconds=time.perf_counter() - start, status=response.status_code,
+              rss_request_kb=rss_kb(), pandas_after_request='pandas' in sys.modules)
+with open(sys.argv[1], 'w') as f:
+    json.dump(result, f)
+'''
+
+
+def git(*args, cwd=REPO_DIR):
+    return subprocess.run(['git', *args], cwd=cwd, capture_output=True, check=True).stdout
+
+
+def extract_revision(revision, target):
+    """Extrae el árbol de `revision` en `target` (sin tocar el directorio de trabajo)."""
+    archive = git('archive', '--format=tar', revision)
+    subprocess.run(['tar', '-x', '-C', target], input=archive, check=True)
+
+
+def write_input_files(rows, target):
+    paths = {}
+    for name, data in energy_csv_files(rows).items():
+        paths[name] = os.path.join(target, f'{name.lower()}.csv')
+        with open(paths[name], 'wb') as f:
+            f.write(data)
+    return paths
+
+
+def bench_import(tree, paths, repeat):
+    """Mediana de cada medida sobre `repeat` procesos nuevos."""
+    runs = []
+    for _ in range(repeat):
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            subprocess.run([sys.executable, '-c', IMPORT_PROBE, output.name, json.dumps(paths)], cwd=tree,
+                           stdout=subprocess.DEVNULL, check=True)
+            runs.append(json.load(output))
+    assert all(run['status'] == 200 for run in runs), runs
+    return {key: statistics.median(run[key] for run in runs) if not isinstance(runs[0][key], bool) else runs[-1][key]
+            for key in runs[0]}
+
+
+def process_memory_kb(pid):
+    """(RSS, PSS) de un proceso en kB."""
+    memory = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('Rss', 'Pss'):
+                memory[key] = int(value.split()[0])
+    return memory['Rss'], memory['Pss']
+
+
+def child_pids(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(child) for child in f.read().split()]
+    except FileNotFoundError:
+        return []
+
+
+def server_memory(master_pid):
+    """Memoria del maestro y de sus workers."""
+    workers = [process_memory_kb(pid) for pid in child_pids(master_pid)]
+    master_rss, master_pss = process_memory_kb(master_pid)
+    return {
+        'workers': len(workers),
+        'master_rss_kb': master_rss,
+        'worker_rss_kb': [rss for rss, _ in workers],
+        'total_pss_kb': master_pss + sum(pss for _, pss in workers),
+    }
+
+
+def wait_settled(master_pid, workers):
+    """Espera a que arranquen todos los workers y su memoria deje de crecer."""
+    deadline = time.monotonic() + SETTLE_TIMEOUT_SECONDS
+    previous = None
+    while time.monotonic() < deadline:
+        time.sleep(0.5)
+        if len(child_pids(master_pid)) < workers:
+            continue
+        memory = server_memory(master_pid)
+        if previous is not None and abs(memory['total_pss_kb'] - previous) <= 0.01 * previous:
+            return memory
+        previous = memory['total_pss_kb']
+    return server_memory(master_pid)
+
+
+def multipart_body(paths):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, path in paths.items():
+        with open(path, 'rb') as f:
+            data = f.read()
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name.lower()}_csv"; '
+                     f'filename="{name.lower()}.csv"\r\nContent-Type: text/csv\r\n\r\n'.encode() + data + b'\r\n')
+    return b''.join(parts) + f'--{boundary}--\r\n'.encode(), f'multipart/form-data; boundary={boundary}'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def bench_gunicorn(tree, extra_args, workers, paths):
+    port = free_port()
+    command = [sys.executable, '-m', 'gunicorn', 'app:app', '--workers', str(workers),
+               '--bind', f'127.0.0.1:{port}', *extra_args]
+    start = time.perf_counter()
+    server = subprocess.Popen(command, cwd=tree, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        ready_seconds = None
+        while time.perf_counter() - start < READY_TIMEOUT_SECONDS:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=5) as response:
+                    if response.status == 200:
+                        ready_seconds = time.perf_counter() - start
+                        break
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        if ready_seconds is None:
+            raise RuntimeError(f'gunicorn no respondió en {READY_TIMEOUT_SECONDS} s: {" ".join(command)}')
+        idle = wait_settled(server.pid, workers)
+
+        body, content_type = multipart_body(paths)
+        for _ in range(2 * workers):
+            analyze = urllib.request.Request(f'http://127.0.0.1:{port}/analyze', data=body,
+                                             headers={'Content-Type': content_type})
+            with urllib.request.urlopen(analyze, timeout=60) as response:
+                assert response.status == 200
+        after_requests = server_memory(server.pid)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+    return {'command': ' '.join(command[2:]), 'ready_seconds': ready_seconds, 'idle': idle,
+            'after_requests': after_requests}
+
+
+def run(workers, repeat, rows, output):
+    revision = git('rev-parse', '--short', 'HEAD').decode().strip()
+    baseline_revision = git('rev-list', '--max-parents=0', 'HEAD').decode().split()[0][:7]
+    results = {
+        'revision': revision,
+        'baseline_revision': baseline_revision,
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'workers': workers,
+        'rows': rows,
+        'repeat': repeat,
+    }
+    with tempfile.TemporaryDirectory() as baseline_tree, tempfile.TemporaryDirectory() as data_dir:
+        extract_revision(baseline_revision, baseline_tree)
+        paths = write_input_files(rows, data_dir)
+
+        results['import'] = {
+            'original': bench_import(baseline_tree, paths, repeat),
+            'actual': bench_import(REPO_DIR, paths, repeat),
+        }
+        print(f"{'import':<22} {'segundos':>9} {'RSS import':>11} {'RSS 1er análisis':>17} {'pandas':>7}")
+        for name, entry in results['import'].items():
+            print(f"{name:<22} {entry['import_seconds']:>9.3f} {entry['rss_import_kb'] / 1024:>9.1f}MB "
+                  f"{entry['rss_request_kb'] / 1024:>15.1f}MB {str(entry['pandas_after_request']):>7}")
+
+        # '-c /dev/null': sin gunicorn.conf.py, que gunicorn carga por defecto si existe
+        variants = {
+            'original': (baseline_tree, ['--worker-class', 'gthread', '--threads', '8']),
+            'actual sin precarga': (REPO_DIR, ['-c', '/dev/null', '--worker-class', 'gthread', '--threads', '8']),
+            'actual (conf)': (REPO_DIR, ['-c', os.path.join(REPO_DIR, 'gunicorn.conf.py')]),
+        }
+        results['gunicorn'] = {}
+        print(f"\n{'gunicorn':<22} {'listo (s)':>9} {'RSS/worker':>11} {'PSS total':>10} {'PSS tras /analyze':>18}")
+        for name, (tree, extra_args) in variants.items():
+            entry = results['gunicorn'][name] = bench_gunicorn(tree, extra_args, workers, paths)
+            worker_rss = statistics.mean(entry['idle']['worker_rss_kb'])
+            print(f"{name:<22} {entry['ready_seconds']:>9.3f} {worker_rss / 1024:>9.1f}MB "
+                  f"{entry['idle']['total_pss_kb'] / 1024:>8.1f}MB {entry['after_requests']['total_pss_kb'] / 1024:>16.1f}MB")
+
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f'{stamp}-{revision}-startup.json')
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f'Resultados guardados en {output}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=2, help='workers de gunicorn (por defecto 2)')
+    parser.add_argument('--repeat', type=int, default=5, help='procesos por medida de import (se toma la mediana)')
+    parser.add_argument('--rows', type=int, default=1_000, help='filas de ALLKE de los /analyze de prueba')
+    parser.add_argument('--output', help='archivo JSON de resultados (por defecto en benchmarks/results/)')
+    args = parser.parse_args()
+    run(args.workers, args.repeat, args.rows, args.output)
+
+
+if __name__ == '__main__':
+    main()
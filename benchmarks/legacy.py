@@ -0,0 +1,140 @@
+# benchmarks/legacy.py
+"""
+Implementaciones originales de app.py, conservadas sólo como referencia para los
+benchmarks (velocidad y equivalencia de resultados). No las usa la aplicación.
+"""
+import io
+
+import pandas as pd
+
+COL_TIME = 'Time'
+
+
+def read_csv_with_optional_header(file_stream, value_col_name):
+    print(f"\n--- Procesando archivo para: {value_col_name} ---")
+    file_content_bytes = file_stream.read()
+    try:
+        file_content = file_content_bytes.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        file_content = file_content_bytes.decode('utf-8', errors='replace')
+
+    s_io_for_peek = io.StringIO(file_content)
+    first_line_peek = s_io_for_peek.readline().strip()
+    print(f"Primera línea detectada para heurística: '{first_line_peek}'")
+
+    df = pd.DataFrame() # Inicializar df vacío
+    
+    # Intentar con separador ';' primero
+    possible_separators = [';', ',']
+    
+    for sep_char in possible_separators:
+        print(f"Intentando con separador: '{sep_char}'")
+        s_io_for_pandas = io.StringIO(file_content) # Necesitamos un nuevo stream para cada intento de read_csv
+        
+        is_likely_text_header = False
+        if first_line_peek:
+            try:
+                fields = first_line_peek.split(sep_char)
+                if len(fields) >= 2:
+                    float(fields[0]) 
+                    # Para el segundo campo, tomar solo la parte antes de un posible ';' o ',' si es cabecera con descripción
+                    # Esto es complicado porque el separador de descripción podría ser el mismo que el de datos
+                    # Por simplicidad, si la conversión a float falla, es cabecera.
+                    second_field_value_part = fields[1].split(';')[0].split(',')[0] # Tomar la parte numérica antes de cualquier descripción
+                    float(second_field_value_part)
+                else:
+                    print(f"Heurística (sep='{sep_char}'): No hay suf. campos, asumiendo cabecera.")
+                    is_likely_text_header = True
+            except (ValueError, IndexError):
+                print(f"Heurística (sep='{sep_char}'): Error convirtiendo primera línea, asumiendo cabecera.")
+                is_likely_text_header = True
+        
+        print(f"Resultado heurística (sep='{sep_char}'): is_likely_text_header = {is_likely_text_header}")
+
+        current_df = pd.DataFrame()
+        try:
+            if is_likely_text_header:
+                print(f"Leyendo CSV con header=0, sep='{sep_char}'")
+                current_df = pd.read_csv(s_io_for_pandas, sep=sep_char, header=0, usecols=[0, 1], 
+                                         names=[COL_TIME, value_col_name], on_bad_lines='skip', engine='python')
+            else:
+                print(f"Leyendo CSV con header=None, sep='{sep_char}'")
+                current_df = pd.read_csv(s_io_for_pandas, sep=sep_char, header=None, 
+                                         names=[COL_TIME, value_col_name], on_bad_lines='skip', engine='python')
+            
+            # Verificar si el DataFrame tiene las columnas esperadas y no está completamente vacío
+            if not current_df.empty and COL_TIME in current_df.columns and value_col_name in current_df.columns:
+                # Intentar conversión a numérico
+                temp_time_col = pd.to_numeric(current_df[COL_TIME], errors='coerce')
+                temp_value_col = pd.to_numeric(current_df[value_col_name], errors='coerce')
+                
+                # Si la mayoría de los valores se pudieron convertir, este es probablemente el separador correcto
+                if temp_time_col.notna().sum() > (len(current_df) / 2) and \
+                   temp_value_col.notna().sum() > (len(current_df) / 2) and \
+                   temp_time_col.notna().sum() > 0 : # Asegurarse que al menos una fila es válida
+                    print(f"Separador '{sep_char}' parece correcto.")
+                    df = current_df.copy() # Usar este df
+                    # Aplicar las conversiones finales
+                    df[COL_TIME] = temp_time_col
+                    df[value_col_name] = temp_value_col
+                    break # Salir del bucle de separadores
+            print(f"DataFrame DESPUÉS de pd.read_csv (sep='{sep_char}'):\n{current_df.head()}")
+
+        except Exception as e:
+            print(f"Error en pd.read_csv (sep='{sep_char}'): {e}")
+            continue # Probar con el siguiente separador
+
+    if df.empty:
+        print("No se pudo parsear el CSV con los separadores probados o resultó vacío.")
+        return pd.DataFrame(columns=[COL_TIME, value_col_name]) # Devolver DF vacío estructurado
+
+    print(f"DataFrame ANTES de dropna (primeras 5 filas):\n{df.head()}")
+    print(f"Tipos de datos ANTES de dropna:\n{df.dtypes}")
+    print(f"Número de NaNs en COL_TIME: {df[COL_TIME].isna().sum()}")
+    print(f"Número de NaNs en {value_col_name}: {df[value_col_name].isna().sum()}")
+
+    df.dropna(subset=[COL_TIME, value_col_name], inplace=True)
+    print(f"DataFrame DESPUÉS de dropna (primeras 5 filas):\n{df.head()}")
+    print(f"Tamaño del DataFrame final: {df.shape}")
+    
+    if df.empty: # Comprobación adicional por si dropna lo vació todo
+        print("DataFrame vacío después de dropna.")
+        return pd.DataFrame(columns=[COL_TIME, value_col_name])
+
+    return df.sort_values(by=COL_TIME).reset_index(drop=True)
+
+
+def find_first_time_stable_condition(df, time_col, value_col, condition_func, look_from_end=True):
+    """
+    Encuentra el primer tiempo desde el cual una condición se cumple ESTABLEMENTE hasta el final (o inicio).
+    """
+    if df.empty:
+        return None
+
+    if look_from_end:
+        last_unstable_idx = -1
+        for i in range(len(df) - 1, -1, -1):
+            if not condition_func(df[value_col].iloc[i]):
+                last_unstable_idx = i
+                break
+        
+        if last_unstable_idx == -1:
+            return df[time_col].iloc[0]
+        elif last_unstable_idx == len(df) - 1:
+            return None 
+        else:
+            return df[time_col].iloc[last_unstable_idx + 1]
+    else: 
+        for i in range(len(df)):
+            if condition_func(df[value_col].iloc[i]):
+                return df[time_col].iloc[i]
+        return None
+
+
+def align_energy_merge(df_allke, df_allie):
+    """Alineación original de ALLKE/ALLIE en analyze_data (merge outer + interpolate)."""
+    df_energy = pd.merge(df_allke, df_allie, on=COL_TIME, how='outer').sort_values(by=COL_TIME)
+    df_energy['ALLKE'] = df_energy['ALLKE'].interpolate(method='linear')
+    df_energy['ALLIE'] = df_energy['ALLIE'].interpolate(method='linear')
+    df_energy.dropna(subset=['ALLKE', 'ALLIE'], inplace=True)
+    return df_energy
@@ -0,0 +1,82 @@
+# benchmarks/synthetic.py
+"""
+Generador de historiales de energía sintéticos con la forma de un cálculo explícito
+real, para los benchmarks:
+  - ALLKE con un pico al inicio de la carga y oscilaciones que se amortiguan;
+  - ALLIE y ALLWK monótonas crecientes;
+  - tiempos repetidos en ALLKE (como los que deja un reinicio del cálculo);
+  - muestreo distinto en cada archivo (ALLIE no uniforme, ALLWK con la mitad de filas);
+  - ALLKE con cabecera y ';', ALLIE sin cabecera y ',', ALLWK con cabecera y ','.
+"""
+import io
+
+import numpy as np
+import pandas as pd
+
+# Fracción de filas de ALLKE que se repiten con el mismo tiempo
+DUPLICATE_FRACTION = 0.001
+# Filas de ALLIE y ALLWK respecto a las de ALLKE
+ALLIE_ROWS_RATIO = 0.75
+ALLWK_ROWS_RATIO = 0.5
+
+FILE_FORMATS = {
+    'ALLKE': {'separator': ';', 'header': True},
+    'ALLIE': {'separator': ',', 'header': False},
+    'ALLWK': {'separator': ',', 'header': True},
+}
+
+
+def _kinetic_energy(time, rng):
+    onset = 0.05
+    spike = 8.0 * np.exp(-((time - onset) / 0.015) ** 2)
+    ringing = 0.6 * np.exp(-time / 0.15) * np.abs(np.sin(2 * np.pi * 25.0 * time))
+    noise = 0.01 * rng.random(time.size)
+    return spike + ringing + noise + 0.02
+
+
+def _internal_energy(time):
+    return 0.01 + 100.0 * time + 20.0 * time ** 2
+
+
+def _external_work(time):
+    return 100.0 * time ** 2 + 5.0 * time
+
+
+def energy_histories(rows, seed=0):
+    """
+    Devuelve {nombre: (tiempo, valores)} con `rows` filas en ALLKE y muestreos
+    distintos en ALLIE y ALLWK. Los tiempos van de 0 a 1 s y están ordenados.
+    """
+    rng = np.random.default_rng(seed)
+    rows = int(rows)
+
+    ke_time = np.linspace(0.0, 1.0, rows)
+    duplicates = rng.choice(rows, size=int(rows * DUPLICATE_FRACTION), replace=False)
+    ke_time = np.sort(np.concatenate([ke_time, ke_time[duplicates]]))
+
+    ie_rows = max(int(rows * ALLIE_ROWS_RATIO), 2)
+    ie_time = np.sort(np.concatenate([[0.0, 1.0], rng.random(ie_rows - 2)]))
+
+    wk_rows = max(int(rows * ALLWK_ROWS_RATIO), 2)
+    wk_time = np.linspace(0.0, 1.0, wk_rows)
+
+    return {
+        'ALLKE': (ke_time, _kinetic_energy(ke_time, rng)),
+        'ALLIE': (ie_time, _internal_energy(ie_time)),
+        'ALLWK': (wk_time, _external_work(wk_time)),
+    }
+
+
+def to_csv_bytes(time, values, name, separator=';', header=True):
+    buffer = io.StringIO()
+    frame = pd.DataFrame({'X': time, name: values})
+    frame.to_csv(buffer, sep=separator, header=header, index=False, float_format='%.9e')
+    return buffer.getvalue().encode('utf-8')
+
+
+def energy_csv_files(rows, seed=0):
+    """Los tres historiales como contenido CSV, cada uno con su formato (FILE_FORMATS)."""
+    files = {}
+    for name, (time, values) in energy_histories(rows, seed).items():
+        files[name] = to_csv_bytes(time, values, name, **FILE_FORMATS[name])
+    return files
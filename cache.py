@@ -0,0 +1,108 @@
+# cache.py
+"""
+Caché LRU en memoria, limitada por bytes, con contadores de aciertos y fallos.
+
+La aplicación usa dos niveles, ambos direccionados por el contenido de los archivos:
+  - series parseadas, por hash de cada archivo subido;
+  - análisis completos, por el hash del trío ALLKE/ALLIE/ALLWK.
+"""
+import collections
+import hashlib
+import threading
+
+# Tamaño de bloque al calcular el hash de buffers grandes
+HASH_BLOCK_BYTES = 8 * 1024 * 1024
+
+
+def content_hash(buf):
+    """Hash (hex) del contenido de un buffer de bytes (bytes, memoryview o mmap)."""
+    digest = hashlib.blake2b(digest_size=20)
+    view = memoryview(buf)
+    for start in range(0, len(view), HASH_BLOCK_BYTES):
+        digest.update(view[start:start + HASH_BLOCK_BYTES])
+    view.release()
+    return digest.hexdigest()
+
+
+def combined_key(*keys):
+    """Clave única para una combinación de claves de contenido."""
+    return hashlib.blake2b('|'.join(keys).encode('ascii'), digest_size=16).hexdigest()
+
+
+class LRUCache:
+    """
+    Caché LRU limitada por el tamaño total (en bytes) de sus entradas.
+
+    Una entrada puede ocupar además disco (`disk_bytes`: archivos temporales mapeados,
+    que se liberan cuando nadie más usa la entrada), con su propio límite
+    `max_disk_bytes`: se desalojan entradas hasta cumplir los dos límites.
+    Una entrada mayor que alguno de ellos no se guarda. Es segura entre hilos.
+    """
+
+    def __init__(self, max_bytes, name='cache', max_disk_bytes=0):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.current_disk_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def peek(self, key):
+        """Como get() pero sin contar acierto/fallo ni cambiar el orden LRU."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry[0]
+
+    def put(self, key, value, nbytes, disk_bytes=0):
+        if nbytes > self.max_bytes or disk_bytes > self.max_disk_bytes:
+            return False
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+                self.current_disk_bytes -= previous[2]
+            self._entries[key] = (value, nbytes, disk_bytes)
+            self.current_bytes += nbytes
+            self.current_disk_bytes += disk_bytes
+            while self.current_bytes > self.max_bytes or self.current_disk_bytes > self.max_disk_bytes:
+                _, (_, evicted_bytes, evicted_disk_bytes) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_bytes
+                self.current_disk_bytes -= evicted_disk_bytes
+                self.evictions += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.current_disk_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'disk_bytes': self.current_disk_bytes,
+                'max_disk_bytes': self.max_disk_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
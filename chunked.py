@@ -0,0 +1,359 @@
+# chunked.py
+"""
+Modo por bloques (fuera de memoria) para historiales con decenas de millones de filas.
+
+Cada archivo se lee por bloques de CHUNK_ROWS filas (ingest.TableChunkReader) y el
+análisis se hace en una sola pasada hacia delante, sin tener nunca una serie
+completa en memoria:
+  - la alineación ALLKE/ALLIE reproduce align_series por tramos: los tiempos repetidos
+    se colapsan con un bloque de retraso (la última muestra de cada bloque espera a la
+    siguiente) y la unión de ejes sólo avanza hasta el último tiempo leído de ambas;
+  - "RI < x% estable hasta el final" no necesita recorrer la serie al revés: basta
+    con recordar, por umbral, la muestra siguiente al último incumplimiento;
+  - RET se normaliza con el último valor de ALLWK, que se lee antes del final del
+    archivo (ingest.last_table_row), así que el primer cruce se detecta al vuelo.
+Los tiempos críticos y la decisión son idénticos a los del análisis en memoria.
+
+La vista general de cada serie se diezma al vuelo (StreamingDecimator); las series
+completas se vuelcan a archivos temporales (float32 opcional para los valores) para
+servir el zoom de /series sin tenerlas en memoria.
+
+El modo necesita historiales ordenados por tiempo; si no lo están (o el final del
+archivo no se puede leer), ChunkedModeUnsupported indica que hay que usar el
+análisis en memoria.
+"""
+import collections
+import tempfile
+
+import numpy as np
+
+from analysis import DEFAULT_RELATIVE_TIME_TOLERANCE, AnalysisInputError, compute_ri, dedupe_times, quasistatic_decision
+from decimation import Pyramid, StreamingDecimator
+from ingest import TableChunkReader, UnsortedHistoryError, last_table_row
+
+# Filas por bloque al leer cada archivo
+CHUNK_ROWS = 200_000
+RI_THRESHOLDS = (5.0, 1.0)
+RET_THRESHOLDS = (1.0, 5.0)
+
+ChunkedResult = collections.namedtuple('ChunkedResult', [
+    'time_RI_estable_menor_5pct', 'time_RI_estable_menor_1pct',
+    'time_RET_mayor_igual_1pct', 'time_RET_mayor_igual_5pct',
+    'total_time', 'porcentaje_tiempo_estable_RI_5pct', 'final_decision_text',
+    'overviews', 'series', 'readers',
+])
+
+
+class ChunkedModeUnsupported(Exception):
+    """Los archivos no se pueden analizar por bloques; hay que usar el análisis en memoria."""
+
+
+class DedupeStream:
+    """
+    dedupe_times por bloques: colapsa tiempos separados como mucho `tol` conservando
+    la última muestra. La última muestra de cada bloque se retiene hasta conocer la
+    siguiente, así que el resultado es idéntico al de la serie completa.
+    """
+
+    def __init__(self, tol):
+        self.tol = tol
+        self._carry_t = np.empty(0)
+        self._carry_v = np.empty(0)
+
+    def push(self, time, values):
+        time = np.concatenate([self._carry_t, time])
+        values = np.concatenate([self._carry_v, values])
+        if time.size == 0:
+            return time, values
+        keep = time[1:] - time[:-1] > self.tol
+        self._carry_t, self._carry_v = time[-1:], values[-1:]
+        return time[:-1][keep], values[:-1][keep]
+
+    def finish(self):
+        time, values = self._carry_t, self._carry_v
+        self._carry_t, self._carry_v = np.empty(0), np.empty(0)
+        return time, values
+
+    @property
+    def pending(self):
+        """(tiempo, valor) retenidos hasta el próximo bloque (vacíos o de una muestra)."""
+        return self._carry_t, self._carry_v
+
+    def peek(self, time, values):
+        """Lo que devolverían push(time, values) seguido de finish(), sin cambiar el estado."""
+        return dedupe_times(np.concatenate([self._carry_t, time]), np.concatenate([self._carry_v, values]), self.tol)
+
+
+class SpillArray:
+    """Array que crece por el final escribiendo en un archivo temporal; finish() lo mapea."""
+
+    def __init__(self, dtype=np.float64):
+        self.dtype = np.dtype(dtype)
+        self.size = 0
+        self._file = tempfile.TemporaryFile()
+
+    def extend(self, values):
+        np.ascontiguousarray(values, dtype=self.dtype).tofile(self._file)
+        self.size += len(values)
+
+    def finish(self):
+        """Devuelve un np.memmap de sólo lectura (el archivo se borra al liberarlo)."""
+        if self.size == 0:
+            self._file.close()
+            return np.empty(0, dtype=self.dtype)
+        self._file.flush()
+        array = np.memmap(self._file, dtype=self.dtype, mode='r', shape=(self.size,))
+        self._file.close()  # El mapa conserva su propio descriptor
+        return array
+
+
+class _StableTracker:
+    """
+    stable_condition_times(..., op='<') hacia delante: por umbral se guarda el tiempo
+    de la muestra siguiente al último incumplimiento (NaN incumple siempre).
+    """
+
+    def __init__(self, thresholds):
+        self.thresholds = thresholds
+        self._since = {threshold: None for threshold in thresholds}
+        self._waiting_next = {threshold: True for threshold in thresholds}
+
+    def extend(self, time, values):
+        if time.size == 0:
+            return
+        for threshold in self.thresholds:
+            if self._waiting_next[threshold]:
+                self._since[threshold], self._waiting_next[threshold] = float(time[0]), False
+            unstable = np.flatnonzero(~(values < threshold))
+            if unstable.size:
+                last = int(unstable[-1])
+                if last + 1 < time.size:
+                    self._since[threshold] = float(time[last + 1])
+                else:
+                    self._since[threshold], self._waiting_next[threshold] = None, True
+
+    def result(self, threshold):
+        return None if self._waiting_next[threshold] else self._since[threshold]
+
+
+class _CrossingTracker:
+    """stable_condition_times(..., op='>=', look_from_end=False) hacia delante."""
+
+    def __init__(self, thresholds):
+        self.thresholds = thresholds
+        self._first = {threshold: None for threshold in thresholds}
+
+    def extend(self, time, values):
+        for threshold in self.thresholds:
+            if self._first[threshold] is None:
+                crossing = np.flatnonzero(values >= threshold)
+                if crossing.size:
+                    self._first[threshold] = float(time[crossing[0]])
+
+    def result(self, threshold):
+        return self._first[threshold]
+
+
+class _SeriesCursor:
+    """Serie ya sin tiempos repetidos, leída por bloques y consumida por la alineación."""
+
+    def __init__(self, reader, tol):
+        self._chunks = iter(reader)
+        self._dedupe = DedupeStream(tol)
+        self.time = np.empty(0)
+        self.values = np.empty(0)
+        self.first_time = None
+        self.exhausted = False
+        self.consumed = 0  # Muestras de self.time ya incorporadas a la unión de ejes
+
+    @property
+    def last_time(self):
+        return self.time[-1] if self.time.size else None
+
+    def read_more(self):
+        try:
+            time, values = next(self._chunks)
+            time, values = self._dedupe.push(time, values)
+        except StopIteration:
+            time, values = self._dedupe.finish()
+            self.exhausted = True
+        if time.size:
+            if self.first_time is None:
+                self.first_time = time[0]
+            self.time = np.concatenate([self.time, time])
+            self.values = np.concatenate([self.values, values])
+
+    def take_until(self, horizon):
+        """Tiempos todavía no incorporados a la unión que son <= horizon."""
+        end = int(np.searchsorted(self.time, horizon, side='right'))
+        taken = self.time[self.consumed:end]
+        self.consumed = max(self.consumed, end)
+        return taken
+
+    def interp(self, times):
+        # Sólo hace falta la muestra anterior al primer tiempo pedido
+        start = max(int(np.searchsorted(self.time, times[0])) - 1, 0)
+        return np.interp(times, self.time[start:], self.values[start:])
+
+    def discard_before(self, time):
+        """Libera las muestras anteriores a la que precede a `time`."""
+        cut = max(int(np.searchsorted(self.time, time)) - 1, 0)
+        cut = min(cut, self.consumed)
+        if cut:
+            self.time, self.values = self.time[cut:], self.values[cut:]
+            self.consumed -= cut
+
+
+def _read_edges(reader, name):
+    chunks = iter(TableChunkReader(reader.buf, 2, reader.dialect, chunk_rows=1024))
+    try:
+        first = next(chunks)
+    except StopIteration:
+        first = None
+    except UnsortedHistoryError as e:
+        raise ChunkedModeUnsupported(f"{name}: {e}") from e
+    finally:
+        chunks.close()
+    last = last_table_row(reader.buf, 2, reader.dialect)
+    if first is None:
+        raise AnalysisInputError("Uno o más archivos CSV están vacíos o no se pudieron procesar.")
+    if last is None:
+        raise ChunkedModeUnsupported(f"{name}: no se encontró la última fila en el final del archivo.")
+    return float(first[0][0]), last
+
+
+def analyze_chunked(buf_allke, buf_allie, buf_allwk, relative_tolerance=DEFAULT_RELATIVE_TIME_TOLERANCE,
+                    chunk_rows=CHUNK_ROWS, storage_dtype=np.float64, progress=None):
+    """
+    Análisis completo por bloques de tres buffers (ver módulo). `progress(fracción)`
+    se llama tras cada bloque. Devuelve un ChunkedResult con los tiempos críticos, la
+    decisión, las vistas generales {serie: (x, y, puntos totales)}, las series
+    volcadas a disco {serie: Pyramid sin niveles} y los lectores (para ingest_report).
+    """
+    readers = {
+        'ALLKE': TableChunkReader(buf_allke, chunk_rows=chunk_rows),
+        'ALLIE': TableChunkReader(buf_allie, chunk_rows=chunk_rows),
+        'ALLWK': TableChunkReader(buf_allwk, chunk_rows=chunk_rows),
+    }
+    if any(reader.dialect is None for reader in readers.values()):
+        raise AnalysisInputError("Uno o más archivos CSV están vacíos o no se pudieron procesar.")
+    edges = {name: _read_edges(reader, name) for name, reader in readers.items()}
+    total_bytes = sum(len(reader.buf) for reader in readers.values()) or 1
+
+    def report_progress():
+        if progress is not None:
+            progress(sum(reader.progress * len(reader.buf) for reader in readers.values()) / total_bytes)
+
+    try:
+        energy = _stream_energy(readers, edges, relative_tolerance, storage_dtype, report_progress)
+        allwk = _stream_work(readers['ALLWK'], edges['ALLWK'][1][1], storage_dtype, report_progress)
+    except UnsortedHistoryError as e:
+        raise ChunkedModeUnsupported(str(e)) from e
+
+    energy_time, ri_tracker, total_time = energy['time'], energy['ri_tracker'], energy['total_time']
+    time_RI_5, time_RI_1 = (ri_tracker.result(threshold) for threshold in RI_THRESHOLDS)
+    time_RET_1, time_RET_5 = (allwk['ret_tracker'].result(threshold) for threshold in RET_THRESHOLDS)
+    decision, stable_pct = quasistatic_decision(time_RI_5, time_RI_1, time_RET_1, time_RET_5, total_time)
+
+    overviews, series = {}, {}
+    for name, decimator in list(energy['decimators'].items()) + list(allwk['decimators'].items()):
+        x, y = decimator.points()
+        overviews[name] = (x, y, decimator.total_points)
+    for name in ('ALLKE', 'ALLIE', 'RI'):
+        series[name] = Pyramid(energy_time, energy['spills'][name], [])
+    for name in ('ALLWK', 'RET'):
+        series[name] = Pyramid(allwk['time'], allwk['spills'][name], [])
+
+    return ChunkedResult(time_RI_5, time_RI_1, time_RET_1, time_RET_5, total_time, stable_pct, decision,
+                         overviews, series, readers)
+
+
+def _stream_energy(readers, edges, relative_tolerance, storage_dtype, report_progress):
+    """Alinea ALLKE/ALLIE por tramos y calcula RI y sus tiempos estables al vuelo."""
+    (ke_first, ke_last), (ie_first, ie_last) = edges['ALLKE'], edges['ALLIE']
+    tol = relative_tolerance * (max(ke_last[0], ie_last[0]) - min(ke_first, ie_first))
+    ke = _SeriesCursor(readers['ALLKE'], tol)
+    ie = _SeriesCursor(readers['ALLIE'], tol)
+    union = DedupeStream(tol)
+
+    decimators = {name: StreamingDecimator() for name in ('ALLKE', 'ALLIE', 'RI')}
+    spills = {name: SpillArray(storage_dtype) for name in ('ALLKE', 'ALLIE', 'RI')}
+    time_spill = SpillArray(np.float64)
+    ri_tracker = _StableTracker(RI_THRESHOLDS)
+    start = None
+    last_common = None
+
+    while True:
+        # Se lee de la serie más retrasada (o de la que aún no ha dado ninguna muestra)
+        pending = [cursor for cursor in (ke, ie) if not cursor.exhausted]
+        if pending:
+            lagging = min(pending, key=lambda c: -np.inf if c.last_time is None else c.last_time)
+            lagging.read_more()
+            report_progress()
+        if ke.first_time is None or ie.first_time is None:
+            if ke.exhausted and ie.exhausted:
+                raise AnalysisInputError("No se pudieron alinear los datos de energía o resultaron vacíos.")
+            continue
+        start = max(ke.first_time, ie.first_time)
+
+        finished = ke.exhausted and ie.exhausted
+        horizon = np.inf if finished else min(c.last_time for c in (ke, ie) if not c.exhausted)
+        merged = np.sort(np.concatenate([ke.take_until(horizon), ie.take_until(horizon)]))
+        common, _ = union.push(merged, merged)
+        if finished:
+            tail, _ = union.finish()
+            common = np.concatenate([common, tail])
+        common = common[common > start - tol]
+
+        if common.size:
+            allke = ke.interp(common)
+            allie = ie.interp(common)
+            ri = compute_ri(allke, allie)
+            ri_tracker.extend(common, ri)
+            for name, values in (('ALLKE', allke), ('ALLIE', allie), ('RI', ri)):
+                decimators[name].extend(common, values)
+                spills[name].extend(values)
+            time_spill.extend(common)
+            last_common = common[-1]
+            ke.discard_before(last_common)
+            ie.discard_before(last_common)
+        if finished:
+            break
+
+    if last_common is None:
+        raise AnalysisInputError("No se pudieron alinear los datos de energía o resultaron vacíos.")
+    return {
+        'time': time_spill.finish(),
+        'spills': {name: spill.finish() for name, spill in spills.items()},
+        'decimators': decimators,
+        'ri_tracker': ri_tracker,
+        'total_time': float(last_common),
+    }
+
+
+def _stream_work(reader, final_value, storage_dtype, report_progress):
+    """RET y su primer cruce de cada umbral, con el último valor de ALLWK leído de antemano."""
+    decimators = {name: StreamingDecimator() for name in ('ALLWK', 'RET')}
+    spills = {name: SpillArray(storage_dtype) for name in ('ALLWK', 'RET')}
+    time_spill = SpillArray(np.float64)
+    ret_tracker = _CrossingTracker(RET_THRESHOLDS)
+    last_value = None
+    for time, allwk in reader:
+        ret = np.zeros_like(allwk) if abs(final_value) < 1e-9 else (allwk / final_value) * 100
+        ret_tracker.extend(time, ret)
+        for name, values in (('ALLWK', allwk), ('RET', ret)):
+            decimators[name].extend(time, values)
+            spills[name].extend(values)
+        time_spill.extend(time)
+        last_value = allwk[-1]
+        report_progress()
+    if last_value is None:
+        raise AnalysisInputError("Uno o más archivos CSV están vacíos o no se pudieron procesar.")
+    if last_value != final_value:
+        raise ChunkedModeUnsupported("ALLWK: el último valor no coincide con el leído del final del archivo.")
+    return {
+        'time': time_spill.finish(),
+        'spills': {name: spill.finish() for name, spill in spills.items()},
+        'decimators': decimators,
+        'ret_tracker': ret_tracker,
+    }
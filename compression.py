@@ -0,0 +1,128 @@
+# compression.py
+"""
+Compresión de subidas y respuestas.
+
+Subidas: el formato (gzip, bz2, xz y zstd si está instalado `zstandard`) se detecta
+por los primeros bytes, no por la extensión, y se descomprime por bloques a un
+archivo temporal (ver ingest.upload_buffer): la copia descomprimida nunca está
+entera en memoria. Un CountingReader limita los bytes descomprimidos para que un
+archivo malicioso no llene el disco.
+
+Respuestas: las respuestas JSON y binarias grandes se envían con gzip si el cliente
+lo acepta (Accept-Encoding).
+"""
+import bz2
+import gzip
+import lzma
+import shutil
+
+try:
+    import zstandard
+except ImportError:  # Opcional
+    zstandard = None
+
+# Firmas de cada formato al principio del archivo
+MAGIC_BYTES = {
+    'gzip': b'\x1f\x8b',
+    'bz2': b'BZh',
+    'xz': b'\xfd7zXZ\x00',
+    'zstd': b'\x28\xb5\x2f\xfd',
+}
+MAGIC_PEEK_BYTES = max(len(magic) for magic in MAGIC_BYTES.values())
+# Extensiones de archivo comprimido que se aceptan además de la del historial
+COMPRESSED_EXTENSIONS = ('.gz', '.bz2', '.xz', '.zst')
+# Tipos de respuesta que se comprimen y tamaño mínimo para que merezca la pena
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/octet-stream', 'text/plain')
+MIN_COMPRESS_BYTES = 1024
+DECOMPRESS_BLOCK_BYTES = 1024 * 1024
+
+
+class CompressionError(ValueError):
+    """Archivo comprimido dañado, formato no disponible o demasiado grande al descomprimir."""
+
+
+def detect_compression(head):
+    """Nombre del formato según los primeros bytes, o None si no está comprimido."""
+    for name, magic in MAGIC_BYTES.items():
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def strip_compressed_extension(filename):
+    """'run_ALLKE.csv.gz' -> 'run_ALLKE.csv'."""
+    lower = filename.lower()
+    for extension in COMPRESSED_EXTENSIONS:
+        if lower.endswith(extension):
+            return filename[:-len(extension)]
+    return filename
+
+
+class CountingReader:
+    """Envuelve un stream y cuenta los bytes leídos; lanza CompressionError al pasar de `limit`."""
+
+    def __init__(self, stream, limit=None):
+        self.stream = stream
+        self.limit = limit
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.bytes_read += len(data)
+        if self.limit is not None and self.bytes_read > self.limit:
+            raise CompressionError(
+                f"El archivo descomprimido supera el máximo permitido ({self.limit // (1024 * 1024)} MB).")
+        return data
+
+
+def _decompressing_reader(file_obj, kind):
+    if kind == 'gzip':
+        return gzip.GzipFile(fileobj=file_obj, mode='rb')
+    if kind == 'bz2':
+        return bz2.BZ2File(file_obj, mode='rb')
+    if kind == 'xz':
+        return lzma.LZMAFile(file_obj, mode='rb')
+    if kind == 'zstd':
+        if zstandard is None:
+            raise CompressionError("Archivo zstd: instala el paquete 'zstandard' para poder leerlo.")
+        return zstandard.ZstdDecompressor().stream_reader(file_obj)
+    raise CompressionError(f"Formato de compresión no soportado: {kind}")
+
+
+def decompress_to(file_obj, kind, target, limit=None):
+    """
+    Descomprime `file_obj` (desde el principio) en `target` por bloques.
+    Devuelve el número de bytes descomprimidos.
+    """
+    file_obj.seek(0)
+    reader = CountingReader(_decompressing_reader(file_obj, kind), limit)
+    try:
+        shutil.copyfileobj(reader, target, DECOMPRESS_BLOCK_BYTES)
+    except CompressionError:
+        raise
+    except (OSError, EOFError, lzma.LZMAError) as e:
+        raise CompressionError(f"Archivo {kind} dañado o incompleto: {e}") from e
+    except Exception as e:
+        if zstandard is not None and isinstance(e, zstandard.ZstdError):
+            raise CompressionError(f"Archivo zstd dañado o incompleto: {e}") from e
+        raise
+    return reader.bytes_read
+
+
+def compress_response(response, request, level=6):
+    """Comprime con gzip el cuerpo de `response` si el cliente lo acepta y merece la pena."""
+    if response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers:
+        return response
+    if response.status_code < 200 or response.status_code >= 300:
+        return response
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    if 'gzip' not in request.accept_encodings:
+        return response
+    data = response.get_data()
+    if len(data) < MIN_COMPRESS_BYTES:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=level))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
@@ -0,0 +1,149 @@
+# criteria.py
+"""
+Criterios de aceptación adicionales al RI/RET: energía artificial (hourglass),
+disipación viscosa, deriva del balance de energía, etc.
+
+Cada criterio se declara como una regla sobre señales ya alineadas en el eje de
+tiempo de ALLKE/ALLIE:
+  - 'ratio':     máximo de 100 * señal / referencia donde la referencia es
+                 significativa (al principio ALLIE ~ 0 y el cociente no dice nada);
+  - 'drift':     máxima desviación de la señal respecto a su valor inicial, en % del
+                 máximo de la referencia (ETOTAL debería mantenerse constante);
+  - 'stability': tiempo desde el que el cociente cumple el umbral hasta el final;
+                 se cumple si lo hace al menos STABLE_TIME_FRACTION del tiempo total
+                 (el tiempo final, como en analysis.quasistatic_decision).
+
+evaluate_criteria agrupa los criterios por tipo y evalúa todos los de un mismo tipo
+a la vez sobre una matriz (criterio x muestra). Los criterios cuyas señales no están
+(p. ej. ALLAE con los tres historiales sueltos) o no tienen ningún valor finito
+quedan sin evaluar y no cuentan.
+"""
+import collections
+import operator
+
+import numpy as np
+
+CRITERION_KINDS = ('ratio', 'drift', 'stability')
+# Fracción mínima del tiempo total en la que debe cumplirse un criterio 'stability'
+STABLE_TIME_FRACTION = 0.6
+# Una referencia es significativa a partir de esta fracción de su máximo absoluto
+REFERENCE_FLOOR_FRACTION = 0.01
+
+_OPERATORS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+
+Criterion = collections.namedtuple(
+    'Criterion', ['key', 'label', 'kind', 'signal', 'reference', 'op', 'threshold'])
+
+# value: % (ratio, drift) o tiempo en s (stability); None si no se pudo evaluar
+CriterionResult = collections.namedtuple(
+    'CriterionResult', ['criterion', 'value', 'passed', 'evaluated'])
+
+DEFAULT_CRITERIA = (
+    Criterion('ALLAE_ALLIE_max', 'ALLAE/ALLIE máx. (hourglass)', 'ratio', 'ALLAE', 'ALLIE', '<=', 5.0),
+    Criterion('ALLVD_ALLIE_max', 'ALLVD/ALLIE máx. (viscosa)', 'ratio', 'ALLVD', 'ALLIE', '<=', 5.0),
+    Criterion('ETOTAL_deriva', 'Deriva ETOTAL / ALLWK máx.', 'drift', 'ETOTAL', 'ALLWK', '<=', 1.0),
+)
+
+
+def criteria_signals(criteria):
+    """Nombres de las señales que necesitan `criteria`."""
+    names = set()
+    for criterion in criteria:
+        names.update((criterion.signal, criterion.reference))
+    return names
+
+
+def _has_data(values):
+    return bool(np.isfinite(values).any())
+
+
+def _ratio_matrix(signals, references):
+    """100 * señal / referencia, NaN donde la referencia no es significativa."""
+    floors = REFERENCE_FLOOR_FRACTION * np.nanmax(np.abs(references), axis=1, keepdims=True)
+    significant = np.abs(references) > np.maximum(floors, 1e-9)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(significant, signals / references * 100, np.nan)
+
+
+def _max_ratio(time, signals, references, criteria):
+    ratios = _ratio_matrix(signals, references)
+    values = np.where(np.isnan(ratios), -np.inf, ratios).max(axis=1)
+    return [None if value == -np.inf else float(value) for value in values]
+
+
+def _drift(time, signals, references, criteria):
+    # Valor inicial: el primer valor finito de cada señal (hay al menos uno, ver evaluate_criteria)
+    initial = signals[np.arange(len(signals)), np.isfinite(signals).argmax(axis=1)][:, None]
+    deviation = np.nanmax(np.abs(signals - initial), axis=1)
+    scale = np.nanmax(np.abs(references), axis=1)
+    return [float(d / s * 100) if s > 1e-9 else None for d, s in zip(deviation, scale)]
+
+
+def _stable_from(time, signals, references, criteria):
+    # Como stable_condition_times, para todos los criterios a la vez: 'x > t' se reduce a
+    # '-x < -t' y la condición se cumple desde i hasta el final si y sólo si el máximo
+    # acumulado desde el final la cumple
+    sign = np.array([-1.0 if criterion.op in ('>', '>=') else 1.0 for criterion in criteria])[:, None]
+    thresholds = sign * np.array([criterion.threshold for criterion in criteria])[:, None]
+    strict = np.array([criterion.op in ('<', '>') for criterion in criteria])[:, None]
+    ratios = _ratio_matrix(signals, references) * sign
+    suffix_max = np.maximum.accumulate(np.where(np.isnan(ratios), np.inf, ratios)[:, ::-1], axis=1)[:, ::-1]
+    holds = np.where(strict, suffix_max < thresholds, suffix_max <= thresholds)
+    first = holds.argmax(axis=1)
+    return [float(time[i]) if holds[row, -1] else None for row, i in enumerate(first)]
+
+
+_MEASURES = {'ratio': _max_ratio, 'drift': _drift, 'stability': _stable_from}
+
+
+def evaluate_criteria(time, signals, criteria=DEFAULT_CRITERIA):
+    """
+    Evalúa `criteria` sobre `signals` ({nombre: array alineado con `time`}).
+    Devuelve un CriterionResult por criterio, en el mismo orden.
+    """
+    results = {}
+    by_kind = collections.defaultdict(list)
+    for criterion in criteria:
+        if criterion.kind not in _MEASURES:
+            raise ValueError(f"Tipo de criterio no soportado: {criterion.kind}")
+        if criterion.op not in _OPERATORS:
+            raise ValueError(f"Operador no soportado: {criterion.op}")
+        if (criterion.signal in signals and criterion.reference in signals and len(time)
+                and _has_data(signals[criterion.signal]) and _has_data(signals[criterion.reference])):
+            by_kind[criterion.kind].append(criterion)
+        else:
+            results[criterion.key] = CriterionResult(criterion, None, None, False)
+
+    total_time = float(time[-1]) if len(time) else 0.0
+    for kind, group in by_kind.items():
+        stacked_signals = np.vstack([signals[criterion.signal] for criterion in group]).astype(np.float64)
+        stacked_references = np.vstack([signals[criterion.reference] for criterion in group]).astype(np.float64)
+        values = _MEASURES[kind](time, stacked_signals, stacked_references, group)
+        for criterion, value in zip(group, values):
+            if value is None:
+                passed = False
+            elif kind == 'stability':
+                passed = bool(total_time > 0 and (total_time - value) / total_time >= STABLE_TIME_FRACTION)
+            else:
+                passed = bool(_OPERATORS[criterion.op](value, criterion.threshold))
+            results[criterion.key] = CriterionResult(criterion, value, passed, True)
+    return [results[criterion.key] for criterion in criteria]
+
+
+def format_criterion_result(result):
+    """Texto de la tabla resumen para un criterio evaluado."""
+    criterion = result.criterion
+    if result.value is None:
+        value = 'N/A'
+    elif criterion.kind == 'stability':
+        value = f"{result.value:.3f} s"
+    else:
+        value = f"{result.value:.2f}%"
+    verdict = 'CUMPLE' if result.passed else 'NO CUMPLE'
+    return f"{value} ({criterion.op} {criterion.threshold:g}%: {verdict})"
+
+
+def failed_criteria_text(results):
+    """Descripción de los criterios evaluados que no se cumplen ('' si se cumplen todos)."""
+    return '; '.join(f"{result.criterion.label} = {format_criterion_result(result)}"
+                     for result in results if result.evaluated and not result.passed)
@@ -0,0 +1,204 @@
+# decimation.py
+"""
+Pirámide de diezmado min/max para enviar a la gráfica sólo los puntos que caben
+en pantalla.
+
+Cada nivel agrupa las muestras en cubos de tamaño potencia de dos y guarda el
+índice del mínimo y del máximo de cada cubo. Al pedir una ventana de tiempo y un
+ancho en píxeles se elige el nivel cuyo cubo da ~2 puntos por píxel, así que el
+tamaño de la respuesta depende de la pantalla y no de la longitud de la simulación.
+"""
+import collections
+
+import numpy as np
+
+# Ancho (en píxeles) de la vista general que acompaña a la primera respuesta
+OVERVIEW_WIDTH = 2000
+# Tamaño del cubo del primer nivel de la pirámide
+MIN_BUCKET = 4
+# Muestras que se leen de una vez al diezmar una serie sin pirámide (p. ej. en disco)
+SCAN_BLOCK = 1 << 20
+
+PyramidLevel = collections.namedtuple('PyramidLevel', ['bucket_size', 'imin', 'imax'])
+Pyramid = collections.namedtuple('Pyramid', ['time', 'values', 'levels'])
+
+
+def _first_level(filled_min, filled_max, bucket_size, index_dtype):
+    n = filled_min.size
+    n_buckets = -(-n // bucket_size)
+    pad = n_buckets * bucket_size - n
+    padded_min = np.pad(filled_min, (0, pad), constant_values=np.inf).reshape(n_buckets, bucket_size)
+    padded_max = np.pad(filled_max, (0, pad), constant_values=-np.inf).reshape(n_buckets, bucket_size)
+    starts = np.arange(n_buckets, dtype=index_dtype) * bucket_size
+    imin = starts + padded_min.argmin(axis=1).astype(index_dtype)
+    imax = starts + padded_max.argmax(axis=1).astype(index_dtype)
+    return imin, imax
+
+
+def _merge_pairs(indices, filled, pick_smaller):
+    if indices.size % 2:
+        indices = np.append(indices, indices[-1])
+    left, right = indices[0::2], indices[1::2]
+    if pick_smaller:
+        take_right = filled[right] < filled[left]
+    else:
+        take_right = filled[right] > filled[left]
+    return np.where(take_right, right, left)
+
+
+def build_pyramid(time, values, min_bucket=MIN_BUCKET):
+    """
+    Construye la pirámide min/max de una serie ordenada por tiempo en O(n).
+    Los NaN se ignoran salvo en cubos donde todo es NaN, que quedan como hueco.
+    """
+    time = np.asarray(time, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    levels = []
+    if values.size > 2 * min_bucket:
+        index_dtype = np.int32 if values.size < np.iinfo(np.int32).max else np.int64
+        nan_mask = np.isnan(values)
+        filled_min = np.where(nan_mask, np.inf, values)
+        filled_max = np.where(nan_mask, -np.inf, values)
+
+        bucket_size = min_bucket
+        imin, imax = _first_level(filled_min, filled_max, bucket_size, index_dtype)
+        levels.append(PyramidLevel(bucket_size, imin, imax))
+        while imin.size > 1:
+            bucket_size *= 2
+            imin = _merge_pairs(imin, filled_min, pick_smaller=True)
+            imax = _merge_pairs(imax, filled_max, pick_smaller=False)
+            levels.append(PyramidLevel(bucket_size, imin, imax))
+    return Pyramid(time, values, levels)
+
+
+def _two_points_per_bucket(imin, imax):
+    idx = np.column_stack([np.minimum(imin, imax), np.maximum(imin, imax)]).ravel()
+    return idx[np.concatenate(([True], idx[1:] != idx[:-1]))]
+
+
+def _decimate_scan(time, values, i0, i1, width):
+    """Min/max por cubos recorriendo [i0, i1) por bloques, para series sin pirámide."""
+    bucket_size = -(-(i1 - i0) // width)
+    block = max(SCAN_BLOCK // bucket_size, 1) * bucket_size
+    parts = []
+    for start in range(i0, i1, block):
+        chunk = np.asarray(values[start:min(start + block, i1)], dtype=np.float64)
+        nan_mask = np.isnan(chunk)
+        imin, imax = _first_level(np.where(nan_mask, np.inf, chunk), np.where(nan_mask, -np.inf, chunk),
+                                  bucket_size, np.int64)
+        parts.append(start + _two_points_per_bucket(imin, imax))
+    idx = np.concatenate(parts)
+    return np.asarray(time[idx]), np.asarray(values[idx])
+
+
+def decimate_window(pyramid, t0=None, t1=None, width=OVERVIEW_WIDTH):
+    """
+    Devuelve (x, y) con ~2*width puntos como máximo para la ventana [t0, t1].
+    Si la ventana tiene pocas muestras se devuelven tal cual. Una pirámide sin
+    niveles (series volcadas a disco en el modo por bloques) se diezma recorriendo
+    la ventana.
+    """
+    time, values = pyramid.time, pyramid.values
+    n = time.size
+    width = max(int(width), 1)
+    i0 = 0 if t0 is None else max(int(np.searchsorted(time, t0, side='left')) - 1, 0)
+    i1 = n if t1 is None else min(int(np.searchsorted(time, t1, side='right')) + 1, n)
+    if i1 <= i0:
+        return time[:0], values[:0]
+
+    count = i1 - i0
+    level = None
+    if count > 2 * width:
+        target = count / width
+        # El último nivel tiene un único cubo, así que siempre hay uno suficiente
+        level = next((lvl for lvl in pyramid.levels if lvl.bucket_size >= target), None)
+    if level is None:
+        if count > 2 * width:
+            return _decimate_scan(time, values, i0, i1, width)
+        return time[i0:i1], values[i0:i1]
+
+    b0 = i0 // level.bucket_size
+    b1 = (i1 - 1) // level.bucket_size + 1
+    # Dos puntos por cubo, en orden temporal
+    idx = _two_points_per_bucket(level.imin[b0:b1], level.imax[b0:b1])
+    return time[idx], values[idx]
+
+
+class StreamingDecimator:
+    """
+    Vista general min/max de una serie que crece por el final (monitor en vivo,
+    modo por bloques). Mantiene como mucho `max_buckets` cubos: cuando se superan,
+    se fusionan por parejas y el tamaño de cubo se duplica. Coste amortizado O(nuevas
+    muestras) y memoria acotada, sin conocer de antemano la longitud total.
+    """
+
+    def __init__(self, max_buckets=OVERVIEW_WIDTH):
+        self.max_buckets = max_buckets
+        self.bucket_size = 1
+        self.total_points = 0
+        # Por cubo: tiempo y valor del mínimo y del máximo
+        self._tmin = np.empty(0)
+        self._vmin = np.empty(0)
+        self._tmax = np.empty(0)
+        self._vmax = np.empty(0)
+        # Muestras que todavía no completan un cubo
+        self._pending_t = np.empty(0)
+        self._pending_v = np.empty(0)
+
+    def extend(self, time, values):
+        time = np.asarray(time, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        self.total_points += time.size
+        pending_t = np.concatenate([self._pending_t, time])
+        pending_v = np.concatenate([self._pending_v, values])
+
+        n_full = pending_t.size // self.bucket_size
+        if n_full:
+            cut = n_full * self.bucket_size
+            block_t = pending_t[:cut].reshape(n_full, self.bucket_size)
+            block_v = pending_v[:cut].reshape(n_full, self.bucket_size)
+            nan_mask = np.isnan(block_v)
+            rows = np.arange(n_full)
+            imin = np.where(nan_mask, np.inf, block_v).argmin(axis=1)
+            imax = np.where(nan_mask, -np.inf, block_v).argmax(axis=1)
+            self._tmin = np.concatenate([self._tmin, block_t[rows, imin]])
+            self._vmin = np.concatenate([self._vmin, block_v[rows, imin]])
+            self._tmax = np.concatenate([self._tmax, block_t[rows, imax]])
+            self._vmax = np.concatenate([self._vmax, block_v[rows, imax]])
+            pending_t, pending_v = pending_t[cut:], pending_v[cut:]
+        self._pending_t, self._pending_v = pending_t, pending_v
+
+        while self._tmin.size > self.max_buckets:
+            self._merge_pairs()
+
+    def _merge_pairs(self):
+        n_pairs = self._tmin.size // 2
+        cut = 2 * n_pairs
+        # Un cubo impar al final se conserva tal cual
+        tmin, vmin = self._tmin[:cut].reshape(n_pairs, 2), self._vmin[:cut].reshape(n_pairs, 2)
+        tmax, vmax = self._tmax[:cut].reshape(n_pairs, 2), self._vmax[:cut].reshape(n_pairs, 2)
+        rows = np.arange(n_pairs)
+        pick_min = np.where(np.isnan(vmin), np.inf, vmin).argmin(axis=1)
+        pick_max = np.where(np.isnan(vmax), -np.inf, vmax).argmax(axis=1)
+        self._tmin = np.concatenate([tmin[rows, pick_min], self._tmin[cut:]])
+        self._vmin = np.concatenate([vmin[rows, pick_min], self._vmin[cut:]])
+        self._tmax = np.concatenate([tmax[rows, pick_max], self._tmax[cut:]])
+        self._vmax = np.concatenate([vmax[rows, pick_max], self._vmax[cut:]])
+        self.bucket_size *= 2
+
+    def points(self):
+        """Devuelve (x, y) ordenados por tiempo: dos puntos por cubo más las muestras pendientes."""
+        first_is_min = self._tmin <= self._tmax
+        x = np.column_stack([np.where(first_is_min, self._tmin, self._tmax),
+                             np.where(first_is_min, self._tmax, self._tmin)]).ravel()
+        y = np.column_stack([np.where(first_is_min, self._vmin, self._vmax),
+                             np.where(first_is_min, self._vmax, self._vmin)]).ravel()
+        keep = np.concatenate(([True], x[1:] != x[:-1])) if x.size else np.ones(0, dtype=bool)
+        pending_t, pending_v = self._pending_t, self._pending_v
+        if pending_t.size > 3:
+            # El cubo incompleto también se resume: mínimo, máximo y última muestra
+            nan_mask = np.isnan(pending_v)
+            idx = np.unique([np.where(nan_mask, np.inf, pending_v).argmin(),
+                             np.where(nan_mask, -np.inf, pending_v).argmax(), pending_t.size - 1])
+            pending_t, pending_v = pending_t[idx], pending_v[idx]
+        return np.concatenate([x[keep], pending_t]), np.concatenate([y[keep], pending_v])
@@ -0,0 +1,26 @@
+# gunicorn.conf.py
+"""
+Configuración de gunicorn (la usa el Procfile).
+
+La aplicación se carga una sola vez en el proceso maestro (preload_app) y los workers
+se crean con fork: arrancan sin volver a importar Flask ni NumPy y comparten esas
+páginas de memoria con el maestro mientras nadie las escriba. gc.freeze() antes del
+fork saca los objetos ya cargados de las pasadas del recolector, que si no los
+tocaría y forzaría a copiar sus páginas en cada worker.
+
+pandas no se importa al cargar la aplicación (ver ingest.py): sólo lo carga el
+worker que recibe un archivo que lo necesita.
+
+El número de workers sale de WEB_CONCURRENCY y el puerto de PORT (gunicorn los lee
+por su cuenta). Por defecto hay un único worker: el estado de los trabajos en
+segundo plano vive en el proceso (ver jobs.py).
+"""
+import gc
+
+preload_app = True
+worker_class = 'gthread'
+threads = 8
+
+
+def pre_fork(server, worker):
+    gc.freeze()
@@ -0,0 +1,514 @@
+# ingest.py
+"""
+Motor de ingesta para los historiales de energía (ALLKE, ALLIE, ALLWK...).
+
+Detecta separador, cabecera y separador decimal UNA sola vez sobre una muestra
+acotada del principio del archivo y después parsea el archivo completo en una
+sola pasada, directamente a arrays float64.
+
+Los archivos limpios con punto decimal se leen sólo con NumPy (np.loadtxt), sea
+cual sea su tamaño: es más rápido que pandas con float_precision='round_trip'.
+pandas se importa la primera vez que hace falta: coma decimal, filas no numéricas
+o lectura por bloques. Así un worker que sólo recibe historiales limpios no llega
+a cargar pandas.
+Qué parser se usa depende sólo del archivo, y los dos dan los mismos float64
+(pandas con float_precision='round_trip'): el mismo archivo da siempre el mismo
+resultado, y las cachés por contenido no dependen de qué petición llegó antes.
+"""
+import collections
+import contextlib
+import io
+import mmap
+import re
+import shutil
+import tempfile
+import warnings
+
+import numpy as np
+
+from compression import MAGIC_PEEK_BYTES, decompress_to, detect_compression
+
+# Tamaño máximo de la muestra usada para detectar el formato
+SNIFF_BYTES = 64 * 1024
+# Número máximo de líneas de cabecera que se aceptan antes de los datos
+MAX_HEADER_LINES = 20
+# Tamaño de bloque para contar líneas sin copiar el buffer completo
+COUNT_BLOCK_BYTES = 8 * 1024 * 1024
+# Tamaño de bloque al volcar a disco un stream que no tiene descriptor de archivo
+SPOOL_BLOCK_BYTES = 1024 * 1024
+# Tamaño máximo por defecto de una subida comprimida una vez descomprimida
+MAX_DECOMPRESSED_BYTES = 16 * 1024 * 1024 * 1024
+# Separadores candidatos, en orden de preferencia (';' es el habitual en nuestros CSV)
+CANDIDATE_SEPARATORS = [';', ',', '\t', ' ']
+
+# Espacios que puede tener una línea vacía (los parsers se la saltan sin contarla como fila)
+_LINE_SPACES = b' \t\r\f\v'
+
+CsvDialect = collections.namedtuple('CsvDialect', ['separator', 'decimal', 'header_lines'])
+
+# Resultado del parseo: arrays float64 ordenados por tiempo y el informe de la ingesta
+ParsedSeries = collections.namedtuple(
+    'ParsedSeries', ['time', 'values', 'rows', 'skipped_rows', 'dialect'])
+
+# Señales que se reconocen por su nombre en la cabecera de un informe de Abaqus con
+# varias columnas; las tres primeras son obligatorias
+REPORT_SIGNALS = ('ALLKE', 'ALLIE', 'ALLWK', 'ALLAE', 'ALLVD', 'ETOTAL')
+REQUIRED_REPORT_SIGNALS = ('ALLKE', 'ALLIE', 'ALLWK')
+_SIGNAL_PATTERN = re.compile(r'(?<![A-Z0-9])(' + '|'.join(REPORT_SIGNALS) + r')(?![A-Z0-9])', re.IGNORECASE)
+
+# Informe parseado: eje de tiempo común, {señal: valores} y {señal: índice de columna}
+ParsedReport = collections.namedtuple(
+    'ParsedReport', ['time', 'signals', 'rows', 'skipped_rows', 'dialect', 'columns'])
+
+
+class ReportColumnsError(ValueError):
+    """El informe no tiene filas numéricas o le falta alguna de las señales obligatorias."""
+
+
+def _split_fields(line, separator):
+    if separator == ' ':
+        return line.split()
+    return line.split(separator)
+
+
+def _parse_number(field, decimal):
+    field = field.strip()
+    if decimal == ',':
+        field = field.replace(',', '.')
+    return float(field)
+
+
+def _is_data_line(line, separator, decimal):
+    fields = _split_fields(line, separator)
+    if len(fields) < 2:
+        return False
+    try:
+        _parse_number(fields[0], decimal)
+        _parse_number(fields[1], decimal)
+    except ValueError:
+        return False
+    return True
+
+
+def _sample_lines(sample):
+    """
+    Líneas de una muestra (bytes o str), sin la última si puede estar cortada.
+    Se conservan las líneas vacías: el índice de cada línea es el que cuenta el
+    skiprows de los parsers.
+    """
+    truncated = len(sample) >= SNIFF_BYTES
+    if isinstance(sample, (bytes, bytearray, memoryview)):
+        sample = bytes(sample).decode('utf-8-sig', errors='replace')
+    lines = [line.rstrip('\r') for line in sample.split('\n')]
+    if truncated and len(lines) > 1 or lines[-1] == '':
+        lines = lines[:-1]
+    return lines
+
+
+def sniff_dialect(sample):
+    """
+    Detecta separador, separador decimal y número de líneas de cabecera a partir
+    de una muestra (bytes o str) del principio del archivo. Las líneas de cabecera
+    son líneas del archivo, vacías incluidas (lo que hay que saltarse hasta los datos).
+    Devuelve None si ninguna combinación produce filas numéricas.
+    """
+    lines = _sample_lines(sample)
+    best, best_score = None, 0
+    for separator in CANDIDATE_SEPARATORS:
+        for decimal in ('.', ','):
+            if decimal == separator:
+                continue
+            header_lines = text_lines = 0
+            for line in lines:
+                if _is_data_line(line, separator, decimal) or line.strip() and text_lines == MAX_HEADER_LINES:
+                    break
+                text_lines += bool(line.strip())
+                header_lines += 1
+            score = sum(1 for line in lines[header_lines:] if _is_data_line(line, separator, decimal))
+            # Sólo se cambia de candidato si mejora estrictamente: se respeta el orden de preferencia
+            if score > best_score:
+                best, best_score = CsvDialect(separator, decimal, header_lines), score
+    return best
+
+
+def _mmap_file(file_obj):
+    file_obj.flush()
+    if file_obj.seek(0, io.SEEK_END) == 0:
+        return None  # No se puede mapear un archivo vacío
+    return mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+@contextlib.contextmanager
+def upload_buffer(file_stream, max_decompressed_bytes=MAX_DECOMPRESSED_BYTES):
+    """
+    Expone una subida (stream de Werkzeug o cualquier archivo binario) como un
+    buffer de bytes de sólo lectura mapeado en memoria, sin leerla entera a un
+    objeto bytes ni decodificarla a texto.
+
+    Werkzeug ya vuelca a un SpooledTemporaryFile las subidas grandes: se mapea ese
+    mismo archivo. Si el stream no tiene descriptor, se vuelca por bloques a un
+    archivo temporal y se mapea ese.
+
+    Las subidas comprimidas (gzip, bz2, xz, zstd; se reconocen por sus primeros
+    bytes) se descomprimen por bloques a otro archivo temporal, que es el que se
+    mapea: el contenido descomprimido no llega a estar entero en memoria.
+    CompressionError si está dañada o descomprimida supera `max_decompressed_bytes`.
+    """
+    with contextlib.ExitStack() as spools:
+        try:
+            file_stream.fileno()  # En un SpooledTemporaryFile fuerza el volcado a disco
+            file_obj = file_stream
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            file_obj = spools.enter_context(tempfile.TemporaryFile())
+            shutil.copyfileobj(file_stream, file_obj, SPOOL_BLOCK_BYTES)
+
+        file_obj.seek(0)
+        kind = detect_compression(file_obj.read(MAGIC_PEEK_BYTES))
+        if kind is not None:
+            compressed = file_obj
+            file_obj = spools.enter_context(tempfile.TemporaryFile())
+            decompress_to(compressed, kind, file_obj, max_decompressed_bytes)
+
+        mapped = _mmap_file(file_obj)
+        try:
+            yield mapped if mapped is not None else b''
+        finally:
+            if mapped is not None:
+                mapped.close()
+
+
+def _read_sample(buf):
+    return bytes(buf[:SNIFF_BYTES])
+
+
+def _count_lines(buf, block_size=COUNT_BLOCK_BYTES):
+    """
+    Cuenta las líneas no vacías (con algo más que espacios) de un buffer de bytes
+    sin decodificarlo. Se recorre por bloques para no duplicar en memoria buffers
+    grandes (mmap). Sin los espacios, una línea está vacía si su salto de línea va
+    justo después de otro (o al principio del archivo).
+    """
+    lines = 0
+    previous = b'\n'  # Último byte que no es un espacio del bloque anterior
+    for start in range(0, len(buf), block_size):
+        block = previous + bytes(buf[start:start + block_size]).translate(None, _LINE_SPACES)
+        newlines = np.frombuffer(block, dtype=np.uint8) == ord('\n')
+        lines += int(np.count_nonzero(newlines[1:] & ~newlines[:-1]))
+        previous = block[-1:]
+    if previous != b'\n':
+        lines += 1
+    return lines
+
+
+def _pandas():
+    """pandas, importado la primera vez que se usa (arranque más rápido y menos memoria)."""
+    import pandas
+    return pandas
+
+
+def _to_float_array(column):
+    if column.dtype == np.float64:
+        return column.to_numpy()
+    values = _pandas().to_numeric(column, errors='coerce').to_numpy(dtype=np.float64)
+    if column.dtype == object:
+        # to_numeric no siempre redondea al float64 más cercano: las cadenas válidas se
+        # vuelven a convertir con NumPy para obtener lo mismo que np.loadtxt
+        valid = ~np.isnan(values)
+        try:
+            values[valid] = column.to_numpy()[valid].astype(str).astype(np.float64)
+        except ValueError:
+            pass
+    return values
+
+
+def _text_lines(buf, block_size=SPOOL_BLOCK_BYTES):
+    """
+    Líneas de un buffer (bytes, memoryview o mmap) como str, decodificadas por
+    bloques: np.loadtxt lee así mucho más rápido que línea a línea de un archivo
+    binario y el buffer no se copia entero.
+    """
+    view = memoryview(buf)
+    encoding = 'utf-8-sig'  # Sólo el primer bloque puede empezar con BOM
+    rest = b''
+    for start in range(0, len(view), block_size):
+        block = rest + bytes(view[start:start + block_size])
+        end = block.rfind(b'\n') + 1
+        rest = block[end:]
+        if end:
+            yield from block[:end - 1].decode(encoding).split('\n')
+            encoding = 'utf-8'
+    if rest:
+        yield rest.decode(encoding)
+
+
+def _csv_source(buf):
+    if isinstance(buf, mmap.mmap):
+        buf.seek(0)
+        return buf  # El parser de pandas lee el mapa por bloques
+    return io.BytesIO(buf)
+
+
+def _read_csv_options(dialect, names, usecols=None):
+    return dict(sep=r'\s+' if dialect.separator == ' ' else dialect.separator, decimal=dialect.decimal,
+                header=None, skiprows=dialect.header_lines, usecols=usecols or list(range(len(names))), names=names,
+                engine='c', float_precision='round_trip', on_bad_lines='skip', skip_blank_lines=True,
+                encoding='utf-8-sig', encoding_errors='replace')
+
+
+def _valid_rows(columns):
+    """Columnas float64 sin las filas que tienen algún valor no numérico."""
+    valid = ~np.logical_or.reduce([np.isnan(column) for column in columns])
+    if not valid.all():
+        columns = [column[valid] for column in columns]
+    return columns
+
+
+def _valid_columns(df, names):
+    return _valid_rows([_to_float_array(df[name]) for name in names])
+
+
+def _read_columns_numpy(buf, dialect, usecols):
+    """
+    Columnas con np.loadtxt, o None si el archivo tiene algo que sólo sabe saltarse
+    pandas (filas no numéricas o incompletas, comillas...).
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)  # Archivo sin filas de datos
+            table = np.loadtxt(_text_lines(buf), dtype=np.float64, delimiter=None if dialect.separator == ' ' else dialect.separator,
+                               skiprows=dialect.header_lines, usecols=usecols, comments=None, ndmin=2)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return [np.ascontiguousarray(table[:, i]) for i in range(table.shape[1])]
+
+
+def _read_columns_pandas(buf, dialect, usecols):
+    pd = _pandas()
+    names = [f'c{i}' for i in range(len(usecols))]
+    try:
+        df = pd.read_csv(_csv_source(buf), **_read_csv_options(dialect, names, usecols))
+    except pd.errors.EmptyDataError:
+        return [np.empty(0, dtype=np.float64) for _ in names]
+    return [_to_float_array(df[name]) for name in names]
+
+
+def _read_columns(buf, dialect, usecols):
+    """Columnas `usecols` de un buffer como arrays float64 (con NaN en los valores no numéricos)."""
+    if dialect.decimal == '.':
+        columns = _read_columns_numpy(buf, dialect, usecols)
+        if columns is not None:
+            return columns
+    return _read_columns_pandas(buf, dialect, usecols)
+
+
+def parse_table_buffer(buf, n_columns=2, dialect=None, usecols=None):
+    """
+    Parsea las `n_columns` primeras columnas numéricas (la primera es el tiempo) de
+    un buffer de bytes (bytes, memoryview o mmap) en una sola pasada.
+    Con `usecols` (índices crecientes, el primero el del tiempo) se leen esas columnas.
+    Las filas no numéricas o incompletas se descartan y se cuentan.
+    Devuelve (lista de arrays float64 ordenados por tiempo, filas descartadas, dialecto).
+    """
+    if usecols is not None:
+        n_columns = len(usecols)
+    if dialect is None:
+        dialect = sniff_dialect(_read_sample(buf))
+    if dialect is None:
+        return [np.empty(0, dtype=np.float64) for _ in range(n_columns)], _count_lines(buf), None
+
+    columns = _valid_rows(_read_columns(buf, dialect, usecols or list(range(n_columns))))
+
+    # Los historiales de Abaqus vienen ordenados: sólo se reordena si hace falta
+    time = columns[0]
+    if time.size > 1 and np.any(time[1:] < time[:-1]):
+        order = np.argsort(time, kind='stable')
+        columns = [column[order] for column in columns]
+
+    data_lines = _count_lines(buf) - dialect.header_lines
+    skipped_rows = max(data_lines - time.size, 0)
+    return columns, skipped_rows, dialect
+
+
+def parse_energy_buffer(buf, dialect=None):
+    """
+    Parsea un buffer de bytes (bytes, memoryview o mmap) con un historial de dos
+    columnas (tiempo, valor) y devuelve un ParsedSeries con arrays float64.
+    Las filas no numéricas o incompletas se descartan y se cuentan en skipped_rows.
+    """
+    (time, values), skipped_rows, dialect = parse_table_buffer(buf, 2, dialect)
+    return ParsedSeries(time, values, int(time.size), skipped_rows, dialect)
+
+
+def _assign_column(columns, match, index):
+    # La primera aparición de cada señal gana y cada columna es de una sola señal
+    name = match.group(1).upper()
+    if name not in columns and index not in columns.values():
+        columns[name] = index
+
+
+def report_signal_columns(sample, dialect):
+    """
+    {señal: índice de columna} según los nombres de la cabecera de un informe.
+
+    Con separador (CSV) o con tantos nombres como columnas, cada campo de la cabecera
+    es una columna. En los .rpt de anchos fijos los nombres pueden llevar espacios
+    ('ALLKE Whole Model'): si hay una señal por columna de valores se asignan en orden
+    y, si no, cada nombre va a la columna de datos más cercana en la línea.
+    """
+    lines = _sample_lines(sample)
+    if dialect is None or len(lines) <= dialect.header_lines:
+        return {}
+    data_line = lines[dialect.header_lines]
+    n_fields = len(_split_fields(data_line, dialect.separator))
+    columns = {}
+    for line in lines[:dialect.header_lines]:
+        matches = list(_SIGNAL_PATTERN.finditer(line))
+        if not matches:
+            continue
+        fields = _split_fields(line, dialect.separator)
+        if dialect.separator != ' ' or len(fields) == n_fields:
+            for i, field in enumerate(fields[1:n_fields], start=1):
+                match = _SIGNAL_PATTERN.search(field)
+                if match:
+                    _assign_column(columns, match, i)
+        elif len(matches) == n_fields - 1:
+            for i, match in enumerate(matches, start=1):
+                _assign_column(columns, match, i)
+        else:
+            centers = [(field.start() + field.end()) / 2 for field in re.finditer(r'\S+', data_line)]
+            for match in matches:
+                center = (match.start() + match.end()) / 2
+                i = min(range(1, len(centers)), key=lambda k: abs(centers[k] - center))
+                _assign_column(columns, match, i)
+    return columns
+
+
+def parse_report_buffer(buf, dialect=None):
+    """
+    Parsea un informe con varias señales (columna de tiempo + ALLKE, ALLIE, ALLWK y
+    opcionalmente ALLAE, ALLVD, ETOTAL), en CSV o en el formato de texto .rpt de
+    Abaqus, en una sola pasada y sobre un eje de tiempo común.
+    Lanza ReportColumnsError si falta ALLKE, ALLIE o ALLWK en la cabecera.
+    """
+    sample = _read_sample(buf)
+    dialect = dialect or sniff_dialect(sample)
+    if dialect is None:
+        raise ReportColumnsError("El informe está vacío o no tiene filas numéricas.")
+    columns = report_signal_columns(sample, dialect)
+    missing = [name for name in REQUIRED_REPORT_SIGNALS if name not in columns]
+    if missing:
+        raise ReportColumnsError(f"Faltan columnas en la cabecera del informe: {', '.join(missing)}.")
+
+    names = sorted(columns, key=columns.get)
+    arrays, skipped_rows, dialect = parse_table_buffer(
+        buf, dialect=dialect, usecols=[0] + [columns[name] for name in names])
+    time = arrays[0]
+    return ParsedReport(time, dict(zip(names, arrays[1:])), int(time.size), skipped_rows, dialect,
+                        {name: columns[name] for name in names})
+
+
+def report_energy_series(report):
+    """ParsedSeries de ALLKE, ALLIE y ALLWK de un informe; comparten el mismo eje de tiempo."""
+    return tuple(ParsedSeries(report.time, report.signals[name], report.rows, report.skipped_rows, report.dialect)
+                 for name in REQUIRED_REPORT_SIGNALS)
+
+
+def report_extra_signals(report):
+    """{señal: (tiempo, valores)} de las señales del informe que no son ALLKE, ALLIE ni ALLWK."""
+    return {name: (report.time, values) for name, values in report.signals.items()
+            if name not in REQUIRED_REPORT_SIGNALS}
+
+
+class UnsortedHistoryError(ValueError):
+    """El historial no está ordenado por tiempo y no se puede leer por bloques."""
+
+
+class TableChunkReader:
+    """
+    Lee un buffer por bloques de `chunk_rows` filas con el mismo parser que
+    parse_table_buffer, sin tener nunca el archivo completo en memoria.
+
+    Iterar devuelve, por bloque, la lista de columnas float64 (filas no numéricas ya
+    descartadas). Como no se puede reordenar sin leerlo todo, exige que el tiempo no
+    decrezca (UnsortedHistoryError). Al terminar, `rows` y `skipped_rows` tienen el
+    mismo valor que daría parse_table_buffer, así que sirve para ingest_report().
+    """
+
+    def __init__(self, buf, n_columns=2, dialect=None, chunk_rows=1_000_000):
+        self.buf = buf
+        self.n_columns = n_columns
+        self.dialect = dialect or sniff_dialect(_read_sample(buf))
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self.skipped_rows = 0
+        self._source = None
+
+    @property
+    def progress(self):
+        """Fracción del buffer leída hasta ahora."""
+        if self._source is None or len(self.buf) == 0:
+            return 0.0
+        return min(self._source.tell() / len(self.buf), 1.0)
+
+    def __iter__(self):
+        if self.dialect is None:
+            self.skipped_rows = _count_lines(self.buf)
+            return
+        pd = _pandas()
+        names = [f'c{i}' for i in range(self.n_columns)]
+        self._source = _csv_source(self.buf)
+        last_time = -np.inf
+        try:
+            reader = pd.read_csv(self._source, chunksize=self.chunk_rows, **_read_csv_options(self.dialect, names))
+        except pd.errors.EmptyDataError:
+            reader = contextlib.nullcontext(())
+        with reader:
+            for df in reader:
+                columns = _valid_columns(df, names)
+                time = columns[0]
+                if time.size == 0:
+                    continue
+                if time[0] < last_time or np.any(time[1:] < time[:-1]):
+                    raise UnsortedHistoryError("El historial no está ordenado por tiempo.")
+                last_time = time[-1]
+                self.rows += time.size
+                yield columns
+        data_lines = _count_lines(self.buf) - self.dialect.header_lines
+        self.skipped_rows = max(data_lines - self.rows, 0)
+
+
+def last_table_row(buf, n_columns=2, dialect=None):
+    """
+    Última fila válida del buffer (lista de n_columns floats) leyendo sólo el final,
+    o None si no hay ninguna en los últimos SNIFF_BYTES.
+    """
+    dialect = dialect or sniff_dialect(_read_sample(buf))
+    if dialect is None or len(buf) == 0:
+        return None
+    start = max(len(buf) - SNIFF_BYTES, 0)
+    tail = bytes(buf[start:])
+    if start > 0:
+        tail = tail[tail.find(b'\n') + 1:]  # Primera línea posiblemente cortada
+        dialect = dialect._replace(header_lines=0)
+    columns = _valid_rows(_read_columns(tail, dialect, list(range(n_columns))))
+    if columns[0].size == 0:
+        return None
+    return [float(column[-1]) for column in columns]
+
+
+def parse_energy_file(path, dialect=None):
+    """Como parse_energy_buffer, para un archivo en disco (mapeado en memoria)."""
+    with open(path, 'rb') as f, upload_buffer(f) as buf:
+        return parse_energy_buffer(buf, dialect)
+
+
+def ingest_report(parsed):
+    """Resumen serializable de lo que hizo la ingesta con un archivo."""
+    dialect = parsed.dialect
+    return {
+        'rows': parsed.rows,
+        'skipped_rows': parsed.skipped_rows,
+        'separator': dialect.separator if dialect else None,
+        'decimal': dialect.decimal if dialect else None,
+        'header_lines': dialect.header_lines if dialect else None,
+    }
@@ -0,0 +1,198 @@
+# jobs.py
+"""
+Cola local de análisis en segundo plano (sin broker externo).
+
+Un pool acotado de hilos ejecuta los trabajos; la cola rechaza trabajos nuevos
+cuando hay demasiados pendientes (QueueFullError → 503 con Retry-After) para que una
+ráfaga de subidas grandes no agote la memoria. El estado de cada trabajo (etapa,
+progreso, resultado o error) se consulta por su identificador hasta que caduca.
+
+Un trabajo puede guardar además el resultado completo (JobQueue.keep_payload) para
+que siga disponible hasta que caduque aunque no quepa en la caché de resultados o se
+desaloje antes de que el cliente lo pida. Los resultados guardados así tienen su
+propio límite de bytes (memoria y disco): al superarlo se sueltan los de los
+trabajos más antiguos.
+
+El estado vive en el proceso: con varios workers de gunicorn, el sondeo de un
+trabajo tiene que llegar al mismo proceso que lo recibió.
+"""
+import collections
+import concurrent.futures
+import threading
+import time
+import uuid
+
+JOB_STATUSES = ('queued', 'running', 'done', 'error')
+
+
+class QueueFullError(Exception):
+    """La cola ya tiene el máximo de trabajos pendientes."""
+
+
+class JobFailed(Exception):
+    """Fallo esperado de un trabajo, con el código HTTP que tendría la petición síncrona."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class Job:
+    """
+    Estado de un trabajo. Sólo lo modifica el hilo que lo ejecuta, salvo el resultado
+    completo, que la cola puede soltar (bajo su lock) para hacer sitio a otros.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.status = 'queued'
+        self.stage = None
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.error_status = None
+        self.payload_key = None
+        self.payload = None
+        self.payload_nbytes = (0, 0)
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    def set_progress(self, stage, progress):
+        self.stage = stage
+        self.progress = max(self.progress, min(float(progress), 1.0))
+
+    def to_dict(self):
+        data = {
+            'job_id': self.job_id,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': round(self.progress, 3),
+        }
+        if self.started is not None:
+            data['elapsed'] = round((self.finished or time.time()) - self.started, 3)
+        if self.status == 'done':
+            data['result'] = self.result
+        elif self.status == 'error':
+            data['message'] = self.error
+            data['error_status'] = self.error_status
+        return data
+
+
+class JobQueue:
+    """
+    Pool de `max_workers` hilos con como mucho `max_pending` trabajos en cola o en curso.
+    Los resultados completos que guardan los trabajos (keep_payload) suman como mucho
+    `max_payload_bytes` en memoria y `max_payload_disk_bytes` en disco.
+    """
+
+    def __init__(self, max_workers, max_pending, ttl_seconds=600, max_payload_bytes=0, max_payload_disk_bytes=0):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self.max_payload_bytes = max_payload_bytes
+        self.max_payload_disk_bytes = max_payload_disk_bytes
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='analysis-job')
+        self._jobs = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args):
+        """
+        Encola `func(job, *args)`; su valor de retorno es el resultado del trabajo.
+        Los errores se notifican con JobFailed; cualquier otra excepción se registra como
+        error interno (500).
+        """
+        with self._lock:
+            self._expire()
+            if self._pending_count() >= self.max_pending:
+                raise QueueFullError()
+            job = Job(uuid.uuid4().hex)
+            self._jobs[job.job_id] = job
+        self._executor.submit(self._run, job, func, args)
+        return job
+
+    def _run(self, job, func, args):
+        job.status = 'running'
+        job.started = time.time()
+        try:
+            job.result = func(job, *args)
+        except JobFailed as e:
+            job.error, job.error_status = str(e), e.status
+            job.status = 'error'
+        except Exception as e:
+            job.error, job.error_status = f"Error inesperado: {e}", 500
+            job.status = 'error'
+        else:
+            job.progress = 1.0
+            job.status = 'done'
+        finally:
+            job.finished = time.time()
+
+    def _pending_count(self):
+        return sum(job.status in ('queued', 'running') for job in self._jobs.values())
+
+    def _expire(self):
+        limit = time.time() - self.ttl_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished is not None and job.finished < limit]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def keep_payload(self, job, key, payload, nbytes, disk_bytes=0):
+        """
+        Guarda en `job` el resultado completo bajo `key` hasta que caduque (ver payload()).
+        Si con él se superan los límites, se sueltan los resultados de los trabajos más
+        antiguos. Devuelve False (y no lo guarda) si por sí solo ya los supera.
+        """
+        if nbytes > self.max_payload_bytes or disk_bytes > self.max_payload_disk_bytes:
+            return False
+        with self._lock:
+            self._expire()
+            job.payload_key, job.payload, job.payload_nbytes = key, payload, (nbytes, disk_bytes)
+            kept = [other for other in self._jobs.values() if other.payload is not None]
+            total_bytes = sum(other.payload_nbytes[0] for other in kept)
+            total_disk_bytes = sum(other.payload_nbytes[1] for other in kept)
+            for other in kept:
+                over_bytes = total_bytes > self.max_payload_bytes
+                over_disk_bytes = total_disk_bytes > self.max_payload_disk_bytes
+                if not (over_bytes or over_disk_bytes):
+                    break
+                # Sólo se sueltan resultados que ocupan lo que sobra (memoria o disco)
+                if other is job or not (over_bytes and other.payload_nbytes[0] or
+                                        over_disk_bytes and other.payload_nbytes[1]):
+                    continue
+                total_bytes -= other.payload_nbytes[0]
+                total_disk_bytes -= other.payload_nbytes[1]
+                other.payload, other.payload_nbytes = None, (0, 0)
+        return True
+
+    def payload(self, key):
+        """Resultado guardado con keep_payload por el último trabajo terminado con `key`, o None."""
+        with self._lock:
+            self._expire()
+            for job in reversed(self._jobs.values()):
+                if job.status == 'done' and job.payload_key == key and job.payload is not None:
+                    return job.payload
+        return None
+
+    def queue_position(self, job):
+        """Trabajos en cola por delante de `job` (0 si ya está en marcha)."""
+        with self._lock:
+            if job.status != 'queued':
+                return 0
+            ahead = 0
+            for other in self._jobs.values():
+                if other is job:
+                    break
+                ahead += other.status == 'queued'
+            return ahead
+
+    def stats(self):
+        with self._lock:
+            counts = collections.Counter(job.status for job in self._jobs.values())
+        return {status: counts.get(status, 0) for status in JOB_STATUSES}
@@ -0,0 +1,137 @@
+# metrics.py
+"""
+Métricas del servicio: temporizadores por etapa del análisis, cabecera
+Server-Timing de cada respuesta e histogramas acumulados en formato de texto de
+Prometheus (endpoint /metrics).
+
+Las métricas son por proceso: con varios workers de gunicorn cada uno expone las suyas.
+"""
+import bisect
+import contextlib
+import threading
+import time
+
+from flask import g, has_request_context
+
+# Etapas del análisis, en el orden en que se ejecutan ('chunked' agrupa todo el modo por bloques)
+STAGES = ('decode', 'chunked', 'parse', 'align', 'ri_ret', 'criteria', 'serialise')
+
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+ROW_BUCKETS = (1e3, 1e4, 1e5, 1e6, 3e6, 1e7, 3e7, 1e8)
+BYTE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 5e8, 1e9)
+
+
+def _format_labels(label_names, label_values, extra=None):
+    pairs = list(zip(label_names, label_values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Histogram:
+    """Histograma acumulativo con etiquetas, al estilo de Prometheus."""
+
+    def __init__(self, name, help_text, buckets, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.label_names = tuple(label_names)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series['counts'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for upper, count in zip(self.buckets, series['counts']):
+                    cumulative += count
+                    labels = _format_labels(self.label_names, key, ('le', _format_number(upper)))
+                    lines.append(f'{self.name}_bucket{labels} {cumulative}')
+                labels = _format_labels(self.label_names, key, ('le', '+Inf'))
+                lines.append(f'{self.name}_bucket{labels} {series["count"]}')
+                labels = _format_labels(self.label_names, key)
+                lines.append(f'{self.name}_sum{labels} {_format_number(series["sum"])}')
+                lines.append(f'{self.name}_count{labels} {series["count"]}')
+        return lines
+
+
+class MetricsRegistry:
+    """Conjunto de histogramas más colectores que generan líneas al renderizar."""
+
+    def __init__(self):
+        self._histograms = []
+        self._collectors = []
+
+    def histogram(self, name, help_text, buckets, label_names=()):
+        histogram = Histogram(name, help_text, buckets, label_names)
+        self._histograms.append(histogram)
+        return histogram
+
+    def add_collector(self, collector):
+        """`collector()` devuelve una lista de líneas en formato de texto de Prometheus."""
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for histogram in self._histograms:
+            lines.extend(histogram.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+STAGE_SECONDS = REGISTRY.histogram(
+    'qsc_stage_seconds', 'Duración de cada etapa del análisis.', TIME_BUCKETS, ('stage',))
+REQUEST_SECONDS = REGISTRY.histogram(
+    'qsc_request_seconds', 'Duración total de las peticiones por endpoint.', TIME_BUCKETS, ('endpoint',))
+ROWS_PROCESSED = REGISTRY.histogram(
+    'qsc_rows_processed', 'Filas parseadas por análisis.', ROW_BUCKETS, ('endpoint',))
+BYTES_IN = REGISTRY.histogram(
+    'qsc_request_bytes', 'Bytes recibidos por petición.', BYTE_BUCKETS, ('endpoint',))
+BYTES_OUT = REGISTRY.histogram(
+    'qsc_response_bytes', 'Bytes enviados por respuesta.', BYTE_BUCKETS, ('endpoint',))
+
+
+@contextlib.contextmanager
+def stage_timer(stage):
+    """
+    Mide una etapa: la acumula en el histograma y, dentro de una petición, en
+    g.stage_timings para la cabecera Server-Timing.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        if has_request_context():
+            timings = g.setdefault('stage_timings', {})
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+def server_timing_header(timings):
+    """Valor de la cabecera Server-Timing (duraciones en milisegundos)."""
+    ordered = sorted(timings.items(), key=lambda item: STAGES.index(item[0]) if item[0] in STAGES else len(STAGES))
+    return ', '.join(f'{stage};dur={elapsed * 1000:.1f}' for stage, elapsed in ordered)
@@ -0,0 +1,429 @@
+# monitor.py
+"""
+Modo monitor: sigue los historiales de energía de un cálculo explícito que todavía
+está corriendo y actualiza RI, RET y los tiempos críticos de forma incremental.
+
+Cada sondeo lee sólo los bytes añadidos a los archivos y el coste de la
+actualización es O(filas nuevas):
+  - ALLKE/ALLIE se alinean como en align_series (tiempos repetidos colapsados con
+    chunked.DedupeStream y unión de ejes sin duplicados), pero el eje común sólo se
+    fija hasta el último tiempo que ya han alcanzado ambos; el tramo final (muestras
+    retenidas y lo que va por delante del archivo más retrasado) se recalcula en cada
+    instantánea. La tolerancia entre tiempos es la de align_series para lo leído
+    hasta el momento, que crece con la duración: si llega a alcanzar una separación
+    que antes se conservaba, el estado se rehace desde las filas leídas con la nueva
+    tolerancia. Así cada instantánea es la que daría align_series con los archivos
+    tal como están, y la última coincide con el análisis completo;
+  - si un archivo vuelve a tiempos ya leídos (reinicio del cálculo), las filas se
+    reordenan de forma estable como al parsear el archivo entero y el estado se
+    rehace: en los tiempos reescritos se queda el último valor, como en align_series;
+  - para "RI < x% estable hasta el final" basta con recordar el último índice que
+    incumple cada umbral;
+  - RET se normaliza PROVISIONALMENTE con el último valor leído de ALLWK. Para no
+    recalcular toda la serie cuando ese valor cambia se guarda el máximo (y mínimo)
+    acumulado de ALLWK: el primer cruce de cada umbral es una búsqueda binaria.
+    Cuando el cálculo termina, el valor provisional es el final y los tiempos
+    coinciden con los del análisis completo.
+"""
+import os
+
+import numpy as np
+
+from analysis import DEFAULT_RELATIVE_TIME_TOLERANCE, build_summary_table, compute_ri, quasistatic_decision
+from chunked import DedupeStream
+from decimation import StreamingDecimator
+from ingest import parse_table_buffer, sniff_dialect
+
+# Máximo de bytes nuevos que se leen de cada archivo en un sondeo
+MAX_READ_BYTES = 32 * 1024 * 1024
+ENERGY_NAMES = ('ALLKE', 'ALLIE', 'ALLWK')
+# Umbrales de RI (estable por debajo) y RET (primer cruce) que usa la decisión
+RI_THRESHOLDS = (5.0, 1.0)
+RET_THRESHOLDS = (1.0, 5.0)
+
+
+class GrowingArray:
+    """Array float64 que crece por el final con coste amortizado O(1) por elemento."""
+
+    def __init__(self, capacity=1024):
+        self._data = np.empty(capacity, dtype=np.float64)
+        self._size = 0
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        needed = self._size + values.size
+        if needed > self._data.size:
+            grown = np.empty(max(needed, 2 * self._data.size), dtype=np.float64)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+        self._data[self._size:needed] = values
+        self._size = needed
+
+    def view(self):
+        return self._data[:self._size]
+
+    def __len__(self):
+        return self._size
+
+
+class HistoryTail:
+    """Lee las filas completas añadidas a un archivo de historial desde la última lectura."""
+
+    def __init__(self, path, n_columns=2):
+        self.path = path
+        self.n_columns = n_columns
+        self.offset = 0
+        self.backlog = False  # Quedan bytes por leer en el próximo sondeo
+        self.truncated = False  # El archivo ha encogido (cálculo relanzado)
+        self.skipped_rows = 0
+        self._partial = b''
+        self._dialect = None
+
+    def read_new(self):
+        """Devuelve la lista de columnas de las filas nuevas (o None si no hay ninguna)."""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return None
+        if size < self.offset:
+            self.truncated = True
+            return None
+
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(MAX_READ_BYTES)
+        self.offset += len(data)
+        self.backlog = self.offset < size
+
+        chunk = self._partial + data
+        cut = chunk.rfind(b'\n')
+        if cut < 0:
+            self._partial = chunk
+            return None
+        complete, self._partial = chunk[:cut + 1], chunk[cut + 1:]
+
+        dialect = self._dialect or sniff_dialect(complete)
+        if dialect is None:
+            self._partial = complete + self._partial  # Sólo cabecera por ahora
+            return None
+        columns, skipped_rows, _ = parse_table_buffer(complete, self.n_columns, dialect)
+        self.skipped_rows += skipped_rows
+        # La cabecera sólo aparece al principio del archivo
+        self._dialect = dialect._replace(header_lines=0)
+        return columns if columns[0].size else None
+
+
+def _min_gap_above(time, tol, previous=None):
+    """Menor separación entre tiempos consecutivos (desde `previous`) mayor que `tol`, o inf."""
+    if previous is not None:
+        time = np.concatenate([[previous], time])
+    gaps = np.diff(time)
+    gaps = gaps[gaps > tol]
+    return float(gaps.min()) if gaps.size else np.inf
+
+
+class _LiveSeries:
+    """
+    ALLKE o ALLIE ya sin tiempos repetidos, como en align_series. La última muestra
+    leída queda retenida en el DedupeStream hasta conocer la siguiente.
+    """
+
+    def __init__(self, tol):
+        self.dedupe = DedupeStream(tol)
+        self.time = GrowingArray()
+        self.values = GrowingArray()
+        self.consumed = 0  # Muestras de self.time ya incorporadas al eje común
+        self._last_read = None
+
+    def extend(self, time, values):
+        """Añade filas ordenadas; devuelve la menor separación que se ha conservado."""
+        margin = _min_gap_above(time, self.dedupe.tol, self._last_read)
+        self._last_read = time[-1]
+        time, values = self.dedupe.push(time, values)
+        self.time.extend(time)
+        self.values.extend(values)
+        return margin
+
+    @property
+    def first_time(self):
+        """Primer tiempo (contando la muestra retenida), o None si aún no hay ninguno."""
+        time = self.time.view()
+        if time.size:
+            return time[0]
+        pending_time, _ = self.dedupe.pending
+        return pending_time[0] if pending_time.size else None
+
+    @property
+    def last_time(self):
+        """Último tiempo ya definitivo, o None."""
+        time = self.time.view()
+        return time[-1] if time.size else None
+
+    def take_until(self, horizon):
+        """Tiempos todavía no incorporados al eje común que son <= horizon."""
+        time = self.time.view()
+        end = int(np.searchsorted(time, horizon, side='right'))
+        taken = time[self.consumed:end]
+        self.consumed = max(self.consumed, end)
+        return taken
+
+    def rest(self):
+        """Tiempos no incorporados al eje común, incluida la muestra retenida."""
+        return np.concatenate([self.time.view()[self.consumed:], self.dedupe.pending[0]])
+
+    def interp(self, times, include_pending=False):
+        # Sólo hace falta la muestra anterior al primer tiempo pedido
+        time, values = self.time.view(), self.values.view()
+        start = max(int(np.searchsorted(time, times[0])) - 1, 0)
+        time, values = time[start:], values[start:]
+        if include_pending:
+            pending_time, pending_values = self.dedupe.pending
+            time, values = np.concatenate([time, pending_time]), np.concatenate([values, pending_values])
+        return np.interp(times, time, values)
+
+
+class LiveAnalysis:
+    """
+    Estado incremental del análisis de un cálculo en marcha. Acepta los tres
+    historiales por separado o un único archivo con las columnas
+    tiempo, ALLKE, ALLIE, ALLWK.
+    """
+
+    def __init__(self, allke=None, allie=None, allwk=None, combined=None,
+                 relative_tolerance=DEFAULT_RELATIVE_TIME_TOLERANCE):
+        self.relative_tolerance = relative_tolerance
+        if combined:
+            self._tails = {'combined': HistoryTail(combined, n_columns=4)}
+        else:
+            self._tails = {'ALLKE': HistoryTail(allke), 'ALLIE': HistoryTail(allie), 'ALLWK': HistoryTail(allwk)}
+        self._reset_state()
+
+    def _reset_state(self):
+        # Filas leídas de cada historial, ordenadas por tiempo como al parsear el archivo entero
+        self._raw = {name: (GrowingArray(), GrowingArray()) for name in ENERGY_NAMES}
+        self._reset_derived(0.0)
+
+    def _reset_derived(self, tol):
+        """Vacía todo lo que se calcula a partir de las filas leídas, con la tolerancia `tol`."""
+        self._tol = tol
+        # Menor separación entre tiempos que `tol` no colapsa: si la tolerancia la
+        # alcanza, el estado ya no es el de align_series y hay que rehacerlo
+        self._margin = np.inf
+        self._energy = {'ALLKE': _LiveSeries(tol), 'ALLIE': _LiveSeries(tol)}
+        self._union = DedupeStream(tol)
+        self._union_last = None
+        self._energy_time = GrowingArray()
+        self._allwk_prefix_max = GrowingArray()
+        self._allwk_prefix_min = GrowingArray()
+        self._last_unstable = {threshold: -1 for threshold in RI_THRESHOLDS}
+        self._decimators = {name: StreamingDecimator() for name in ('ALLKE', 'ALLIE', 'RI', 'ALLWK')}
+
+    @property
+    def backlog(self):
+        return any(tail.backlog for tail in self._tails.values())
+
+    def poll(self):
+        """Lee lo nuevo de los archivos y actualiza el estado. Devuelve True si hubo filas nuevas."""
+        if any(tail.truncated for tail in self._tails.values()):
+            # El cálculo se ha relanzado: se empieza de cero
+            for name, tail in self._tails.items():
+                self._tails[name] = HistoryTail(tail.path, tail.n_columns)
+            self._reset_state()
+
+        new = {}
+        for name, tail in self._tails.items():
+            columns = tail.read_new()
+            if columns is None:
+                continue
+            if name == 'combined':
+                time, *values = columns
+                new.update((energy, (time, series)) for energy, series in zip(ENERGY_NAMES, values))
+            else:
+                new[name] = columns
+        if not new:
+            return False
+
+        rewound = False
+        for name, (time, values) in new.items():
+            raw_time, raw_values = self._raw[name]
+            rewound |= bool(len(raw_time)) and time[0] < raw_time.view()[-1]
+            raw_time.extend(time)
+            raw_values.extend(values)
+        if rewound:
+            self._sort_raw()
+
+        tol = self._tolerance()
+        if rewound or tol >= self._margin:
+            self._rebuild(tol)
+        else:
+            self._tol = self._union.tol = tol
+            for series in self._energy.values():
+                series.dedupe.tol = tol
+            for name, (time, values) in new.items():
+                self._extend(name, time, values)
+            self._advance_energy()
+        return True
+
+    def _sort_raw(self):
+        """Ordena las filas leídas por tiempo (orden estable: en tiempos iguales, el del archivo)."""
+        for name, (raw_time, raw_values) in self._raw.items():
+            time, values = raw_time.view(), raw_values.view()
+            if np.any(time[1:] < time[:-1]):
+                order = np.argsort(time, kind='stable')
+                sorted_time, sorted_values = GrowingArray(time.size), GrowingArray(time.size)
+                sorted_time.extend(time[order])
+                sorted_values.extend(values[order])
+                self._raw[name] = (sorted_time, sorted_values)
+
+    def _rebuild(self, tol):
+        """Rehace el estado derivado desde todas las filas leídas con la tolerancia `tol`."""
+        self._reset_derived(tol)
+        for name, (raw_time, raw_values) in self._raw.items():
+            if len(raw_time):
+                self._extend(name, raw_time.view(), raw_values.view())
+        self._advance_energy()
+
+    def _tolerance(self):
+        """Tolerancia de align_series para lo leído de ALLKE/ALLIE hasta ahora."""
+        times = [self._raw[name][0].view() for name in ('ALLKE', 'ALLIE') if len(self._raw[name][0])]
+        if not times:
+            return 0.0
+        return self.relative_tolerance * (max(time[-1] for time in times) - min(time[0] for time in times))
+
+    def _extend(self, name, time, values):
+        """Incorpora filas ya guardadas en self._raw (ALLWK) o pendientes de alinear (ALLKE/ALLIE)."""
+        if name != 'ALLWK':
+            self._margin = min(self._margin, self._energy[name].extend(time, values))
+            return
+        previous_max = self._allwk_prefix_max.view()[-1] if len(self._allwk_prefix_max) else -np.inf
+        previous_min = self._allwk_prefix_min.view()[-1] if len(self._allwk_prefix_min) else np.inf
+        self._allwk_prefix_max.extend(np.maximum.accumulate(np.append(previous_max, values))[1:])
+        self._allwk_prefix_min.extend(np.minimum.accumulate(np.append(previous_min, values))[1:])
+        self._decimators['ALLWK'].extend(time, values)
+
+    def _advance_energy(self):
+        """Fija el eje común hasta el último tiempo definitivo de ambas series y actualiza RI."""
+        ke, ie = self._energy['ALLKE'], self._energy['ALLIE']
+        if ke.last_time is None or ie.last_time is None:
+            return
+        horizon = min(ke.last_time, ie.last_time)
+        merged = np.sort(np.concatenate([ke.take_until(horizon), ie.take_until(horizon)]))
+        if merged.size == 0:
+            return
+        self._margin = min(self._margin, _min_gap_above(merged, self._tol, self._union_last))
+        self._union_last = merged[-1]
+        new_time, _ = self._union.push(merged, merged)
+        start = max(ke.first_time, ie.first_time)
+        if new_time.size and new_time[0] <= start - self._tol:
+            # Un tiempo descartado vuelve a entrar si la tolerancia llega a start - tiempo
+            dropped = new_time <= start - self._tol
+            self._margin = min(self._margin, start - new_time[dropped][-1])
+            new_time = new_time[~dropped]
+        if new_time.size == 0:
+            return
+
+        allke = ke.interp(new_time)
+        allie = ie.interp(new_time)
+        ri = compute_ri(allke, allie)
+
+        offset = len(self._energy_time)
+        self._energy_time.extend(new_time)
+        for threshold in RI_THRESHOLDS:
+            unstable = np.flatnonzero(~(ri < threshold))  # NaN nunca cumple
+            if unstable.size:
+                self._last_unstable[threshold] = offset + int(unstable[-1])
+        self._decimators['ALLKE'].extend(new_time, allke)
+        self._decimators['ALLIE'].extend(new_time, allie)
+        self._decimators['RI'].extend(new_time, ri)
+
+    def _provisional_tail(self):
+        """
+        (tiempo, ALLKE, ALLIE, RI) que align_series añadiría ahora tras el eje común fijado:
+        las muestras retenidas y lo que va por delante de la serie más retrasada.
+        """
+        ke, ie = self._energy['ALLKE'], self._energy['ALLIE']
+        empty = np.empty(0, dtype=np.float64)
+        if ke.first_time is None or ie.first_time is None:
+            return empty, empty, empty, empty
+        rest = np.sort(np.concatenate([ke.rest(), ie.rest()]))
+        tail, _ = self._union.peek(rest, rest)
+        tail = tail[tail > max(ke.first_time, ie.first_time) - self._tol]
+        if tail.size == 0:
+            return empty, empty, empty, empty
+        allke = ke.interp(tail, include_pending=True)
+        allie = ie.interp(tail, include_pending=True)
+        return tail, allke, allie, compute_ri(allke, allie)
+
+    def ri_stable_time(self, threshold, tail_time=None, tail_ri=None):
+        """
+        Igual que stable_condition_times(..., op='<') sobre el RI alineado hasta ahora,
+        seguido del tramo provisional (tail_time, tail_ri) si se indica.
+        """
+        energy_time = self._energy_time.view()
+        last_unstable = self._last_unstable[threshold]
+        if tail_time is None:
+            tail_time = tail_ri = np.empty(0, dtype=np.float64)
+        unstable = np.flatnonzero(~(tail_ri < threshold))  # NaN nunca cumple
+        if unstable.size:
+            last_unstable = energy_time.size + int(unstable[-1])
+        total = energy_time.size + tail_time.size
+        if total == 0 or last_unstable == total - 1:
+            return None
+        first_stable = last_unstable + 1
+        if first_stable < energy_time.size:
+            return float(energy_time[first_stable])
+        return float(tail_time[first_stable - energy_time.size])
+
+    @property
+    def allwk_reference(self):
+        """Valor con el que se normaliza RET: el último ALLWK leído (provisional)."""
+        allwk = self._raw['ALLWK'][1].view()
+        return float(allwk[-1]) if allwk.size else 0.0
+
+    def ret_crossing_time(self, threshold):
+        """Primer tiempo con RET >= threshold, con RET normalizado por allwk_reference."""
+        reference = self.allwk_reference
+        if abs(reference) < 1e-9:
+            return None  # RET = 0 en toda la serie
+        # (x / W) * 100 es monótona en x, así que basta con buscar sobre el extremo acumulado
+        running = (self._allwk_prefix_max if reference > 0 else self._allwk_prefix_min).view()
+        low, high = 0, running.size
+        while low < high:
+            mid = (low + high) // 2
+            if (running[mid] / reference) * 100 >= threshold:
+                high = mid
+            else:
+                low = mid + 1
+        if low == running.size:
+            return None
+        return float(self._raw['ALLWK'][0].view()[low])
+
+    def snapshot(self):
+        """Estado provisional actual: tabla resumen, decisión, filas leídas y vistas generales."""
+        energy_time = self._energy_time.view()
+        tail_time, tail_allke, tail_allie, tail_ri = self._provisional_tail()
+        time_RI_5, time_RI_1 = (self.ri_stable_time(threshold, tail_time, tail_ri) for threshold in RI_THRESHOLDS)
+        time_RET_1, time_RET_5 = (self.ret_crossing_time(threshold) for threshold in RET_THRESHOLDS)
+        if tail_time.size:
+            total_time = float(tail_time[-1])
+        else:
+            total_time = float(energy_time[-1]) if energy_time.size else 0
+        decision, stable_pct = quasistatic_decision(time_RI_5, time_RI_1, time_RET_1, time_RET_5, total_time)
+
+        graph = {name: decimator.points() for name, decimator in self._decimators.items()}
+        for name, values in (('ALLKE', tail_allke), ('ALLIE', tail_allie), ('RI', tail_ri)):
+            x, y = graph[name]
+            graph[name] = (np.concatenate([x, tail_time]), np.concatenate([y, values]))
+        reference = self.allwk_reference
+        allwk_x, allwk_y = graph['ALLWK']
+        graph['RET'] = (allwk_x, allwk_y / reference * 100 if abs(reference) >= 1e-9 else np.zeros_like(allwk_y))
+        return {
+            'provisional': True,
+            'summary_table': build_summary_table(time_RI_5, time_RI_1, time_RET_1, time_RET_5, stable_pct),
+            'final_decision_text': decision,
+            'allwk_reference': reference,
+            'rows': {name: len(raw_time) for name, (raw_time, _) in self._raw.items()},
+            'aligned_rows': len(self._energy_time) + tail_time.size,
+            'skipped_rows': sum(tail.skipped_rows for tail in self._tails.values()),
+            'graph': graph,
+        }
@@ -13,6 +13,71 @@ document.addEventListener('DOMContentLoaded', () => {
     // Botones de la gráfica
     const graphButtons = document.querySelectorAll('.graph-btn');
     let currentGraphData = null; // <--- AÑADE ESTA LÍNEA AQUÍ
+    let currentAnalysisId = null; // Identificador del análisis en el servidor (para el zoom)
+    let currentSeriesName = null; // Serie que se está mostrando
+    let zoomRequestId = 0; // Para descartar respuestas de zoom que llegan tarde
+    let zoomTimer = null;
+
+    const BINARY_MIMETYPE = 'application/octet-stream';
+    const JOB_POLL_INTERVAL_MS = 500;
+
+    const analysisProgress = document.getElementById('analysis-progress');
+    const analysisProgressBar = document.getElementById('analysis-progress-bar');
+    const analysisProgressText = document.getElementById('analysis-progress-text');
+
+    // Nombres de las etapas del análisis para la barra de progreso (ver JOB_STAGE_PROGRESS en app.py)
+    const STAGE_LABELS = {
+        'parse ALLKE': 'Leyendo ALLKE',
+        'parse ALLIE': 'Leyendo ALLIE',
+        'parse ALLWK': 'Leyendo ALLWK',
+        'chunked': 'Analizando por bloques',
+        'align': 'Alineando ALLKE/ALLIE',
+        'ri_ret': 'Calculando RI y RET',
+        'criteria': 'Evaluando criterios',
+        'serialise': 'Preparando gráficas',
+    };
+
+    // --- FORMATO BINARIO (ver transport.py) ---
+    async function readAnalysisResponse(response) {
+        const contentType = response.headers.get('Content-Type') || '';
+        if (!contentType.startsWith(BINARY_MIMETYPE)) {
+            return response.json();
+        }
+        return decodeBinaryPayload(await response.arrayBuffer());
+    }
+
+    function decodeBinaryPayload(buffer) {
+        const view = new DataView(buffer);
+        const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+        if (magic !== 'QSCB') {
+            throw new Error('Respuesta binaria con formato desconocido.');
+        }
+        const headerLength = view.getUint32(8, true);
+        const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 12, headerLength)));
+        const dataStart = 12 + headerLength; // Múltiplo de 8: los buffers quedan alineados
+
+        const graphData = {};
+        for (const [name, descriptor] of Object.entries(header.series || {})) {
+            graphData[name] = {
+                x: typedArrayView(buffer, dataStart, descriptor.x),
+                y: typedArrayView(buffer, dataStart, descriptor.y),
+                total_points: descriptor.total_points,
+            };
+        }
+        delete header.series;
+        header.graph_data = graphData;
+        return header;
+    }
+
+    function typedArrayView(buffer, dataStart, descriptor) {
+        // Los typed arrays usan el orden de bytes de la plataforma (little-endian en la práctica)
+        const ArrayType = descriptor.dtype === 'float32' ? Float32Array : Float64Array;
+        return new ArrayType(buffer, dataStart + descriptor.offset, descriptor.length);
+    }
+
+    function isArrayLike(values) {
+        return Array.isArray(values) || ArrayBuffer.isView(values);
+    }
 
     // --- MANEJO DEL FORMULARIO DE CARGA ---
     if (uploadForm) {
@@ -25,22 +90,26 @@ document.addEventListener('DOMContentLoaded', () => {
 
             const formData = new FormData(uploadForm);
             
-            // Validar que los 3 archivos están seleccionados (HTML 'required' ya ayuda)
+            // Validar que hay un informe con todas las señales o los 3 archivos
+            const reportFile = formData.get('report');
             const allkeFile = formData.get('allke_csv');
             const allieFile = formData.get('allie_csv');
             const allwkFile = formData.get('allwk_csv');
+            const hasReport = reportFile && reportFile.size > 0;
 
-            if (!allkeFile || !allieFile || !allwkFile || allkeFile.size === 0 || allieFile.size === 0 || allwkFile.size === 0) {
-                alert('Por favor, selecciona los tres archivos CSV.');
+            if (!hasReport && (!allkeFile || !allieFile || !allwkFile || allkeFile.size === 0 || allieFile.size === 0 || allwkFile.size === 0)) {
+                alert('Por favor, selecciona un informe con todas las señales o los tres archivos CSV.');
                 checkButton.textContent = 'Check';
                 checkButton.disabled = false;
                 return;
             }
 
             try {
-                const response = await fetch('/analyze', {
+                // Análisis en segundo plano: el servidor responde 202 con el trabajo (o 200 si ya estaba hecho)
+                const response = await fetch('/analyze?async=1', {
                     method: 'POST',
                     body: formData, // FormData se encarga del Content-Type (multipart/form-data)
+                    headers: { 'Accept': BINARY_MIMETYPE }, // Series en binario (ver transport.py)
                 });
 
                 if (!response.ok) {
@@ -49,7 +118,21 @@ document.addEventListener('DOMContentLoaded', () => {
                     throw new Error(errorData.message || `Error del servidor: ${response.status}`);
                 }
 
-                const result = await response.json();
+                let result;
+                if (response.status === 202) {
+                    const job = await response.json();
+                    const finished = await waitForJob(job.status_url);
+                    const analysisResponse = await fetch(`/analysis/${finished.result.analysis_id}`, {
+                        headers: { 'Accept': BINARY_MIMETYPE },
+                    });
+                    if (!analysisResponse.ok) {
+                        const errorData = await analysisResponse.json().catch(() => ({}));
+                        throw new Error(errorData.message || `Error del servidor: ${analysisResponse.status}`);
+                    }
+                    result = await readAnalysisResponse(analysisResponse);
+                } else {
+                    result = await readAnalysisResponse(response);
+                }
                 
                 // Mostrar resultados
                 displayResults(result);
@@ -66,10 +149,43 @@ document.addEventListener('DOMContentLoaded', () => {
                 // Restaurar botón
                 checkButton.textContent = 'Check';
                 checkButton.disabled = false;
+                analysisProgress.hidden = true;
             }
         });
     }
 
+    // --- ANÁLISIS EN SEGUNDO PLANO ---
+    async function waitForJob(statusUrl) {
+        analysisProgress.hidden = false;
+        showJobProgress({ status: 'queued', progress: 0 });
+        for (;;) {
+            const response = await fetch(statusUrl);
+            const job = await response.json().catch(() => ({}));
+            if (!response.ok) {
+                throw new Error(job.message || `Error del servidor: ${response.status}`);
+            }
+            showJobProgress(job);
+            if (job.status === 'done') {
+                return job;
+            }
+            if (job.status === 'error') {
+                throw new Error(job.message || 'El análisis ha fallado.');
+            }
+            await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+        }
+    }
+
+    function showJobProgress(job) {
+        analysisProgressBar.value = job.progress || 0;
+        if (job.status === 'queued') {
+            const ahead = job.queue_position ? ` (${job.queue_position} por delante)` : '';
+            analysisProgressText.textContent = `En cola${ahead}...`;
+        } else {
+            const label = STAGE_LABELS[job.stage] || 'Procesando';
+            analysisProgressText.textContent = `${label}... ${Math.round((job.progress || 0) * 100)}%`;
+        }
+    }
+
     // --- MANEJO DE BOTONES DE GRÁFICA ---
     graphButtons.forEach(button => {
         button.addEventListener('click', () => {
@@ -83,6 +199,69 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     });
 
+    // --- MONITOR EN VIVO (Server-Sent Events) ---
+    const monitorForm = document.getElementById('monitor-form');
+    const monitorStartButton = document.getElementById('monitor-start-button');
+    const monitorStopButton = document.getElementById('monitor-stop-button');
+    const monitorStatus = document.getElementById('monitor-status');
+    let monitorSource = null;
+
+    if (monitorForm) {
+        monitorForm.addEventListener('submit', (event) => {
+            event.preventDefault();
+            stopMonitor();
+
+            const params = new URLSearchParams();
+            new FormData(monitorForm).forEach((value, key) => {
+                if (value.trim()) params.append(key, value.trim());
+            });
+            if (!params.has('combined') && !(params.has('allke') && params.has('allie') && params.has('allwk'))) {
+                monitorStatus.textContent = 'Indica un archivo combinado o los tres historiales.';
+                return;
+            }
+
+            monitorSource = new EventSource(`/monitor/stream?${params}`);
+            monitorStartButton.disabled = true;
+            monitorStopButton.disabled = false;
+            monitorStatus.textContent = 'Conectando...';
+
+            monitorSource.addEventListener('status', (e) => {
+                monitorStatus.textContent = JSON.parse(e.data).message;
+            });
+            // El servidor cierra el monitor tras un tiempo sin datos: no hay que reconectar
+            monitorSource.addEventListener('end', (e) => {
+                monitorStatus.textContent = JSON.parse(e.data).message;
+                stopMonitor(false);
+            });
+            monitorSource.onmessage = (e) => {
+                const update = JSON.parse(e.data);
+                displayResults(update); // Sin analysis_id: el zoom usa la vista general recibida
+                resultsSection.style.display = 'block';
+                const rows = Object.entries(update.rows).map(([name, count]) => `${name}: ${count}`).join(', ');
+                monitorStatus.textContent = `Provisional (${new Date().toLocaleTimeString()}). Filas leídas: ${rows}.`;
+            };
+            monitorSource.onerror = () => {
+                // EventSource reintenta solo; si el servidor rechazó la petición se cierra
+                if (monitorSource && monitorSource.readyState === EventSource.CLOSED) {
+                    monitorStatus.textContent = 'El monitor no está disponible (revisa las rutas y MONITOR_ROOT, o cierra otros monitores abiertos).';
+                    stopMonitor(false);
+                }
+            };
+        });
+
+        monitorStopButton.addEventListener('click', () => stopMonitor());
+    }
+
+    function stopMonitor(clearStatus = true) {
+        if (monitorSource) {
+            monitorSource.close();
+            monitorSource = null;
+        }
+        monitorStartButton.disabled = false;
+        monitorStopButton.disabled = true;
+        if (clearStatus) monitorStatus.textContent = '';
+    }
+
     // --- FUNCIÓN PARA MOSTRAR RESULTADOS ---
     function displayResults(data) {
         // 1. Actualizar texto de decisión final
@@ -94,7 +273,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
         // 2. Actualizar tabla resumen
         if (summaryTableBody && data.summary_table) {
-            updateSummaryTable(data.summary_table);
+            updateSummaryTable(data.summary_table, data.criteria || []);
         } else if (summaryTableBody) {
             clearSummaryTable(); // Limpiar si no hay datos de tabla
         }
@@ -102,19 +281,33 @@ document.addEventListener('DOMContentLoaded', () => {
 
         // 3. Actualizar gráfica
         if (plotlyGraphDiv && data.graph_data) {
-            currentGraphData = data.graph_data; // Guardar los datos completos
+            currentGraphData = data.graph_data; // Guardar la vista general de cada serie
+            currentAnalysisId = data.analysis_id || null;
             const activeSeries = document.querySelector('.graph-btn.active')?.dataset.series || 'RI'; // Obtener la serie activa
             renderPlotlyGraph(activeSeries); // Renderizar la gráfica inicial con la serie activa
         } else if (plotlyGraphDiv) {
             currentGraphData = null; // No hay datos, limpiar
+            currentAnalysisId = null;
             plotlyGraphDiv.innerHTML = '<p style="text-align:center; padding-top:50px; color: #777;">No hay datos para la gráfica.</p>';
         }
     }
 
-    function updateSummaryTable(summaryData) {
+    function updateSummaryTable(summaryData, criteria = []) {
         // Asumimos que summaryData es un objeto como:
         // { time_RI_estable_menor_5pct: '1.2s', ... }
         // Y que los <td> en HTML tienen un atributo data-key que coincide
+        // Los criterios adicionales evaluados (ALLAE/ALLIE, ETOTAL...) se añaden como filas nuevas
+        summaryTableBody.querySelectorAll('tr.criterion-row').forEach(row => row.remove());
+        criteria.filter(criterion => criterion.evaluated).forEach(criterion => {
+            const row = document.createElement('tr');
+            row.className = criterion.passed ? 'criterion-row' : 'criterion-row criterion-failed';
+            const labelCell = document.createElement('td');
+            labelCell.textContent = criterion.label;
+            const valueCell = document.createElement('td');
+            valueCell.dataset.key = criterion.key;
+            row.append(labelCell, valueCell);
+            summaryTableBody.appendChild(row);
+        });
         for (const key in summaryData) {
             const cell = summaryTableBody.querySelector(`td[data-key="${key}"]`);
             if (cell) {
@@ -124,6 +317,7 @@ document.addEventListener('DOMContentLoaded', () => {
     }
     
     function clearSummaryTable() {
+        summaryTableBody.querySelectorAll('tr.criterion-row').forEach(row => row.remove());
         const cells = summaryTableBody.querySelectorAll('td[data-key]');
         cells.forEach(cell => cell.textContent = 'N/A');
     }
@@ -134,7 +328,10 @@ document.addEventListener('DOMContentLoaded', () => {
         finalDecisionText.className = ''; // Limpiar clases previas
         decisionText = decisionText.toUpperCase(); // Para hacer la comparación insensible a mayúsculas
 
-        if (decisionText.includes("PERFECTO")) {
+        // Un criterio adicional no cumplido antepone "NO ACEPTABLE (...)" al texto de RI/RET
+        if (decisionText.startsWith("NO ACEPTABLE")) {
+            finalDecisionText.classList.add('decision-rescale');
+        } else if (decisionText.includes("PERFECTO")) {
             finalDecisionText.classList.add('decision-perfect');
         } else if (decisionText.includes("MUY BUENO")) {
             finalDecisionText.classList.add('decision-very-good');
@@ -160,7 +357,7 @@ document.addEventListener('DOMContentLoaded', () => {
         const series = currentGraphData[activeSeriesName];
         
         // Verificar que series.x y series.y existen y son arrays
-        if (!series || !Array.isArray(series.x) || !Array.isArray(series.y)) {
+        if (!series || !isArrayLike(series.x) || !isArrayLike(series.y)) {
             plotlyGraphDiv.innerHTML = '<p style="text-align:center; padding-top:50px; color: #777;">Formato de datos incorrecto para la gráfica.</p>';
             console.error("Datos incorrectos para Plotly:", series);
             return;
@@ -190,7 +387,52 @@ document.addEventListener('DOMContentLoaded', () => {
         };
         
         // Usar Plotly.react para eficiencia en actualizaciones
-        Plotly.react(plotlyGraphDiv, [trace], layout, {responsive: true});
+        currentSeriesName = activeSeriesName;
+        Plotly.react(plotlyGraphDiv, [trace], layout, {responsive: true}).then(() => {
+            // Al hacer zoom se piden al servidor sólo los puntos de la ventana visible
+            if (!plotlyGraphDiv.dataset.zoomHandler) {
+                plotlyGraphDiv.on('plotly_relayout', onGraphRelayout);
+                plotlyGraphDiv.dataset.zoomHandler = 'true';
+            }
+        });
+    }
+
+    // --- ZOOM: ventana diezmada desde el servidor ---
+    function onGraphRelayout(eventData) {
+        if (!currentAnalysisId || !currentSeriesName) return;
+
+        if (eventData['xaxis.autorange']) {
+            // Vuelta a la vista completa: basta con la vista general que ya tenemos
+            const overview = currentGraphData[currentSeriesName];
+            zoomRequestId++;
+            Plotly.restyle(plotlyGraphDiv, { x: [overview.x], y: [overview.y] });
+            return;
+        }
+
+        const t0 = eventData['xaxis.range[0]'] ?? eventData['xaxis.range']?.[0];
+        const t1 = eventData['xaxis.range[1]'] ?? eventData['xaxis.range']?.[1];
+        if (t0 === undefined || t1 === undefined) return;
+
+        clearTimeout(zoomTimer);
+        zoomTimer = setTimeout(() => fetchSeriesWindow(currentSeriesName, t0, t1), 150);
+    }
+
+    async function fetchSeriesWindow(seriesName, t0, t1) {
+        const requestId = ++zoomRequestId;
+        const width = Math.max(Math.round(plotlyGraphDiv.clientWidth), 1);
+        const params = new URLSearchParams({ t0, t1, width });
+        try {
+            const response = await fetch(`/series/${currentAnalysisId}/${seriesName}?${params}`, {
+                headers: { 'Accept': BINARY_MIMETYPE },
+            });
+            if (!response.ok) return; // Si el análisis ya no está en el servidor, se mantiene la vista general
+            const decoded = await readAnalysisResponse(response);
+            const windowData = decoded.graph_data ? decoded.graph_data[seriesName] : decoded;
+            if (requestId !== zoomRequestId || seriesName !== currentSeriesName) return;
+            Plotly.restyle(plotlyGraphDiv, { x: [windowData.x], y: [windowData.y] });
+        } catch (error) {
+            console.error('Error al obtener la ventana de la serie:', error);
+        }
     }
 
     // Nueva función para obtener el título del eje Y
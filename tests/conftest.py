@@ -0,0 +1,8 @@
+# tests/conftest.py
+"""Los módulos de la aplicación y los de benchmarks/ (historiales sintéticos, implementación original) son planos."""
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'benchmarks'))
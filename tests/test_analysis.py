@@ -0,0 +1,88 @@
+# tests/test_analysis.py
+"""Equivalencia de los núcleos vectorizados con las implementaciones de referencia."""
+import itertools
+import operator
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis import (SWEEP_CATEGORIES, DecisionThresholds, align_series, condition_times_blockwise,
+                      decision_category, decision_sweep, quasistatic_decision, stable_condition_times)
+from legacy import find_first_time_stable_condition
+
+OPERATORS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+
+
+def random_series(rng, n):
+    time = np.cumsum(rng.uniform(0.0, 1.0, n))
+    values = rng.choice([0.5, 1.0, 2.0, 5.0, 8.0], n) * rng.choice([1.0, 1.0, 1.0, np.nan], n)
+    return time, values
+
+
+@pytest.mark.parametrize('op', OPERATORS)
+@pytest.mark.parametrize('look_from_end', [True, False])
+def test_stable_condition_times_matches_legacy_loop(op, look_from_end):
+    rng = np.random.default_rng(0)
+    thresholds = [0.5, 1.0, 2.0, 5.0, 10.0]
+    for n in [0, 1, 2, 7, 50, 300]:
+        time, values = random_series(rng, n)
+        df = pd.DataFrame({'t': time, 'v': values})
+        expected = [find_first_time_stable_condition(df, 't', 'v', lambda x, t=t: OPERATORS[op](x, t), look_from_end)
+                    for t in thresholds]
+        result = stable_condition_times(time, values, thresholds, op=op, look_from_end=look_from_end)
+        assert result == [None if t is None else float(t) for t in expected]
+
+
+@pytest.mark.parametrize('op', OPERATORS)
+@pytest.mark.parametrize('look_from_end', [True, False])
+def test_condition_times_blockwise_matches_single_pass(op, look_from_end):
+    rng = np.random.default_rng(1)
+    thresholds = [0.5, 1.0, 2.0, 5.0, 10.0]
+    for n, block_rows in [(100, 7), (101, 10), (64, 64), (500, 1)]:
+        time, values = random_series(rng, n)
+        expected = stable_condition_times(time, values, thresholds, op, look_from_end)
+        assert condition_times_blockwise(time, values, thresholds, op, look_from_end, block_rows) == expected
+
+
+def sweep_cases():
+    rng = np.random.default_rng(2)
+    for _ in range(20):
+        n = int(rng.integers(2, 400))
+        energy_time = np.sort(rng.uniform(0.0, 1.0, n))
+        ri = np.abs(rng.normal(0.0, 1.0, n)).cumsum()[::-1] / n * rng.uniform(1.0, 20.0)
+        allwk_time = np.sort(rng.uniform(0.0, 1.0, n))
+        ret = np.sort(rng.uniform(0.0, rng.uniform(2.0, 20.0), n))
+        yield energy_time, ri, allwk_time, ret
+
+
+def non_positive_duration_cases():
+    # Historiales que terminan en t <= 0: quasistatic_decision nunca es cuasi-estático,
+    # tampoco con min_stable_pct = 0
+    time = np.linspace(-1.0, 0.0, 50)
+    yield time, np.full(50, 0.1), time, np.linspace(0.0, 10.0, 50)
+    time = np.linspace(-2.0, -1.0, 50)
+    yield time, np.full(50, 0.1), time, np.linspace(0.0, 10.0, 50)
+
+
+@pytest.mark.parametrize('energy_time, ri, allwk_time, ret', list(sweep_cases()) + list(non_positive_duration_cases()))
+def test_decision_sweep_matches_quasistatic_decision(energy_time, ri, allwk_time, ret):
+    axes = ([2.0, 5.0, 8.0], [0.5, 1.0, 2.0], [0.5, 1.0], [3.0, 5.0], [0.0, 30.0, 60.0, 90.0])
+    codes, ri_times, ret_times = decision_sweep(energy_time, ri, allwk_time, ret, *axes)
+    total_time = float(energy_time[-1])
+    for index in itertools.product(*(range(len(axis)) for axis in axes)):
+        thresholds = DecisionThresholds(*(axis[i] for axis, i in zip(axes, index)))
+        text, _ = quasistatic_decision(ri_times[thresholds.ri_loose], ri_times[thresholds.ri_strict],
+                                       ret_times[thresholds.ret_strict], ret_times[thresholds.ret_loose],
+                                       total_time, thresholds)
+        category = decision_category(text)
+        assert SWEEP_CATEGORIES[codes[index]] == category, (index, text)
+
+
+def test_align_series_interpolates_by_time_on_a_non_uniform_axis():
+    # El merge + interpolate original interpolaba por posición en el eje común y daba
+    # [10, 20, 30, 40] para ALLIE; ahora cada valor es proporcional al tiempo
+    energy_time, allke, allie = align_series([0.0, 0.1, 2.0, 3.0], [1.0, 2.0, 3.0, 4.0], [0.0, 3.0], [10.0, 40.0])
+    np.testing.assert_array_equal(energy_time, [0.0, 0.1, 2.0, 3.0])
+    np.testing.assert_array_equal(allke, [1.0, 2.0, 3.0, 4.0])
+    np.testing.assert_allclose(allie, [10.0, 11.0, 30.0, 40.0])
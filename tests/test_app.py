@@ -0,0 +1,126 @@
+# tests/test_app.py
+"""Peticiones a la aplicación con el cliente de pruebas de Flask."""
+import io
+import threading
+import time
+
+import pytest
+
+import app as app_module
+from synthetic import energy_csv_files
+
+JOB_TIMEOUT_SECONDS = 30
+
+
+@pytest.fixture
+def client():
+    app_module.parse_cache.clear()
+    app_module.result_cache.clear()
+    return app_module.app.test_client()
+
+
+def upload(files):
+    return {f'{name.lower()}_csv': (io.BytesIO(data), f'{name.lower()}.csv') for name, data in files.items()}
+
+
+def wait_for_job(client, status_url):
+    deadline = time.monotonic() + JOB_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        job = client.get(status_url).get_json()
+        if job['status'] in ('done', 'error'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'El trabajo no terminó en {JOB_TIMEOUT_SECONDS} s')
+
+
+def test_async_result_survives_when_it_does_not_fit_the_result_cache(client, monkeypatch):
+    monkeypatch.setattr(app_module.result_cache, 'max_bytes', 0)
+    response = client.post('/analyze?async=1', data=upload(energy_csv_files(2_000)))
+    assert response.status_code == 202
+    job = wait_for_job(client, response.get_json()['status_url'])
+    assert job['status'] == 'done'
+    assert len(app_module.result_cache) == 0
+
+    analysis_id = job['result']['analysis_id']
+    analysis = client.get(f'/analysis/{analysis_id}')
+    assert analysis.status_code == 200
+    assert analysis.get_json()['final_decision_text'] == job['result']['final_decision_text']
+    assert client.get(f'/series/{analysis_id}/RI?t0=0&t1=0.5').status_code == 200
+    assert client.get(f'/sweep/{analysis_id}?ri_loose=2,5').status_code == 200
+
+
+
+def test_chunked_results_count_their_spill_files_against_the_disk_budget(client, monkeypatch):
+    first = client.post('/analyze?chunked=1', data=upload(energy_csv_files(2_200)))
+    assert first.status_code == 200
+    stats = app_module.result_cache.stats()
+    assert stats['entries'] == 1
+    assert stats['disk_bytes'] >= 5 * 2_200 * 8  # ALLKE, ALLIE, RI y sus tiempos, ALLWK, RET...
+
+    monkeypatch.setattr(app_module.result_cache, 'max_disk_bytes', stats['disk_bytes'] * 3 // 2)
+    second = client.post('/analyze?chunked=1', data=upload(energy_csv_files(2_300)))
+    assert second.status_code == 200
+    assert app_module.result_cache.stats()['entries'] == 1
+    assert client.get(f"/analysis/{first.get_json()['analysis_id']}").status_code == 404
+    assert client.get(f"/analysis/{second.get_json()['analysis_id']}").status_code == 200
+
+
+def test_batch_analyses_each_triple_as_soon_as_it_is_complete(client, monkeypatch):
+    members = [(f'run{i}_{name}.csv', data) for i in range(3) for name, data in energy_csv_files(600 + i).items()]
+    first_analysed = threading.Event()
+    analyse = app_module._analyze_batch_job
+
+    def analyse_and_signal(*args):
+        row = analyse(*args)
+        first_analysed.set()
+        return row
+
+    def archive_members(stream):
+        for i, (path, data) in enumerate(members):
+            if i == 3:  # El primer trío se analiza sin esperar al resto del archivo
+                assert first_analysed.wait(JOB_TIMEOUT_SECONDS)
+            yield path, io.BytesIO(data)
+
+    monkeypatch.setattr(app_module, '_analyze_batch_job', analyse_and_signal)
+    monkeypatch.setattr(app_module, 'iter_archive_members', archive_members)
+    monkeypatch.setattr(app_module.result_cache, 'max_bytes', 0)
+    response = client.post('/analyze_batch', data={'archive': (io.BytesIO(b'zip'), 'doe.zip')})
+    assert response.status_code == 200
+    batch = response.get_json()
+    assert [row['job'] for row in batch['jobs']] == ['run0', 'run1', 'run2']
+    assert all(row['status'] == 'ok' for row in batch['jobs'])
+
+    # Lo que no cabe en la caché de resultados se indica en la respuesta
+    assert 'stored_analyses_note' in batch
+    for row in batch['jobs']:
+        assert row['analysis_stored'] is False
+        assert client.get(f"/analysis/{row['analysis_id']}").status_code == 404
+
+@pytest.fixture
+def monitor_files(tmp_path, monkeypatch):
+    files = energy_csv_files(500)
+    for name, data in files.items():
+        (tmp_path / f'{name.lower()}.csv').write_bytes(data)
+    monkeypatch.setitem(app_module.app.config, 'MONITOR_ROOT', str(tmp_path))
+    monkeypatch.setitem(app_module.app.config, 'MONITOR_IDLE_TIMEOUT_SECONDS', 1.0)
+    return '/monitor/stream?allke=allke.csv&allie=allie.csv&allwk=allwk.csv&interval=0.5'
+
+
+def test_monitor_streams_are_capped_and_released(client, monitor_files, monkeypatch):
+    monkeypatch.setattr(app_module, 'monitor_slots', app_module.threading.BoundedSemaphore(1))
+    first = client.get(monitor_files, buffered=False)
+    assert first.status_code == 200
+    rejected = client.get(monitor_files, buffered=False)
+    assert rejected.status_code == 503
+    assert rejected.headers['Retry-After']
+    first.close()
+    second = client.get(monitor_files, buffered=False)
+    assert second.status_code == 200
+    second.close()
+
+
+def test_monitor_stream_ends_after_idle_timeout(client, monitor_files):
+    body = client.get(monitor_files).get_data(as_text=True)
+    assert body.startswith('event: status')
+    assert '"provisional": true' in body
+    assert body.rstrip().splitlines()[-2] == 'event: end'
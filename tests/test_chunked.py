@@ -0,0 +1,54 @@
+# tests/test_chunked.py
+"""El análisis por bloques da los mismos tiempos, decisión y series que el análisis en memoria."""
+import numpy as np
+import pytest
+
+from analysis import analyze_series
+from chunked import analyze_chunked
+from ingest import parse_energy_buffer
+from synthetic import energy_csv_files, energy_histories, to_csv_bytes
+
+DECISION_FIELDS = ('time_RI_estable_menor_5pct', 'time_RI_estable_menor_1pct', 'time_RET_mayor_igual_1pct',
+                   'time_RET_mayor_igual_5pct', 'total_time', 'porcentaje_tiempo_estable_RI_5pct',
+                   'final_decision_text')
+
+
+def history_files(rows, seed):
+    """Historiales sintéticos con tiempos repetidos en ALLIE y ALLKE desplazado en algunas semillas."""
+    histories = energy_histories(rows, seed)
+    allke_time, allke = histories['ALLKE']
+    allie_time, allie = histories['ALLIE']
+    if seed % 3 == 0:
+        allie_time = np.round(allie_time, 3)
+    if seed % 5 == 0:
+        allke_time = allke_time * 0.9 + 0.05
+    return {
+        'ALLKE': to_csv_bytes(allke_time, allke, 'ALLKE', ';', True),
+        'ALLIE': to_csv_bytes(allie_time, allie, 'ALLIE', ',', False),
+        'ALLWK': to_csv_bytes(*histories['ALLWK'], 'ALLWK', ',', True),
+    }
+
+
+def assert_same_analysis(files, chunk_rows, storage_dtype=np.float64):
+    parsed = {name: parse_energy_buffer(data) for name, data in files.items()}
+    expected = analyze_series(*[(parsed[name].time, parsed[name].values) for name in ('ALLKE', 'ALLIE', 'ALLWK')])
+    result = analyze_chunked(files['ALLKE'], files['ALLIE'], files['ALLWK'], chunk_rows=chunk_rows,
+                             storage_dtype=storage_dtype)
+    for field in DECISION_FIELDS:
+        assert getattr(result, field) == getattr(expected, field), field
+    np.testing.assert_array_equal(result.series['RI'].time, expected.energy_time)
+    np.testing.assert_array_equal(result.series['ALLKE'].values, expected.allke.astype(storage_dtype))
+    np.testing.assert_array_equal(result.series['RI'].values, expected.ri.astype(storage_dtype))
+    np.testing.assert_array_equal(result.series['ALLWK'].time, expected.allwk_time)
+    np.testing.assert_array_equal(result.series['RET'].values, expected.ret.astype(storage_dtype))
+
+
+@pytest.mark.parametrize('seed', range(15))
+@pytest.mark.parametrize('chunk_rows', [3, 37, 1000])
+def test_chunked_matches_in_memory(seed, chunk_rows):
+    rows = int(np.random.default_rng(seed).integers(5, 1500))
+    assert_same_analysis(history_files(rows, seed), chunk_rows)
+
+
+def test_chunked_float32_storage_matches_in_memory():
+    assert_same_analysis(energy_csv_files(50_000), chunk_rows=10_000, storage_dtype=np.float32)
@@ -0,0 +1,49 @@
+# tests/test_criteria.py
+"""Criterios adicionales: coherencia con la decisión de RI y señales sin datos."""
+import numpy as np
+import pytest
+
+from analysis import quasistatic_decision, stable_condition_times
+from criteria import STABLE_TIME_FRACTION, Criterion, evaluate_criteria
+
+STABILITY = Criterion('RI_estable', 'RI estable', 'stability', 'ALLKE', 'ALLIE', '<', 5.0)
+
+
+@pytest.mark.parametrize('start', [0.0, 0.3, 0.45])
+def test_stability_uses_the_same_total_time_as_the_ri_decision(start):
+    time = np.linspace(start, 1.0, 1001)
+    allie = np.ones_like(time)
+    allke = np.where(time < 0.42, 0.5, 0.01)  # RI < 5% estable desde t = 0.42
+    [result] = evaluate_criteria(time, {'ALLKE': allke, 'ALLIE': allie}, [STABILITY])
+
+    [stable_from] = stable_condition_times(time, allke / allie * 100, [5.0])
+    assert result.value == stable_from
+    _, stable_pct = quasistatic_decision(stable_from, None, None, None, float(time[-1]))
+    assert result.passed == (stable_pct >= STABLE_TIME_FRACTION * 100)
+
+
+@pytest.mark.filterwarnings('error')
+@pytest.mark.parametrize('missing', ['signal', 'reference'])
+def test_all_nan_signals_are_not_evaluable(missing):
+    time = np.linspace(0.0, 1.0, 50)
+    present = np.linspace(1.0, 2.0, 50)
+    empty = np.full(50, np.nan)
+    criteria = [
+        Criterion('ratio', 'ratio', 'ratio', 'S', 'R', '<=', 5.0),
+        Criterion('drift', 'drift', 'drift', 'S', 'R', '<=', 1.0),
+        STABILITY._replace(signal='S', reference='R'),
+    ]
+    signals = {'S': empty, 'R': present} if missing == 'signal' else {'S': present, 'R': empty}
+    for result in evaluate_criteria(time, signals, criteria):
+        assert not result.evaluated
+        assert result.passed is None
+
+
+@pytest.mark.filterwarnings('error')
+def test_drift_starts_at_the_first_finite_value():
+    time = np.linspace(0.0, 1.0, 5)
+    etotal = np.array([np.nan, 10.0, 10.5, 10.0, 9.5])
+    allwk = np.linspace(0.0, 100.0, 5)
+    [result] = evaluate_criteria(time, {'ETOTAL': etotal, 'ALLWK': allwk},
+                                 [Criterion('deriva', 'deriva', 'drift', 'ETOTAL', 'ALLWK', '<=', 1.0)])
+    assert result.evaluated and result.value == pytest.approx(0.5)
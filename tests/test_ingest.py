@@ -0,0 +1,85 @@
+# tests/test_ingest.py
+"""Parsers de ingest: np.loadtxt y pandas devuelven los mismos valores y las filas se cuentan bien."""
+import codecs
+
+import numpy as np
+import pytest
+
+import ingest
+from ingest import (_count_lines, _read_columns_numpy, _read_columns_pandas, _text_lines, parse_energy_buffer,
+                    sniff_dialect)
+
+
+def full_precision_csv(rows, separator=';', decimal='.', extra_lines=''):
+    rng = np.random.default_rng(rows)
+    time = np.sort(rng.uniform(0.0, 1.0, rows))
+    values = rng.lognormal(0.0, 3.0, rows)
+    lines = [f'{t!r}{separator}{v!r}' for t, v in zip(time.tolist(), values.tolist())]
+    text = f'Time{separator}ALLKE\n' + '\n'.join(lines) + '\n' + extra_lines
+    if decimal != '.':
+        text = text.replace('.', decimal)
+    return text.encode('utf-8'), time, values
+
+
+@pytest.mark.parametrize('separator', [';', ',', ' '])
+def test_numpy_and_pandas_parsers_return_identical_values(separator):
+    buf, time, values = full_precision_csv(20_000, separator)
+    dialect = sniff_dialect(buf)
+    from_numpy = _read_columns_numpy(buf, dialect, [0, 1])
+    from_pandas = _read_columns_pandas(buf, dialect, [0, 1])
+    for numpy_column, pandas_column, source in zip(from_numpy, from_pandas, (time, values)):
+        np.testing.assert_array_equal(numpy_column, source)
+        np.testing.assert_array_equal(pandas_column, source)
+
+
+def test_pandas_fallback_is_exact_with_non_numeric_rows_and_comma_decimal():
+    buf, time, values = full_precision_csv(5_000, extra_lines='0.5;abc\n')
+    parsed = parse_energy_buffer(buf)
+    assert parsed.skipped_rows == 1
+    np.testing.assert_array_equal(parsed.time, time)
+    np.testing.assert_array_equal(parsed.values, values)
+
+    buf, time, values = full_precision_csv(5_000, decimal=',')
+    parsed = parse_energy_buffer(buf)
+    np.testing.assert_array_equal(parsed.time, time)
+    np.testing.assert_array_equal(parsed.values, values)
+
+
+def test_blank_lines_are_not_counted_as_skipped_rows():
+    assert _count_lines(b'a\n\n\n\nb\n') == 2
+    assert _count_lines(b'a\r\n\r\n  \n\t\r\nb') == 2
+    assert parse_energy_buffer(b'0.1;1\n\n\n\n0.2;2\n').skipped_rows == 0
+
+    # Cabecera de un .rpt de Abaqus, con líneas vacías: header_lines cuenta líneas del archivo
+    rpt = b'\n********************************\n\n      X       ALLKE\n\n\n  0.0  1.0\n  0.1  2.0\n\n\n  0.2  3.0\n'
+    parsed = parse_energy_buffer(rpt)
+    assert parsed.dialect.header_lines == 6
+    assert parsed.skipped_rows == 0
+    np.testing.assert_array_equal(parsed.values, [1.0, 2.0, 3.0])
+
+
+def test_count_lines_across_block_boundaries():
+    rng = np.random.default_rng(3)
+    for _ in range(200):
+        buf = bytes(rng.choice(list(b'a \r\n\n'), int(rng.integers(0, 40))))
+        expected = sum(1 for line in buf.split(b'\n') if line.strip())
+        for block_size in (1, 2, 3, 7, 64):
+            assert _count_lines(buf, block_size) == expected, (buf, block_size)
+
+
+def test_clean_files_are_parsed_with_numpy_whatever_their_size(monkeypatch):
+    def fail(*args):
+        raise AssertionError('pandas no debería hacer falta')
+    monkeypatch.setattr(ingest, '_read_columns_pandas', fail)
+    buf, time, values = full_precision_csv(150_000)
+    assert len(buf) > 4 * 1024 * 1024
+    parsed = parse_energy_buffer(buf)
+    np.testing.assert_array_equal(parsed.time, time)
+    np.testing.assert_array_equal(parsed.values, values)
+
+
+def test_text_lines_across_block_boundaries():
+    buf = codecs.BOM_UTF8 + 'X;ALLKE\r\n0.5;1\n\nñ;2\n3;4'.encode('utf-8')
+    expected = buf.decode('utf-8-sig').split('\n')
+    for block_size in (1, 2, 3, 5, 64):
+        assert list(_text_lines(buf, block_size)) == expected
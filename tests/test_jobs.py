@@ -0,0 +1,50 @@
+# tests/test_jobs.py
+"""Cola de trabajos: límites de los resultados que conservan los trabajos y caducidad."""
+import time
+
+from jobs import JobQueue
+
+JOB_TIMEOUT_SECONDS = 10
+
+
+def run_job(queue, key, nbytes, disk_bytes=0):
+    """Trabajo que intenta conservar un resultado de `nbytes`; devuelve (trabajo, si lo conservó)."""
+    kept = []
+    job = queue.submit(lambda job: kept.append(queue.keep_payload(job, key, f'payload {key}', nbytes, disk_bytes)))
+    deadline = time.monotonic() + JOB_TIMEOUT_SECONDS
+    while job.status not in ('done', 'error'):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert job.status == 'done', job.error
+    return job, kept[0]
+
+
+def test_kept_payloads_stay_within_the_byte_limits():
+    queue = JobQueue(1, 4, max_payload_bytes=100, max_payload_disk_bytes=1000)
+    assert run_job(queue, 'a', 60)[1]
+    assert run_job(queue, 'b', 30)[1]
+    assert queue.payload('a') == 'payload a'
+
+    # 'c' no cabe con 'a': se suelta el más antiguo
+    assert run_job(queue, 'c', 50)[1]
+    assert queue.payload('a') is None
+    assert queue.payload('b') == 'payload b'
+    assert queue.payload('c') == 'payload c'
+
+    assert run_job(queue, 'd', 10, disk_bytes=990)[1]
+    assert queue.payload('b') == 'payload b'
+    assert queue.payload('c') == 'payload c'
+    assert run_job(queue, 'e', 0, disk_bytes=20)[1]
+    assert queue.payload('d') is None
+
+    job, kept = run_job(queue, 'f', 101)
+    assert not kept
+    assert job.payload is None
+    assert queue.payload('f') is None
+
+
+def test_finished_jobs_expire_on_get():
+    queue = JobQueue(1, 4, ttl_seconds=0, max_payload_bytes=100)
+    job, _ = run_job(queue, 'a', 10)
+    time.sleep(0.01)
+    assert queue.get(job.job_id) is None
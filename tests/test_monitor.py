@@ -0,0 +1,95 @@
+# tests/test_monitor.py
+"""El análisis en vivo, leído por tramos mientras los archivos crecen, acaba igual que el análisis completo."""
+import numpy as np
+import pytest
+
+from analysis import analyze_series, build_summary_table
+from ingest import parse_energy_buffer
+from monitor import LiveAnalysis
+from synthetic import energy_csv_files, energy_histories, to_csv_bytes
+
+
+def grow_and_poll(tmp_path, files, pieces, seed, relative_tolerance=None):
+    """Escribe cada archivo en `pieces` trozos cortados en bytes al azar, sondeando tras cada uno."""
+    rng = np.random.default_rng(seed)
+    paths = {name: tmp_path / f'{name.lower()}.csv' for name in files}
+    cuts = {name: np.sort(rng.integers(0, len(data), pieces - 1)).tolist() + [len(data)] for name, data in files.items()}
+    options = {} if relative_tolerance is None else {'relative_tolerance': relative_tolerance}
+    live = LiveAnalysis(*(str(paths[name]) for name in ('ALLKE', 'ALLIE', 'ALLWK')), **options)
+    written = {name: 0 for name in files}
+    for piece in range(pieces):
+        for name, data in files.items():
+            end = cuts[name][piece]
+            with open(paths[name], 'ab') as f:
+                f.write(data[written[name]:end])
+            written[name] = end
+        live.poll()
+    while live.backlog:
+        live.poll()
+    return live
+
+
+def shifted_files(rows, seed):
+    """ALLIE con muchos tiempos repetidos (redondeados) y ALLKE empezando más tarde."""
+    histories = energy_histories(rows, seed)
+    allke_time, allke = histories['ALLKE']
+    allie_time, allie = histories['ALLIE']
+    return {
+        'ALLKE': to_csv_bytes(allke_time * 0.9 + 0.05, allke, 'ALLKE', ';', True),
+        'ALLIE': to_csv_bytes(np.round(allie_time, 3), allie, 'ALLIE', ',', False),
+        'ALLWK': to_csv_bytes(*histories['ALLWK'], 'ALLWK', ',', True),
+    }
+
+
+def restarted_files(rows, seed):
+    """Cada historial vuelve atrás a mitad de cálculo y reescribe el tramo final con otros valores."""
+    files = {}
+    for name, (time, values) in energy_histories(rows, seed).items():
+        restart, resume = (time.size * 3) // 5, time.size // 2
+        time = np.concatenate([time[:restart], time[resume:]])
+        values = np.concatenate([values[:restart], values[resume:] * 1.1])
+        files[name] = to_csv_bytes(time, values, name, ';', True)
+    return files
+
+
+def assert_matches_full_analysis(live, files, relative_tolerance=None):
+    snapshot = live.snapshot()
+    parsed = {name: parse_energy_buffer(data) for name, data in files.items()}
+    options = {} if relative_tolerance is None else {'relative_tolerance': relative_tolerance}
+    result = analyze_series(*[(parsed[name].time, parsed[name].values) for name in ('ALLKE', 'ALLIE', 'ALLWK')],
+                            **options)
+    assert snapshot['aligned_rows'] == result.energy_time.size
+    assert snapshot['rows'] == {name: series.rows for name, series in parsed.items()}
+    assert snapshot['summary_table'] == build_summary_table(
+        result.time_RI_estable_menor_5pct, result.time_RI_estable_menor_1pct, result.time_RET_mayor_igual_1pct,
+        result.time_RET_mayor_igual_5pct, result.porcentaje_tiempo_estable_RI_5pct)
+    assert snapshot['final_decision_text'] == result.final_decision_text
+    assert snapshot['allwk_reference'] == result.allwk[-1]
+    for name, expected in (('ALLKE', result.allke), ('ALLIE', result.allie), ('RI', result.ri)):
+        x, y = snapshot['graph'][name]
+        assert x[-1] == result.energy_time[-1]
+        np.testing.assert_array_equal(y[-1], expected[-1])
+
+
+@pytest.mark.parametrize('make_files', [energy_csv_files, shifted_files, restarted_files])
+@pytest.mark.parametrize('seed', range(5))
+def test_final_snapshot_matches_full_analysis(tmp_path, make_files, seed):
+    files = make_files(5_000, seed=seed)
+    live = grow_and_poll(tmp_path, files, pieces=7, seed=seed)
+    assert_matches_full_analysis(live, files)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_times_collapsed_only_by_the_final_tolerance(tmp_path, seed):
+    # ALLIE va medio milisegundo por detrás de ALLKE: con la tolerancia final (1e-3 * 1 s)
+    # ambos ejes se funden, pero no con la de los primeros tramos leídos
+    relative_tolerance = 1e-3
+    histories = energy_histories(5_000, seed)
+    allke_time, allke = histories['ALLKE']
+    files = {
+        'ALLKE': to_csv_bytes(allke_time, allke, 'ALLKE', ';', True),
+        'ALLIE': to_csv_bytes(allke_time + 5e-4, np.interp(allke_time, *histories['ALLIE']), 'ALLIE', ';', True),
+        'ALLWK': to_csv_bytes(*histories['ALLWK'], 'ALLWK', ';', True),
+    }
+    live = grow_and_poll(tmp_path, files, pieces=7, seed=seed, relative_tolerance=relative_tolerance)
+    assert_matches_full_analysis(live, files, relative_tolerance)
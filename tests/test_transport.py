@@ -0,0 +1,47 @@
+# tests/test_transport.py
+"""Ida y vuelta del formato binario de las series (como lo lee static/script.js)."""
+import json
+import struct
+
+import numpy as np
+import pytest
+
+from transport import MAGIC, VERSION, encode_binary_payload
+
+
+def decode_binary_payload(payload):
+    magic, version, header_length = struct.unpack_from('<4sII', payload)
+    assert (magic, version) == (MAGIC, VERSION)
+    header = json.loads(payload[12:12 + header_length])
+    data_start = 12 + header_length
+    assert data_start % 8 == 0
+    series = {}
+    for name, descriptor in header['series'].items():
+        axes = []
+        for axis in ('x', 'y'):
+            info = descriptor[axis]
+            assert info['offset'] % 8 == 0
+            axes.append(np.frombuffer(payload, dtype={'float64': '<f8', 'float32': '<f4'}[info['dtype']],
+                                      count=info['length'], offset=data_start + info['offset']))
+        series[name] = axes
+    return header, series
+
+
+@pytest.mark.parametrize('dtype', ['float64', 'float32'])
+def test_binary_payload_round_trip(dtype):
+    rng = np.random.default_rng(0)
+    series = {
+        'RI': (np.linspace(0.0, 1.0, 7), np.array([1.0, np.nan, 3.0, np.inf, -2.5, 0.0, 1e-300])),
+        'ALLKE': (rng.uniform(size=3), rng.uniform(size=3), {'total_points': 3000}),
+        'vacía': (np.empty(0), np.empty(0)),
+    }
+    header = {'final_decision_text': 'MUY BUENO. Ñandú', 'summary_table': {'a': '1.000 s'}}
+    decoded_header, decoded = decode_binary_payload(encode_binary_payload(header, series, dtype))
+
+    assert decoded_header['final_decision_text'] == header['final_decision_text']
+    assert decoded_header['summary_table'] == header['summary_table']
+    assert decoded_header['series']['ALLKE']['total_points'] == 3000
+    assert set(decoded) == set(series)
+    for name, entry in series.items():
+        for sent, received in zip(entry[:2], decoded[name]):
+            np.testing.assert_array_equal(received, np.asarray(sent, dtype=dtype))
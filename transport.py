@@ -0,0 +1,68 @@
+# transport.py
+"""
+Formato binario compacto para enviar las series de la gráfica.
+
+Estructura (todo little-endian):
+    b'QSCB' | uint32 versión | uint32 longitud de la cabecera JSON
+    cabecera JSON (UTF-8, rellenada con espacios hasta múltiplo de 8 bytes)
+    buffers de las series, cada uno alineado a 8 bytes
+
+La cabecera lleva los campos normales de la respuesta (tabla resumen, decisión...)
+y, en 'series', la posición de cada buffer dentro de la sección de datos:
+    {'RI': {'x': {'offset': 0, 'length': n, 'dtype': 'float64'}, 'y': {...}}, ...}
+Los NaN viajan como NaN (Plotly los dibuja como hueco).
+"""
+import json
+import struct
+
+import numpy as np
+
+BINARY_MIMETYPE = 'application/octet-stream'
+MAGIC = b'QSCB'
+VERSION = 1
+_PREAMBLE = struct.Struct('<4sII')
+_DTYPES = {'float64': '<f8', 'float32': '<f4'}
+
+
+def wants_binary(request):
+    """Modo binario si se pide con ?format=binary o con la cabecera Accept."""
+    if request.args.get('format') == 'binary':
+        return True
+    best = request.accept_mimetypes.best_match(['application/json', BINARY_MIMETYPE])
+    return best == BINARY_MIMETYPE
+
+
+def requested_dtype(request):
+    return 'float32' if request.args.get('precision') == '32' else 'float64'
+
+
+def _pad8(length):
+    return -length % 8
+
+
+def encode_binary_payload(header, series, dtype='float64'):
+    """
+    Codifica `header` (dict serializable) y `series` ({nombre: (x, y) o (x, y, extra)})
+    en el formato binario. `extra` es un dict que se copia a la descripción de la serie.
+    """
+    np_dtype = _DTYPES[dtype]
+    buffers = []
+    offset = 0
+    descriptors = {}
+    for name, entry in series.items():
+        x, y = entry[0], entry[1]
+        descriptor = dict(entry[2]) if len(entry) > 2 else {}
+        for axis, values in (('x', x), ('y', y)):
+            data = np.ascontiguousarray(values, dtype=np_dtype).tobytes()
+            descriptor[axis] = {'offset': offset, 'length': len(data) // np.dtype(np_dtype).itemsize, 'dtype': dtype}
+            padding = b'\0' * _pad8(len(data))
+            buffers.append(data)
+            buffers.append(padding)
+            offset += len(data) + len(padding)
+        descriptors[name] = descriptor
+
+    header = dict(header, series=descriptors)
+    header_bytes = json.dumps(header, allow_nan=False).encode('utf-8')
+    header_bytes += b' ' * _pad8(_PREAMBLE.size + len(header_bytes))
+    preamble = _PREAMBLE.pack(MAGIC, VERSION, len(header_bytes))
+    return b''.join([preamble, header_bytes] + buffers)